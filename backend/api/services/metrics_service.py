@@ -0,0 +1,113 @@
+import bisect
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+# Границы корзин гистограмм по умолчанию, в секундах.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Распределение наблюдаемых значений по корзинам.
+
+    В снимке корзины накопительные, как в Prometheus: значение корзины
+    ``le`` — число наблюдений, не превышающих ``le``.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self._counts, strict=True):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class MetricsRegistry:
+    """
+    Простой внутрипроцессный реестр метрик воркера.
+
+    Счётчики и гистограммы пополняются кодом приложения, а значения
+    датчиков (gauge) вычисляются в момент снятия снимка.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._histograms: Dict[str, Histogram] = {}
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Увеличивает счётчик.
+
+        Args:
+            name (str): Имя счётчика.
+            value (int): Величина приращения.
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """
+        Добавляет наблюдение в гистограмму.
+
+        Args:
+            name (str): Имя гистограммы.
+            value (float): Наблюдаемое значение, например длительность в секундах.
+            buckets (tuple): Границы корзин; учитываются при первом наблюдении.
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def register_gauge(self, name: str, callback: Callable[[], float]) -> None:
+        """
+        Регистрирует датчик, значение которого вычисляется при снятии снимка.
+
+        Args:
+            name (str): Имя датчика.
+            callback (Callable): Функция, возвращающая текущее значение.
+        """
+        with self._lock:
+            self._gauges[name] = callback
+
+    def get_counter(self, name: str) -> int:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        """
+        Возвращает текущие значения всех метрик.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {name: histogram.snapshot() for name, histogram in self._histograms.items()}
+        return {
+            "counters": counters,
+            "gauges": {name: callback() for name, callback in gauges.items()},
+            "histograms": histograms,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+metrics = MetricsRegistry()
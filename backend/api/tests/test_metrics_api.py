@@ -0,0 +1,49 @@
+import pytest
+from django.urls import reverse
+
+from api.services.metrics_service import MetricsRegistry, metrics
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_registry_counters_and_gauges(registry):
+    registry.increment("requests_total")
+    registry.increment("requests_total", 2)
+    registry.register_gauge("pool_size", lambda: 4)
+
+    assert registry.get_counter("requests_total") == 3
+    assert registry.snapshot() == {"counters": {"requests_total": 3}, "gauges": {"pool_size": 4}, "histograms": {}}
+
+    registry.reset()
+    assert registry.get_counter("requests_total") == 0
+
+
+def test_registry_histogram_buckets_are_cumulative(registry):
+    for value in (0.05, 0.2, 3):
+        registry.observe("connect_seconds", value, buckets=(0.1, 1))
+
+    assert registry.snapshot()["histograms"] == {
+        "connect_seconds": {"buckets": {"0.1": 1, "1": 2, "+Inf": 3}, "count": 3, "sum": 3.25},
+    }
+
+
+@pytest.mark.django_db
+def test_metrics_admin(api_client, admin_user):
+    api_client.force_authenticate(user=admin_user)
+    metrics.increment("test_metrics_admin_total")
+
+    resp = api_client.get(reverse("metrics"))
+    assert resp.status_code == 200
+    assert resp.data["counters"]["test_metrics_admin_total"] >= 1
+    assert "gauges" in resp.data
+
+
+@pytest.mark.django_db
+def test_metrics_non_admin(api_client, user):
+    api_client.force_authenticate(user=user)
+
+    resp = api_client.get(reverse("metrics"))
+    assert resp.status_code == 403
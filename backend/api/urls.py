@@ -1,7 +1,10 @@
 from django.urls import include, path
 
+from api.views import MetricsView
+
 urlpatterns = [
     path("user/", include("users.urls")),
     path("room/", include("rooms.urls")),
     path("voting/", include("votings.urls")),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
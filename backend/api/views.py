@@ -0,0 +1,21 @@
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.services.metrics_service import metrics
+
+
+@extend_schema(
+    operation_id="getMetrics",
+    summary="Метрики воркера",
+    description="Возвращает счётчики и датчики текущего процесса.",
+    responses={200: OpenApiTypes.OBJECT},
+    tags=["Metrics"],
+)
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics.snapshot())
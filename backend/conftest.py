@@ -1,11 +1,13 @@
-import threading
 from uuid import uuid4
+from weakref import WeakKeyDictionary
 
+import fakeredis
 import pytest
 from api.services.jwt_service import JWTService
 from channels.routing import URLRouter
 from django.contrib.auth import get_user_model
 from django.urls import re_path
+from redis.connection import AbstractConnection
 from rest_framework.test import APIClient
 from ws.consumers import RoomConsumer
 
@@ -70,56 +72,49 @@ def room_url_router():
     )
     return application
 
-class _FakeLock:
-    def __init__(self, lock: threading.Lock):
-        self._lock = lock
+@pytest.fixture(autouse=True)
+def room_broadcast_sender(monkeypatch):
+    import rooms.services.message_senders.coalescing as coalescing_mod
 
-    def __enter__(self):
-        self._lock.acquire()
-        return self
+    monkeypatch.setattr(coalescing_mod, "_room_broadcast_sender", None)
+    yield
+    sender = coalescing_mod._room_broadcast_sender
+    if sender is not None:
+        # Отложенная отправка не должна сработать после теста.
+        for group_name in list(sender._buffers):
+            sender._take_buffer(group_name)
 
-    def __exit__(self, exc_type, exc, tb):
-        self._lock.release()
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    server = fakeredis.FakeServer()
+    fake = fakeredis.FakeRedis(server=server)
+
+    import rooms.services.redis_client as redis_client_mod
+    monkeypatch.setattr(redis_client_mod, "get_redis_connection", lambda alias="default": fake)
+    monkeypatch.setattr(redis_client_mod, "_create_async_redis_client", lambda: fakeredis.FakeAsyncRedis(server=server))
+    monkeypatch.setattr(redis_client_mod, "_async_clients", WeakKeyDictionary())
+    yield fake
+    fake.flushall()
 
-class FakeCache:
+class RedisTraffic:
     def __init__(self):
-        self._store: dict = {}
-        self._locks: dict[str, threading.Lock] = {}
-        self._global_lock = threading.Lock()
-
-    def _get_lock(self, key: str) -> threading.Lock:
-        with self._global_lock:
-            if key not in self._locks:
-                self._locks[key] = threading.Lock()
-            return self._locks[key]
-
-    def lock(self, key: str):
-        return _FakeLock(self._get_lock(key))
-
-    def set(self, key: str, value, timeout=None):
-        self._store[key] = value
+        self.round_trips = 0
+        self.bytes_sent = 0
 
-    def get(self, key: str, default=None):
-        return self._store.get(key, default)
-
-    def get_many(self, keys):
-        return {k: self._store[k] for k in keys if k in self._store}
-
-    def delete(self, key: str):
-        self._store.pop(key, None)
-
-    def touch(self, key: str, timeout):
-        return
-
-    def flushall(self):
-        self._store.clear()
-        self._locks.clear()
+    def reset(self):
+        self.round_trips = 0
+        self.bytes_sent = 0
 
 @pytest.fixture
-def fake_cache(monkeypatch):
-    fake = FakeCache()
-
-    import rooms.services.room_cache_service as room_cache_mod
-    monkeypatch.setattr(room_cache_mod, "cache", fake)
-    yield fake
-    fake.flushall()
+def redis_traffic(monkeypatch):
+    traffic = RedisTraffic()
+    original_send = AbstractConnection.send_packed_command
+
+    def counting_send(self, command, check_health=True):
+        traffic.round_trips += 1
+        chunks = [command] if isinstance(command, (bytes, str)) else command
+        traffic.bytes_sent += sum(len(chunk) for chunk in chunks)
+        return original_send(self, command, check_health)
+
+    monkeypatch.setattr(AbstractConnection, "send_packed_command", counting_send)
+    return traffic
@@ -6,6 +6,7 @@ from django.utils.safestring import mark_safe
 from votings.models import Voting
 
 from rooms.models import Room
+from rooms.services.room_admission_cache import RoomAdmissionCache
 
 
 @admin.register(Room)
@@ -19,6 +20,21 @@ class RoomAdmin(admin.ModelAdmin):
     view_history.allow_tags = True
     view_history.short_description = "История голосований"
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        RoomAdmissionCache.set_active(obj.id, obj.active)
+
+    def delete_model(self, request, obj):
+        room_id = obj.id
+        super().delete_model(request, obj)
+        RoomAdmissionCache.set_active(room_id, False)
+
+    def delete_queryset(self, request, queryset):
+        room_ids = list(queryset.values_list("id", flat=True))
+        super().delete_queryset(request, queryset)
+        for room_id in room_ids:
+            RoomAdmissionCache.set_active(room_id, False)
+
 
 def voting_history_view(request, room_id):
     room = get_object_or_404(Room, id=room_id)
@@ -11,5 +11,8 @@ class Room(models.Model):
         return self.name
 
     def reset_to_default(self):
+        from rooms.services.room_admission_cache import RoomAdmissionCache
+
         self.active = True
         self.save()
+        RoomAdmissionCache.set_active(self.id, True)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from votings.models import Voting
+from votings.services.active_voting_service import ActiveVotingCache
 
 from rooms.models import Room
 
@@ -18,8 +18,5 @@ class RoomDetailSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "active_voting_id", "active"]
 
     def get_active_voting_id(self, obj) -> int | None:
-        voting = Voting.objects.filter(
-            room=obj,
-            active=True,
-        ).first()
-        return voting.id if voting else None
+        voting = ActiveVotingCache.get(obj.id)
+        return voting["id"] if voting else None
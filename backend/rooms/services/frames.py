@@ -0,0 +1,62 @@
+"""
+Однократная сериализация групповых сообщений.
+
+Отправитель кодирует сообщение в JSON один раз и кладёт готовый текстовый
+кадр в событие канального слоя; потребители пересылают кадр клиенту как
+есть, вместо того чтобы сериализовать одно и то же событие на каждом сокете.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson не установлен
+    orjson = None
+
+FRAME_KEY = "frame"
+
+
+def dumps(message: dict) -> str:
+    """
+    Кодирует сообщение в JSON, используя orjson, если он доступен.
+
+    :param message: Сообщение.
+    :return: JSON-строка.
+    """
+    if orjson is not None:
+        return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(message)
+
+
+def encode_frame(message: dict) -> dict:
+    """
+    Возвращает событие канального слоя с заранее закодированным кадром.
+
+    Сообщения без типа и уже закодированные события возвращаются без изменений.
+
+    :param message: Сообщение для группы.
+    :return: Событие ``{"type": ..., "frame": "<json>"}``.
+    """
+    if "type" not in message or FRAME_KEY in message:
+        return message
+    return {"type": message["type"], FRAME_KEY: dumps(message)}
+
+
+def frame_text(event: dict) -> str:
+    """
+    Возвращает текст кадра для отправки клиенту.
+
+    :param event: Событие канального слоя.
+    :return: Готовый кадр или сериализованное событие, если кадра нет.
+    """
+    frame = event.get(FRAME_KEY)
+    return frame if frame is not None else dumps(event)
+
+
+def frame_payload(event: dict) -> dict:
+    """
+    Возвращает содержимое события в виде словаря.
+
+    :param event: Событие канального слоя.
+    """
+    frame = event.get(FRAME_KEY)
+    return json.loads(frame) if frame is not None else event
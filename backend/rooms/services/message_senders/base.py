@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
 
+from rooms.services.redis_executor import redis_sync_to_async
+
 
 class MessageSender(ABC):
     @abstractmethod
@@ -12,3 +14,37 @@ class MessageSender(ABC):
             message (dict): Сообщение, которое нужно отправить.
         """
         pass
+
+    async def asend(self, group_name: str, message: dict) -> None:
+        """
+        Асинхронно отправляет сообщение в указанную группу.
+
+        Реализация по умолчанию выполняет send в пуле потоков для блокирующих
+        вызовов; отправители, умеющие работать внутри event loop,
+        переопределяют этот метод.
+
+        Args:
+            group_name (str): Имя группы.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        await redis_sync_to_async(self.send)(group_name, message)
+
+    def send_to_channel(self, channel_name: str, message: dict) -> None:
+        """
+        Отправляет сообщение в конкретный канал.
+
+        Args:
+            channel_name (str): Имя канала.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support channel delivery")
+
+    async def asend_to_channel(self, channel_name: str, message: dict) -> None:
+        """
+        Асинхронно отправляет сообщение в конкретный канал.
+
+        Args:
+            channel_name (str): Имя канала.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        await redis_sync_to_async(self.send_to_channel)(channel_name, message)
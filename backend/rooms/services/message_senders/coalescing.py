@@ -0,0 +1,197 @@
+import asyncio
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, Hashable, List, Set
+
+from api.services.metrics_service import metrics
+from django.conf import settings
+
+from rooms.services.message_senders.base import MessageSender
+from rooms.services.message_senders.django_channel import DjangoChannelMessageSender
+
+
+class CoalescingMessageSender(MessageSender):
+    """
+    Отправитель, который схлопывает устаревающие сообщения группы.
+
+    Сообщения, описывающие текущее состояние (список проголосовавших,
+    онлайн-статус пользователя), копятся в буфере группы в течение окна
+    и отправляются одной пачкой; из нескольких сообщений с одним ключом
+    отправляется только последнее. Остальные сообщения отправляются сразу,
+    но перед ними сбрасывается буфер группы, чтобы не нарушить порядок.
+
+    Буфер, начатый синхронным send, сбрасывается по threading.Timer,
+    а начатый из event loop — задачей того же loop через asend слоя.
+    """
+
+    def __init__(self, sender: MessageSender, window: float = 0.05):
+        """
+        Args:
+            sender (MessageSender): Отправитель, через которого уходят сообщения.
+            window (float): Окно накопления в секундах. 0 — без накопления.
+        """
+        self._sender = sender
+        self._window = window
+        self._lock = threading.Lock()
+        self._group_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._buffers: Dict[str, OrderedDict[Hashable, dict]] = {}
+        self._timers: Dict[str, threading.Timer | asyncio.TimerHandle] = {}
+        self._flush_tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _coalesce_key(message: dict) -> Hashable | None:
+        """
+        Возвращает ключ, по которому сообщение замещает предыдущие, или None.
+
+        Args:
+            message (dict): Сообщение.
+        """
+        message_type = message.get("type")
+        if message_type == "voted_users_update":
+            return message_type
+        if message_type in ("user_online", "user_offline"):
+            return "presence", next(iter(message["user"]))
+        return None
+
+    def send(self, group_name: str, message: dict) -> None:
+        """
+        Отправляет сообщение в группу, схлопывая замещаемые сообщения.
+
+        Args:
+            group_name (str): Имя группы.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        key = self._coalesce_key(message)
+        if key is None or self._window <= 0:
+            with self._group_lock(group_name):
+                self._flush_group(group_name)
+                self._sender.send(group_name, message)
+            return
+
+        with self._lock:
+            if self._buffer(group_name, key, message):
+                timer = threading.Timer(self._window, self.flush, args=(group_name,))
+                timer.daemon = True
+                self._timers[group_name] = timer
+                timer.start()
+
+    async def asend(self, group_name: str, message: dict) -> None:
+        """
+        Асинхронно отправляет сообщение в группу, схлопывая замещаемые сообщения.
+
+        Замещаемые сообщения только попадают в буфер, а сброс буфера
+        планируется в текущем event loop; остальные отправляются через
+        asend вместе с накопленным буфером группы.
+
+        Args:
+            group_name (str): Имя группы.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        key = self._coalesce_key(message)
+        if key is None or self._window <= 0:
+            await self.aflush(group_name)
+            await self._sender.asend(group_name, message)
+            return
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._buffer(group_name, key, message):
+                self._timers[group_name] = loop.call_later(self._window, self._start_aflush, group_name)
+
+    def send_to_channel(self, channel_name: str, message: dict) -> None:
+        """
+        Отправляет сообщение в канал без накопления.
+
+        Args:
+            channel_name (str): Имя канала.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        self._sender.send_to_channel(channel_name, message)
+
+    async def asend_to_channel(self, channel_name: str, message: dict) -> None:
+        """
+        Асинхронно отправляет сообщение в канал без накопления.
+
+        Args:
+            channel_name (str): Имя канала.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        await self._sender.asend_to_channel(channel_name, message)
+
+    def flush(self, group_name: str) -> None:
+        """
+        Немедленно отправляет накопленные сообщения группы.
+
+        Args:
+            group_name (str): Имя группы.
+        """
+        with self._group_lock(group_name):
+            self._flush_group(group_name)
+
+    async def aflush(self, group_name: str) -> None:
+        """
+        Немедленно отправляет накопленные сообщения группы через asend.
+
+        Args:
+            group_name (str): Имя группы.
+        """
+        for message in self._take_buffer(group_name):
+            await self._sender.asend(group_name, message)
+
+    def _start_aflush(self, group_name: str) -> None:
+        task = asyncio.get_running_loop().create_task(self.aflush(group_name))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    def _buffer(self, group_name: str, key: Hashable, message: dict) -> bool:
+        """
+        Кладёт сообщение в буфер группы и возвращает True, если сброс буфера
+        ещё не запланирован. Вызывается под self._lock.
+
+        Args:
+            group_name (str): Имя группы.
+            key (Hashable): Ключ замещения сообщения.
+            message (dict): Сообщение.
+        """
+        buffer = self._buffers.setdefault(group_name, OrderedDict())
+        if buffer.pop(key, None) is not None:
+            metrics.increment("broadcast_coalesced_total")
+        buffer[key] = message
+        return group_name not in self._timers
+
+    def _group_lock(self, group_name: str) -> threading.Lock:
+        with self._lock:
+            return self._group_locks[group_name]
+
+    def _take_buffer(self, group_name: str) -> List[dict]:
+        with self._lock:
+            buffer = self._buffers.pop(group_name, None)
+            timer = self._timers.pop(group_name, None)
+
+        if timer is not None:
+            timer.cancel()
+        return list((buffer or {}).values())
+
+    def _flush_group(self, group_name: str) -> None:
+        for message in self._take_buffer(group_name):
+            self._sender.send(group_name, message)
+
+
+_room_broadcast_sender: CoalescingMessageSender | None = None
+_room_broadcast_sender_lock = threading.Lock()
+
+
+def get_room_broadcast_sender() -> CoalescingMessageSender:
+    """
+    Возвращает общий для процесса отправитель групповых сообщений комнат.
+
+    Окно накопления задаётся настройкой BROADCAST_COALESCE_WINDOW_MS.
+    """
+    global _room_broadcast_sender
+    with _room_broadcast_sender_lock:
+        if _room_broadcast_sender is None:
+            _room_broadcast_sender = CoalescingMessageSender(
+                DjangoChannelMessageSender(),
+                window=settings.BROADCAST_COALESCE_WINDOW_MS / 1000,
+            )
+        return _room_broadcast_sender
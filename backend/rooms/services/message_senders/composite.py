@@ -24,3 +24,36 @@ class CompositeMessageSender(MessageSender):
         """
         for sender in self._senders:
             sender.send(group_name, message)
+
+    async def asend(self, group_name: str, message: dict) -> None:
+        """
+        Асинхронно отправляет сообщение через всех зарегистрированных отправителей.
+
+        Args:
+            group_name (str): Имя группы.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        for sender in self._senders:
+            await sender.asend(group_name, message)
+
+    def send_to_channel(self, channel_name: str, message: dict) -> None:
+        """
+        Отправляет сообщение в канал через всех зарегистрированных отправителей.
+
+        Args:
+            channel_name (str): Имя канала.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        for sender in self._senders:
+            sender.send_to_channel(channel_name, message)
+
+    async def asend_to_channel(self, channel_name: str, message: dict) -> None:
+        """
+        Асинхронно отправляет сообщение в канал через всех зарегистрированных отправителей.
+
+        Args:
+            channel_name (str): Имя канала.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        for sender in self._senders:
+            await sender.asend_to_channel(channel_name, message)
@@ -1,6 +1,7 @@
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
+from rooms.services.frames import encode_frame
 from rooms.services.message_senders.base import MessageSender
 
 
@@ -14,4 +15,34 @@ class DjangoChannelMessageSender(MessageSender):
             message (dict): Сообщение, которое нужно отправить.
         """
         channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(group_name, message)
+        async_to_sync(channel_layer.group_send)(group_name, encode_frame(message))
+
+    async def asend(self, group_name: str, message: dict) -> None:
+        """
+        Отправляет сообщение в группу из event loop без перехода в поток.
+
+        Args:
+            group_name (str): Имя группы.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        await get_channel_layer().group_send(group_name, encode_frame(message))
+
+    def send_to_channel(self, channel_name: str, message: dict) -> None:
+        """
+        Отправляет сообщение в конкретный канал через Django Channels.
+
+        Args:
+            channel_name (str): Имя канала.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        async_to_sync(get_channel_layer().send)(channel_name, encode_frame(message))
+
+    async def asend_to_channel(self, channel_name: str, message: dict) -> None:
+        """
+        Отправляет сообщение в конкретный канал из event loop.
+
+        Args:
+            channel_name (str): Имя канала.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        await get_channel_layer().send(channel_name, encode_frame(message))
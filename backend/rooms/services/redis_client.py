@@ -0,0 +1,39 @@
+import asyncio
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+_async_clients: "WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncRedis]" = WeakKeyDictionary()
+
+
+def get_redis_client() -> Redis:
+    """
+    Возвращает «сырой» клиент Redis из пула соединений django-redis.
+
+    Нужен там, где возможностей Django cache API недостаточно:
+    хэши, множества, пайплайны и серверные скрипты.
+    """
+    return get_redis_connection("default")
+
+
+def _create_async_redis_client() -> AsyncRedis:
+    return AsyncRedis.from_url(settings.REDIS_URL)
+
+
+def get_async_redis_client() -> AsyncRedis:
+    """
+    Возвращает асинхронный клиент Redis для текущего event loop.
+
+    Клиент и его пул соединений создаются один раз на event loop и
+    переиспользуются всеми потребителями воркера: соединения redis.asyncio
+    привязаны к циклу, в котором были открыты.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _create_async_redis_client()
+        _async_clients[loop] = client
+    return client
@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from api.services.metrics_service import metrics
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+class MeteredThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    Пул потоков, который считает задачи в очереди и в работе.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = ""):
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.max_workers = max_workers
+        self._state_lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    @property
+    def active_count(self) -> int:
+        return self._active
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        with self._state_lock:
+            self._queued += 1
+        metrics.increment("redis_executor_tasks_total")
+
+        def run():
+            with self._state_lock:
+                self._queued -= 1
+                self._active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._state_lock:
+                    self._active -= 1
+
+        return super().submit(run)
+
+
+_executor: MeteredThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_redis_executor() -> MeteredThreadPoolExecutor:
+    """
+    Возвращает выделенный пул потоков для блокирующих вызовов Redis.
+
+    Размер пула задаётся настройкой REDIS_EXECUTOR_MAX_WORKERS.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = MeteredThreadPoolExecutor(
+                max_workers=settings.REDIS_EXECUTOR_MAX_WORKERS,
+                thread_name_prefix="redis",
+            )
+            metrics.register_gauge("redis_executor_pool_size", lambda: _executor.max_workers)
+            metrics.register_gauge("redis_executor_queue_depth", lambda: _executor.queue_depth)
+            metrics.register_gauge("redis_executor_active", lambda: _executor.active_count)
+        return _executor
+
+
+def redis_sync_to_async(func: Callable) -> Callable:
+    """
+    Оборачивает блокирующий вызов Redis для использования из event loop.
+
+    В отличие от sync_to_async по умолчанию (thread_sensitive=True), вызовы
+    не выстраиваются в очередь к единственному общему потоку, а выполняются
+    в выделенном пуле. Подходит только для операций без обращения к ORM:
+    запросы к базе данных по-прежнему должны идти через database_sync_to_async.
+    """
+    return sync_to_async(func, thread_sensitive=False, executor=get_redis_executor())
@@ -0,0 +1,293 @@
+"""
+Lua-скрипты, выполняемые на стороне Redis.
+
+Каждый скрипт выполняется атомарно, поэтому несколько связанных чтений
+и записей укладываются в один сетевой запрос и не требуют блокировок.
+
+Помимо голосов скрипты поддерживают хэш-счётчик комнаты (tally) с полями
+``voters`` (число голосующих участников), ``votes`` (число поданных голосов)
+и ``sum`` (сумма голосов).
+
+Скрипты, меняющие состояние комнаты, помечают её снимок устаревшим
+(см. RoomCacheService.get_snapshot) в том же вызове.
+"""
+
+# Помечает снимок комнаты устаревшим. Ключ перезаписывается, а не
+# удаляется: запись прерывает WATCH читателя, который пересобирает снимок.
+_MARK_SNAPSHOT_STALE = """
+local function mark_snapshot_stale(snapshot_key, ttl)
+    redis.call("SET", snapshot_key, "", "EX", ttl)
+end
+"""
+
+# Общая часть скриптов записи голоса: обновляет голос и счётчики комнаты.
+_RECORD_VOTE = _MARK_SNAPSHOT_STALE + """
+local function record_vote(votes_key, tally_key, uuid, user, vote, ttl)
+    local previous = redis.call("HGET", votes_key, uuid)
+    if previous then
+        redis.call("HINCRBY", tally_key, "sum", vote - cjson.decode(previous)["vote"])
+    else
+        redis.call("HINCRBY", tally_key, "votes", 1)
+        redis.call("HINCRBY", tally_key, "sum", vote)
+    end
+    redis.call("HSET", votes_key, uuid, cjson.encode({nickname = user["nickname"], vote = vote}))
+    redis.call("EXPIRE", votes_key, ttl)
+    redis.call("EXPIRE", tally_key, ttl)
+end
+"""
+
+# Записывает голос пользователя.
+#
+# KEYS[1] - данные пользователя
+# KEYS[2] - хэш голосов комнаты
+# KEYS[3] - счётчики комнаты
+# KEYS[4] - снимок комнаты
+# ARGV[1] - UUID пользователя
+# ARGV[2] - значение голоса
+# ARGV[3] - TTL ключей комнаты (секунды)
+#
+# Возвращает -1 если пользователь не найден, -2 если он не голосующий, иначе 0.
+SET_VOTE = _RECORD_VOTE + """
+local raw_user = redis.call("GET", KEYS[1])
+if not raw_user then
+    return -1
+end
+
+local user = cjson.decode(raw_user)
+if user["role"] ~= "voter" then
+    return -2
+end
+
+record_vote(KEYS[2], KEYS[3], ARGV[1], user, tonumber(ARGV[2]), ARGV[3])
+mark_snapshot_stale(KEYS[4], ARGV[3])
+return 0
+"""
+
+# Записывает голос и проверяет, проголосовали ли все участники.
+#
+# KEYS[1] - множество участников комнаты
+# KEYS[2] - хэш голосов комнаты
+# KEYS[3] - данные голосующего пользователя
+# KEYS[4] - счётчики комнаты
+# KEYS[5] - снимок комнаты
+# ARGV[1] - UUID пользователя
+# ARGV[2] - значение голоса
+# ARGV[3] - TTL ключей комнаты (секунды)
+#
+# Возвращает {-1} если пользователя нет в комнате, {-2} если он не голосующий,
+# {0} если голосование продолжается и {1, uuid, vote_json, ...} если все проголосовали.
+SUBMIT_VOTE = _RECORD_VOTE + """
+if redis.call("SISMEMBER", KEYS[1], ARGV[1]) == 0 then
+    return {-1}
+end
+
+local raw_user = redis.call("GET", KEYS[3])
+if not raw_user then
+    return {-1}
+end
+
+local user = cjson.decode(raw_user)
+if user["role"] ~= "voter" then
+    return {-2}
+end
+
+record_vote(KEYS[2], KEYS[4], ARGV[1], user, tonumber(ARGV[2]), ARGV[3])
+mark_snapshot_stale(KEYS[5], ARGV[3])
+
+local tally = redis.call("HMGET", KEYS[4], "voters", "votes")
+if tonumber(tally[1] or 0) ~= tonumber(tally[2] or 0) then
+    return {0}
+end
+
+local result = {1}
+for _, item in ipairs(redis.call("HGETALL", KEYS[2])) do
+    table.insert(result, item)
+end
+return result
+"""
+
+# Удаляет голос пользователя.
+#
+# KEYS[1] - хэш голосов комнаты
+# KEYS[2] - счётчики комнаты
+# KEYS[3] - снимок комнаты
+# ARGV[1] - UUID пользователя
+# ARGV[2] - TTL ключей комнаты (секунды)
+REMOVE_VOTE = _MARK_SNAPSHOT_STALE + """
+local previous = redis.call("HGET", KEYS[1], ARGV[1])
+if previous then
+    redis.call("HDEL", KEYS[1], ARGV[1])
+    redis.call("HINCRBY", KEYS[2], "votes", -1)
+    redis.call("HINCRBY", KEYS[2], "sum", -cjson.decode(previous)["vote"])
+    mark_snapshot_stale(KEYS[3], ARGV[2])
+end
+return 0
+"""
+
+# Удаляет пользователя из комнаты.
+#
+# KEYS[1] - множество участников комнаты
+# KEYS[2] - данные пользователя
+# KEYS[3] - счётчики комнаты
+# KEYS[4] - снимок комнаты
+# ARGV[1] - UUID пользователя
+# ARGV[2] - TTL ключей комнаты (секунды)
+REMOVE_USER = _MARK_SNAPSHOT_STALE + """
+local raw_user = redis.call("GET", KEYS[2])
+if redis.call("SREM", KEYS[1], ARGV[1]) == 1 and raw_user and cjson.decode(raw_user)["role"] == "voter" then
+    redis.call("HINCRBY", KEYS[3], "voters", -1)
+end
+redis.call("DEL", KEYS[2])
+mark_snapshot_stale(KEYS[4], ARGV[2])
+return 0
+"""
+
+# Продлевает TTL ключей комнаты и данных всех её участников.
+#
+# KEYS    - ключи комнаты; KEYS[1] - множество участников комнаты
+# ARGV[1] - TTL (секунды)
+# ARGV[2] - префикс ключей данных пользователей
+REFRESH_ROOM_TTL = """
+for _, key in ipairs(KEYS) do
+    redis.call("EXPIRE", key, ARGV[1])
+end
+for _, uuid in ipairs(redis.call("SMEMBERS", KEYS[1])) do
+    redis.call("EXPIRE", ARGV[2] .. uuid .. ":data", ARGV[1])
+end
+return 0
+"""
+
+# Переносит пользователя и его голос из одной комнаты в другую.
+#
+# KEYS[1] - множество участников исходной комнаты
+# KEYS[2] - хэш голосов исходной комнаты
+# KEYS[3] - счётчики исходной комнаты
+# KEYS[4] - множество участников целевой комнаты
+# KEYS[5] - хэш голосов целевой комнаты
+# KEYS[6] - счётчики целевой комнаты
+# KEYS[7] - данные пользователя
+# KEYS[8] - снимок исходной комнаты
+# KEYS[9] - снимок целевой комнаты
+# ARGV[1] - UUID пользователя
+# ARGV[2] - TTL ключей целевой комнаты (секунды)
+#
+# Возвращает -1 если пользователя нет в исходной комнате, иначе 0.
+MOVE_USER = _MARK_SNAPSHOT_STALE + """
+local raw_user = redis.call("GET", KEYS[7])
+if not raw_user or redis.call("SREM", KEYS[1], ARGV[1]) == 0 then
+    return -1
+end
+
+local is_voter = cjson.decode(raw_user)["role"] == "voter"
+if is_voter then
+    redis.call("HINCRBY", KEYS[3], "voters", -1)
+end
+
+if redis.call("SADD", KEYS[4], ARGV[1]) == 1 and is_voter then
+    redis.call("HINCRBY", KEYS[6], "voters", 1)
+end
+
+local raw_vote = redis.call("HGET", KEYS[2], ARGV[1])
+if raw_vote then
+    local vote = cjson.decode(raw_vote)["vote"]
+    redis.call("HDEL", KEYS[2], ARGV[1])
+    redis.call("HINCRBY", KEYS[3], "votes", -1)
+    redis.call("HINCRBY", KEYS[3], "sum", -vote)
+
+    local previous = redis.call("HGET", KEYS[5], ARGV[1])
+    if previous then
+        redis.call("HINCRBY", KEYS[6], "sum", vote - cjson.decode(previous)["vote"])
+    else
+        redis.call("HINCRBY", KEYS[6], "votes", 1)
+        redis.call("HINCRBY", KEYS[6], "sum", vote)
+    end
+    redis.call("HSET", KEYS[5], ARGV[1], raw_vote)
+end
+
+for i = 4, 7 do
+    redis.call("EXPIRE", KEYS[i], ARGV[2])
+end
+mark_snapshot_stale(KEYS[8], ARGV[2])
+mark_snapshot_stale(KEYS[9], ARGV[2])
+return 0
+"""
+
+# Запускает таймер комнаты, если он ещё не запущен, и ставит его срок
+# в общее расписание.
+#
+# KEYS[1] - ключ таймера комнаты
+# KEYS[2] - расписание таймеров (sorted set: комната -> время окончания)
+# KEYS[3] - снимок комнаты
+# ARGV[1] - время окончания (timestamp)
+# ARGV[2] - время жизни таймера (миллисекунды)
+# ARGV[3] - ID комнаты
+# ARGV[4] - TTL ключей комнаты (секунды)
+#
+# Возвращает 0 если таймер уже запущен, иначе 1.
+START_TIMER = _MARK_SNAPSHOT_STALE + """
+if not redis.call("SET", KEYS[1], ARGV[1], "NX", "PX", ARGV[2]) then
+    return 0
+end
+redis.call("ZADD", KEYS[2], ARGV[1], ARGV[3])
+mark_snapshot_stale(KEYS[3], ARGV[4])
+return 1
+"""
+
+# Забирает из расписания (таймеров комнат или переходов в офлайн) записи,
+# срок которых наступил. Каждая запись удаляется в том же вызове, поэтому
+# её получает только один воркер.
+#
+# KEYS[1] - расписание
+# ARGV[1] - текущее время (timestamp)
+# ARGV[2] - максимальное число записей
+#
+# Возвращает плоский список [запись, срок, ...].
+CLAIM_DUE_TIMERS = """
+local due = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "WITHSCORES", "LIMIT", 0, ARGV[2])
+for i = 1, #due, 2 do
+    redis.call("ZREM", KEYS[1], due[i])
+end
+return due
+"""
+
+# Захватывает право подвести итоги текущего раунда голосования.
+#
+# Версия итогов — «ID голосования:раунд», где раунд хранится в поле
+# ``round`` счётчиков комнаты и увеличивается при каждой очистке голосов.
+#
+# KEYS[1] - счётчики комнаты
+# KEYS[2] - сохранённые итоги комнаты
+# KEYS[3] - ключ захвата
+# ARGV[1] - ID голосования
+# ARGV[2] - время жизни захвата (миллисекунды)
+#
+# Возвращает {1, итоги} если итоги этой версии уже сохранены,
+# {0, версия} если захват получен, иначе {2, версия}.
+CLAIM_RESULTS = """
+local version = ARGV[1] .. ":" .. (redis.call("HGET", KEYS[1], "round") or "0")
+
+local cached = redis.call("GET", KEYS[2])
+if cached and cjson.decode(cached)["version"] == version then
+    return {1, cached}
+end
+
+if redis.call("SET", KEYS[3], version, "NX", "PX", ARGV[2]) then
+    return {0, version}
+end
+return {2, version}
+"""
+
+# Запоминает статус комнаты, прочитанный из базы, если он ещё неизвестен.
+# Статус, записанный при изменении комнаты, не перезаписывается.
+#
+# KEYS[1] - битовая карта известных комнат
+# KEYS[2] - битовая карта активных комнат
+# ARGV[1] - ID комнаты
+# ARGV[2] - 1 если комната активна, иначе 0
+FILL_ROOM_ADMISSION = """
+if redis.call("GETBIT", KEYS[1], ARGV[1]) == 0 then
+    redis.call("SETBIT", KEYS[2], ARGV[1], ARGV[2])
+    redis.call("SETBIT", KEYS[1], ARGV[1], 1)
+end
+return 0
+"""
@@ -0,0 +1,79 @@
+from rooms.models import Room
+from rooms.services import redis_scripts
+from rooms.services.redis_client import get_async_redis_client, get_redis_client
+
+
+class BaseRoomAdmissionCache:
+    """
+    Кэш допуска к комнате: существует ли комната и активна ли она.
+
+    Хранится в двух битовых картах Redis, где номер бита — ID комнаты:
+    ``room_admission:known`` отмечает комнаты с известным статусом,
+    ``room_admission:active`` — активные. Подключение к комнате читает
+    оба бита одним запросом и не обращается к базе данных.
+
+    Изменение комнаты (удаление, reset_to_default, правка в админке)
+    записывает статус сразу; промах заполняется из базы скриптом, который
+    не трогает уже известный статус, поэтому медленное чтение из базы не
+    перезапишет более новое изменение.
+    """
+
+    _KNOWN_KEY = "room_admission:known"
+    _ACTIVE_KEY = "room_admission:active"
+    # Максимальное смещение бита в Redis.
+    _MAX_ROOM_ID = 2 ** 32 - 1
+
+    @classmethod
+    def _is_cacheable(cls, room_id: int) -> bool:
+        return 0 <= room_id <= cls._MAX_ROOM_ID
+
+    @staticmethod
+    def _queryset(room_id: int):
+        return Room.objects.filter(id=room_id, active=True)
+
+
+class RoomAdmissionCache(BaseRoomAdmissionCache):
+    @classmethod
+    def set_active(cls, room_id: int, active: bool) -> None:
+        """
+        Записывает статус комнаты.
+
+        :param room_id: ID комнаты.
+        :param active: Активна ли комната; False для удалённой комнаты.
+        """
+        if not cls._is_cacheable(room_id):
+            return
+        pipe = get_redis_client().pipeline()
+        pipe.setbit(cls._ACTIVE_KEY, room_id, int(active))
+        pipe.setbit(cls._KNOWN_KEY, room_id, 1)
+        pipe.execute()
+
+
+class AsyncRoomAdmissionCache(BaseRoomAdmissionCache):
+    @classmethod
+    async def is_active(cls, room_id: int) -> bool:
+        """
+        Проверяет, что комната существует и активна.
+
+        :param room_id: ID комнаты.
+        """
+        if not cls._is_cacheable(room_id):
+            return await cls._queryset(room_id).aexists()
+
+        pipe = get_async_redis_client().pipeline(transaction=False)
+        pipe.getbit(cls._KNOWN_KEY, room_id)
+        pipe.getbit(cls._ACTIVE_KEY, room_id)
+        known, active = await pipe.execute()
+        if known:
+            return bool(active)
+
+        active = await cls._queryset(room_id).aexists()
+        await cls._fill(room_id, active)
+        return active
+
+    @classmethod
+    async def _fill(cls, room_id: int, active: bool) -> None:
+        await get_async_redis_client().register_script(redis_scripts.FILL_ROOM_ADMISSION)(
+            keys=[cls._KNOWN_KEY, cls._ACTIVE_KEY],
+            args=[room_id, int(active)],
+        )
@@ -1,23 +1,112 @@
+import json
 from datetime import datetime, timezone
-from typing import Dict, List, TypedDict
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, TypedDict, TypeVar
 from uuid import UUID
 
-from django.core.cache import cache
+from api.services.metrics_service import metrics
+from redis import Redis, WatchError
+from redis.asyncio import Redis as AsyncRedis
+from redis.asyncio.client import Pipeline as AsyncPipeline
+from redis.client import Pipeline
+from redis.commands.core import AsyncScript, Script
 from rest_framework.exceptions import ValidationError
 from users.enums import UserRole
 
+from rooms.services import redis_scripts
+from rooms.services.redis_client import get_async_redis_client, get_redis_client
+from rooms.services.room_state_cache import INVALIDATION_CHANNEL, get_room_state_cache
+
 
 class UserData(TypedDict):
     role: UserRole
     nickname: str | None
 
-class RoomCacheService:
+class VoteTally(TypedDict):
+    voters: int
+    votes: int
+    sum: int
+
+class VoteRejectedError(ValueError):
+    """Пользователь не найден в комнате или не имеет права голосовать."""
+
+class RoomCacheConflictError(RuntimeError):
+    """Транзакция не удалась из-за конкурентных изменений комнаты."""
+
+class TimerExistsError(ValueError):
+    """Таймер комнаты уже запущен."""
+
+class VotingResults(TypedDict):
+    version: str
+    average_score: float
+    votes: Dict[str, Dict[str, Any]]
+
+class RoomSnapshot(TypedDict):
+    type: str
+    version: int
+    participants: Dict[str, UserData]
+    offline_participants: Dict[str, UserData]
+    online: Dict[str, bool]
+    voted_users: List[str]
+    timer: float | None
+    results: Dict[str, Any] | None
+
+
+# Расписание таймеров всех комнат: sorted set с ID комнаты и временем окончания.
+TIMER_DEADLINES_KEY = "room_timers:deadlines"
+
+
+def room_snapshot_key(room_id: int | str) -> str:
+    return f"room:{room_id}:snapshot"
+
+
+def presence_key(room_id: int | str, status: str) -> str:
     """
-    Менеджер кэша для управления комнатами, пользователями и голосами.
+    Ключ множества онлайн- или офлайн-участников комнаты (см. RoomOnlineTracker).
+
+    :param room_id: ID комнаты.
+    :param status: "online" или "offline".
+    """
+    return f"online:room_{room_id}:{status}"
+
+
+T = TypeVar("T")
+
+
+class BaseRoomCacheService:
+    """
+    Общая часть синхронного и асинхронного менеджеров кэша комнаты.
 
     Ключи в кэше формируются на основе UUID комнаты и пользователей.
+    Состояние хранится в нативных структурах Redis:
+
+    * ``room:{id}:users`` — множество UUID участников комнаты;
+    * ``room:{id}:votes`` — хэш «UUID пользователя -> JSON голоса»;
+    * ``user:{uuid}:data`` — JSON с ролью и никнеймом пользователя;
+    * ``room:{id}:tally`` — счётчики голосующих, голосов и суммы голосов.
+
+    Благодаря этому голос или вход пользователя — это запись одного поля,
+    а не перезапись всей коллекции.
+
+    Составные записи (добавление пользователя, очистка комнаты) выполняются
+    оптимистичными транзакциями WATCH/MULTI: при конкурентном изменении
+    отслеживаемых ключей транзакция повторяется, но не более
+    _MAX_TRANSACTION_RETRIES раз. Для каждой операции считаются метрики
+    ``room_cache_<операция>_retries`` и ``room_cache_<операция>_aborts``.
+
+    Если включён L1-кэш (ROOM_STATE_CACHE_MAX_ROOMS), участники, голоса и
+    данные пользователей читаются через него, а каждая запись сбрасывает
+    состояние комнаты во всех процессах (см. RoomStateCache).
+
+    Для подключающихся клиентов и HTTP-запросов хранится готовый JSON-снимок
+    комнаты ``room:{id}:snapshot`` (см. get_snapshot). Каждая запись в том
+    же скрипте или транзакции заменяет его пустой строкой, а первый
+    читатель после записи собирает снимок заново.
     """
 
+    _USER_KEY_PREFIX = "user:"
+    _MAX_TRANSACTION_RETRIES = 10
+    _RESULTS_CLAIM_TTL_MS = 10_000
+
     def __init__(self, room_uuid: str, ttl: int = 60 * 60 * 5):
         """
         Инициализация менеджера кэша для конкретной комнаты.
@@ -25,18 +114,224 @@ class RoomCacheService:
         :param room_uuid: UUID комнаты.
         :param ttl: Время жизни (в секундах) записей в кэше.
         """
+        self.room_uuid = str(room_uuid)
         self.room_key = f"room:{room_uuid}"
         self.users_key = f"{self.room_key}:users"
         self.votes_key = f"{self.room_key}:votes"
         self.timer_key = f"{self.room_key}:timer"
+        self.tally_key = f"{self.room_key}:tally"
+        self.results_key = f"{self.room_key}:results"
+        self.results_claim_key = f"{self.room_key}:results_claim"
+        self.snapshot_key = room_snapshot_key(room_uuid)
+        # Участники, ушедшие в офлайн, хранятся в комнате «{id}_offline» (см. RoomOnlineTracker).
+        self.offline_users_key = f"room:{room_uuid}_offline:users"
+        self.snapshot_version_key = f"{self.room_key}:snapshot_version"
         self.ttl = ttl
 
+    @staticmethod
+    def _decode(value: bytes | str) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+    @classmethod
+    def _loads(cls, value: bytes | str | None) -> dict | None:
+        if value is None:
+            return None
+        return json.loads(cls._decode(value))
+
     def _get_user_key(self, uuid: str | UUID) -> str:
-        return f"user:{uuid}:data"
+        return f"{self._USER_KEY_PREFIX}{uuid}:data"
+
+    def _move_user_keys(self, target: "BaseRoomCacheService", user_uuid: str) -> List[str]:
+        return [
+            self.users_key, self.votes_key, self.tally_key,
+            target.users_key, target.votes_key, target.tally_key,
+            self._get_user_key(user_uuid),
+            self.snapshot_key, target.snapshot_key,
+        ]
+
+    def _room_ttl_keys(self) -> List[str]:
+        return [self.users_key, self.votes_key, self.tally_key, self.snapshot_key, self.snapshot_version_key]
+
+    def _mark_snapshot_stale(self, pipe) -> None:
+        pipe.set(self.snapshot_key, "", ex=self.ttl)
+
+    def _queue_snapshot_reads(self, pipe) -> None:
+        pipe.smembers(self.users_key)
+        pipe.hkeys(self.votes_key)
+        pipe.get(self.timer_key)
+        pipe.hget(self.tally_key, "round")
+        pipe.get(self.results_key)
+        pipe.incr(self.snapshot_version_key)
+        pipe.expire(self.snapshot_version_key, self.ttl)
+        pipe.smembers(presence_key(self.room_uuid, "online"))
+        pipe.smembers(presence_key(self.room_uuid, "offline"))
+        pipe.smembers(self.offline_users_key)
+
+    def _snapshot_user_keys(self, uuids: List[str], offline_uuids: List[str]) -> List[str]:
+        return [self._get_user_key(uuid) for uuid in uuids + offline_uuids]
+
+    def _dump_snapshot(
+        self, reads: List, users: Dict[str, UserData], offline_users: Dict[str, UserData]
+    ) -> str:
+        _, voted_users, end_time, votes_round, raw_results, version, _, online, offline, _ = reads
+        timer = float(end_time) if end_time is not None else None
+        if timer is not None and timer <= datetime.now(timezone.utc).timestamp():
+            timer = None
+
+        results = self._loads(raw_results)
+        current_round = self._decode(votes_round) if votes_round is not None else "0"
+        if results is not None and results["version"].rsplit(":", 1)[-1] != current_round:
+            # Итоги прошлого раунда: голоса уже очищены.
+            results = None
+
+        presence = {self._decode(uuid): False for uuid in offline}
+        presence.update({self._decode(uuid): True for uuid in online})
+
+        snapshot: RoomSnapshot = {
+            "type": "room_state",
+            "version": int(version),
+            "participants": users,
+            "offline_participants": offline_users,
+            "online": presence,
+            "voted_users": sorted(self._decode(uuid) for uuid in voted_users),
+            "timer": timer,
+            "results": {"votes": results["votes"], "average_score": results["average_score"]} if results else None,
+        }
+        return json.dumps(snapshot)
+
+    def _transaction_aborted(self, operation: str) -> RoomCacheConflictError:
+        metrics.increment(f"room_cache_{operation}_aborts")
+        return RoomCacheConflictError(
+            f"{operation} in {self.room_key} aborted after {self._MAX_TRANSACTION_RETRIES} retries"
+        )
 
-    def _update_ttl_list(self, keys: List[str]) -> None:
-        for key in keys:
-            cache.touch(key, timeout=self.ttl)
+    def _parse_room_users(self, uuids: List[str], cached_data: List[bytes | None]) -> Dict[str, UserData]:
+        users_dict = {}
+        for uuid, user_data in zip(uuids, cached_data, strict=True):
+            if user_data:
+                users_dict[uuid] = self._loads(user_data)
+        return users_dict
+
+    def _parse_votes(self, votes: Dict[bytes, bytes]) -> Dict[str, dict]:
+        return {self._decode(uuid): self._loads(vote) for uuid, vote in votes.items()}
+
+    @staticmethod
+    def _parse_vote_tally(voters, votes, votes_sum) -> VoteTally:
+        return {
+            "voters": int(voters or 0),
+            "votes": int(votes or 0),
+            "sum": int(votes_sum or 0),
+        }
+
+    @staticmethod
+    def _check_vote_status(status: int, error_class: type[ValueError] = ValueError) -> None:
+        if status == -1:
+            raise error_class("User not found")
+        if status == -2:
+            raise error_class("User is not allowed to vote")
+
+    def _parse_submit_vote(self, result: List) -> Tuple[bool, Dict[str, dict]]:
+        status, *flat_votes = result
+        self._check_vote_status(status, VoteRejectedError)
+        if status == 0:
+            return False, {}
+
+        votes = {
+            self._decode(uuid): self._loads(vote_data)
+            for uuid, vote_data in zip(flat_votes[::2], flat_votes[1::2], strict=True)
+        }
+        return True, votes
+
+    @staticmethod
+    def _timer_timeout_ms(end_time: float) -> int:
+        if end_time <= datetime.now(timezone.utc).timestamp():
+            raise ValueError("End time is invalid")
+
+        timeout_ms = int((end_time - datetime.now(timezone.utc).timestamp()) * 1000)
+        return max(timeout_ms, 1)
+
+
+class RoomCacheService(BaseRoomCacheService):
+    """
+    Менеджер кэша для управления комнатами, пользователями и голосами.
+    """
+
+    def __init__(self, room_uuid: str, ttl: int = 60 * 60 * 5):
+        """
+        Инициализация менеджера кэша для конкретной комнаты.
+
+        :param room_uuid: UUID комнаты.
+        :param ttl: Время жизни (в секундах) записей в кэше.
+        """
+        super().__init__(room_uuid, ttl)
+        self._redis: Redis | None = None
+        self._scripts: Dict[str, Script] = {}
+
+    @property
+    def redis(self) -> Redis:
+        if self._redis is None:
+            self._redis = get_redis_client()
+        return self._redis
+
+    def _run_script(self, script: str, keys: List[str], args: List) -> object:
+        if script not in self._scripts:
+            self._scripts[script] = self.redis.register_script(script)
+        return self._scripts[script](keys=keys, args=args)
+
+    def _transaction(self, operation: str, watch_keys: List[str], body: Callable[[Pipeline], T]) -> T:
+        """
+        Выполняет оптимистичную транзакцию WATCH/MULTI с ограниченным числом повторов.
+
+        :param operation: Имя операции для метрик.
+        :param watch_keys: Ключи, изменение которых прерывает транзакцию.
+        :param body: Функция, которая читает состояние, вызывает pipe.multi(),
+            ставит команды в очередь и вызывает pipe.execute().
+        :raises RoomCacheConflictError: Если все попытки прерваны конкурентными записями.
+        """
+        with self.redis.pipeline() as pipe:
+            for _attempt in range(self._MAX_TRANSACTION_RETRIES):
+                try:
+                    pipe.watch(*watch_keys)
+                    return body(pipe)
+                except WatchError:
+                    metrics.increment(f"room_cache_{operation}_retries")
+        raise self._transaction_aborted(operation)
+
+    def _read_through(self, field: str, load: Callable[[], Any]) -> Any:
+        state_cache = get_room_state_cache()
+        if state_cache is None:
+            return load()
+
+        hit, value = state_cache.get(self.room_key, field)
+        if hit:
+            return value
+
+        generation = state_cache.generation(self.room_key)
+        value = load()
+        state_cache.set(self.room_key, field, value, generation)
+        return value
+
+    def _invalidate_state(self) -> None:
+        state_cache = get_room_state_cache()
+        if state_cache is not None:
+            state_cache.invalidate(self.room_key)
+            self.redis.publish(INVALIDATION_CHANNEL, self.room_key)
+
+    def _get_user_uuids(self) -> List[str]:
+        return [self._decode(uuid) for uuid in self.redis.smembers(self.users_key)]
+
+    def refresh_ttl(self) -> None:
+        """
+        Продлевает TTL всех ключей комнаты за один запрос к Redis.
+
+        Продлеваются множество участников, голоса, счётчики и данные каждого
+        участника. Таймер не продлевается: его TTL совпадает с временем окончания.
+        """
+        self._run_script(
+            redis_scripts.REFRESH_ROOM_TTL,
+            keys=self._room_ttl_keys(),
+            args=[self.ttl, self._USER_KEY_PREFIX],
+        )
 
     def add_user(self, uuid: str | UUID, role: UserRole, nickname: str | None = None) -> None:
         """
@@ -45,26 +340,32 @@ class RoomCacheService:
         :param uuid: UUID пользователя.
         :param role: Роль пользователя.
         :param nickname: Никнейм пользователя.
+        :raises ValueError: Если пользователь уже существует.
+        :raises RoomCacheConflictError: Если транзакция не удалась из-за конкурентных записей.
         """
         user_uuid = str(uuid)
         user_key = self._get_user_key(user_uuid)
+        user_data: UserData = {
+            "role": role,
+            "nickname": nickname,
+        }
 
-        with cache.lock(self.room_key):
-            if self._user_exists(user_uuid):
+        def add(pipe: Pipeline) -> None:
+            if pipe.exists(user_key):
                 raise ValueError("User already exists")
+            is_new_voter = role == UserRole.VOTER and not pipe.sismember(self.users_key, user_uuid)
 
+            pipe.multi()
+            pipe.set(user_key, json.dumps(user_data), ex=self.ttl)
+            pipe.sadd(self.users_key, user_uuid)
+            if is_new_voter:
+                pipe.hincrby(self.tally_key, "voters", 1)
+            self._mark_snapshot_stale(pipe)
+            pipe.execute()
 
-            user_data: UserData= {
-                "role": role,
-                "nickname": nickname,
-            }
-            cache.set(user_key, user_data, timeout=self.ttl)
-
-            uuids = set(cache.get(self.users_key, []))
-            uuids.add(user_uuid)
-            cache.set(self.users_key, list(uuids), timeout=self.ttl)
-
-            self._update_ttl_list(list(uuids))
+        self._transaction("add_user", [user_key, self.users_key], add)
+        self.refresh_ttl()
+        self._invalidate_state()
 
     def _user_exists(self, user_uuid: str) -> bool:
         """
@@ -74,28 +375,44 @@ class RoomCacheService:
         :return: Словарь с данными пользователя или None, если пользователь не найден.
         """
         user_key = self._get_user_key(user_uuid)
-        return cache.get(user_key) is not None
-
-    def transfer_user(self, user_uuid: str | UUID, target_room_uuid: str | int) -> None:
-        target_room_uuid = str(target_room_uuid)
-        target_service = RoomCacheService(target_room_uuid, ttl=self.ttl)
+        return bool(self.redis.exists(user_key))
 
-        user_data: UserData = self.get_user(user_uuid)
-        if not user_data:
-            raise ValidationError({"error": "User not found in source room"})
+    def move_user(self, user_uuid: str | UUID, target_room_uuid: str | int) -> bool:
+        """
+        Атомарно переносит пользователя и его голос в другую комнату.
 
-        votes = self.get_votes()
-        if user_uuid in votes:
-            target_service.set_vote(user_uuid, votes[user_uuid]["vote"])
-            self.remove_user_vote(user_uuid)
+        Выполняется одним Lua-скриптом: участие, голос и счётчики обеих
+        комнат меняются за один запрос к Redis.
 
-        self.remove_user(user_uuid)
+        :param user_uuid: UUID пользователя.
+        :param target_room_uuid: UUID целевой комнаты.
+        :return: False, если пользователя нет в комнате.
+        """
+        user_uuid = str(user_uuid)
+        target_service = RoomCacheService(str(target_room_uuid), ttl=self.ttl)
 
-        target_service.add_user(
-            uuid=user_uuid,
-            role=user_data["role"],
-            nickname=user_data["nickname"],
+        status = self._run_script(
+            redis_scripts.MOVE_USER,
+            keys=self._move_user_keys(target_service, user_uuid),
+            args=[user_uuid, self.ttl],
         )
+        if status == -1:
+            return False
+
+        self._invalidate_state()
+        target_service._invalidate_state()
+        return True
+
+    def transfer_user(self, user_uuid: str | UUID, target_room_uuid: str | int) -> None:
+        """
+        Переносит пользователя и его голос в другую комнату.
+
+        :param user_uuid: UUID пользователя.
+        :param target_room_uuid: UUID целевой комнаты.
+        :raises ValidationError: Если пользователя нет в комнате.
+        """
+        if not self.move_user(user_uuid, target_room_uuid):
+            raise ValidationError({"error": "User not found in source room"})
 
     def get_user(self, user_uuid: str | UUID) -> UserData | None:
         """
@@ -104,9 +421,8 @@ class RoomCacheService:
         :param user_uuid: UUID пользователя.
         :return: Словарь с данными пользователя или None, если пользователь не найден.
         """
-        user_uuid = str(user_uuid)
-        user_key = self._get_user_key(user_uuid)
-        return cache.get(user_key)
+        user_key = self._get_user_key(str(user_uuid))
+        return self._read_through(user_key, lambda: self._loads(self.redis.get(user_key)))
 
     def remove_user(self, user_uuid: str | UUID) -> None:
         """
@@ -117,12 +433,12 @@ class RoomCacheService:
         user_uuid = str(user_uuid)
         user_key = self._get_user_key(user_uuid)
 
-        uuids = cache.get(self.users_key, [])
-        if uuids and user_uuid in uuids:
-            uuids.remove(user_uuid)
-            cache.set(self.users_key, uuids, timeout=self.ttl)
-
-        cache.delete(user_key)
+        self._run_script(
+            redis_scripts.REMOVE_USER,
+            keys=[self.users_key, user_key, self.tally_key, self.snapshot_key],
+            args=[user_uuid, self.ttl],
+        )
+        self._invalidate_state()
 
     def get_room_users(self) -> Dict[str, UserData]:
         """
@@ -130,20 +446,16 @@ class RoomCacheService:
 
         :return: Словарь с UUID пользователей и их данными.
         """
-        uuids = cache.get(self.users_key, [])
+        return self._read_through(self.users_key, self._load_room_users)
+
+    def _load_room_users(self) -> Dict[str, UserData]:
+        uuids = self._get_user_uuids()
 
         if not uuids:
             return {}
 
         user_keys = [self._get_user_key(uuid) for uuid in uuids]
-        cached_data = cache.get_many(user_keys)
-
-        users_dict = {}
-        for uuid in uuids:
-            user_key = self._get_user_key(uuid)
-            if user_key in cached_data and cached_data[user_key]:
-                users_dict[uuid] = cached_data[user_key]
-        return users_dict
+        return self._parse_room_users(uuids, self.redis.mget(user_keys))
 
     def get_users_by_role(self, role: UserRole) -> List[str]:
         """
@@ -165,20 +477,36 @@ class RoomCacheService:
         """
         user_uuid = str(user_uuid)
 
-        with cache.lock(self.room_key):
-            user_data = self.get_user(user_uuid)
-            if not user_data:
-                raise ValueError("User not found")
+        status = self._run_script(
+            redis_scripts.SET_VOTE,
+            keys=[self._get_user_key(user_uuid), self.votes_key, self.tally_key, self.snapshot_key],
+            args=[user_uuid, vote, self.ttl],
+        )
+        self._check_vote_status(status)
+        self._invalidate_state()
 
-            if user_data["role"] != UserRole.VOTER:
-                raise ValueError("User is not allowed to vote")
+    def submit_vote(self, user_uuid: str | UUID, vote: int) -> Tuple[bool, Dict[str, dict]]:
+        """
+        Атомарно записывает голос и проверяет, проголосовали ли все участники.
 
-            votes: Dict[str, dict] = cache.get(self.votes_key, {})
-            votes[user_uuid] = {
-                "nickname": user_data["nickname"],
-                "vote": vote
-            }
-            cache.set(self.votes_key, votes, timeout=self.ttl)
+        Выполняется одним Lua-скриптом на стороне Redis, без блокировок.
+
+        :param user_uuid: UUID пользователя.
+        :param vote: Значение голоса.
+        :return: Пара (голосование завершено, голоса комнаты). Голоса возвращаются
+            только при завершении голосования, иначе словарь пуст.
+        :raises VoteRejectedError: Если пользователя нет в комнате или он не может голосовать.
+        """
+        user_uuid = str(user_uuid)
+
+        result = self._run_script(
+            redis_scripts.SUBMIT_VOTE,
+            keys=[self.users_key, self.votes_key, self._get_user_key(user_uuid), self.tally_key, self.snapshot_key],
+            args=[user_uuid, vote, self.ttl],
+        )
+        submitted = self._parse_submit_vote(result)
+        self._invalidate_state()
+        return submitted
 
     def remove_user_vote(self, user_uuid: str | UUID) -> None:
         """
@@ -193,10 +521,12 @@ class RoomCacheService:
         if not user_data:
             raise ValueError("User not found")
 
-        votes: Dict[str, dict] = cache.get(self.votes_key, {})
-        if user_uuid in votes:
-            del votes[user_uuid]
-            cache.set(self.votes_key, votes, timeout=self.ttl)
+        self._run_script(
+            redis_scripts.REMOVE_VOTE,
+            keys=[self.votes_key, self.tally_key, self.snapshot_key],
+            args=[user_uuid, self.ttl],
+        )
+        self._invalidate_state()
 
     def get_votes(self) -> Dict[str, dict]:
         """
@@ -204,36 +534,531 @@ class RoomCacheService:
 
         :return: Словарь с голосами (UUID пользователя -> данные голоса).
         """
-        return cache.get(self.votes_key, {})
+        return self._read_through(self.votes_key, lambda: self._parse_votes(self.redis.hgetall(self.votes_key)))
+
+    def get_vote_tally(self) -> VoteTally:
+        """
+        Возвращает счётчики комнаты без чтения самих голосов.
+
+        :return: Число голосующих участников, число голосов и их сумма.
+        """
+        return self._parse_vote_tally(*self.redis.hmget(self.tally_key, "voters", "votes", "sum"))
+
+    def is_voting_finished(self) -> bool:
+        """
+        Проверяет, проголосовали ли все голосующие участники комнаты.
+
+        :return: True, если число голосов совпадает с числом голосующих.
+        """
+        tally = self.get_vote_tally()
+        return tally["voters"] == tally["votes"]
 
     def clear_votes(self) -> None:
         """
         Очищает все голоса в комнате.
         """
-        cache.delete(self.votes_key)
+        pipe = self.redis.pipeline()
+        pipe.delete(self.votes_key)
+        pipe.hdel(self.tally_key, "votes", "sum")
+        pipe.hincrby(self.tally_key, "round", 1)
+        pipe.expire(self.tally_key, self.ttl)
+        self._mark_snapshot_stale(pipe)
+        pipe.execute()
+        self._invalidate_state()
+
+    def claim_results(self, voting_id: int) -> Tuple[bool, str, VotingResults | None]:
+        """
+        Захватывает право подвести итоги текущего раунда голосования.
+
+        :param voting_id: ID голосования.
+        :return: Тройка (захват получен, версия итогов, сохранённые итоги).
+            Если итоги этой версии уже сохранены, они возвращаются третьим
+            элементом; если захват держит другой процесс, первый элемент
+            False, а третий None.
+        """
+        status, payload = self._run_script(
+            redis_scripts.CLAIM_RESULTS,
+            keys=[self.tally_key, self.results_key, self.results_claim_key],
+            args=[voting_id, self._RESULTS_CLAIM_TTL_MS],
+        )
+        if status == 1:
+            results: VotingResults = self._loads(payload)
+            return False, results["version"], results
+        return status == 0, self._decode(payload), None
+
+    def store_results(self, version: str, average_score: float, votes: Dict[str, Dict[str, Any]]) -> VotingResults:
+        """
+        Сохраняет итоги раунда и освобождает захват.
+
+        :param version: Версия итогов из claim_results.
+        :param average_score: Итоговая оценка.
+        :param votes: Голоса раунда.
+        """
+        results: VotingResults = {"version": version, "average_score": average_score, "votes": votes}
+        pipe = self.redis.pipeline()
+        pipe.set(self.results_key, json.dumps(results), ex=self.ttl)
+        pipe.delete(self.results_claim_key)
+        self._mark_snapshot_stale(pipe)
+        pipe.execute()
+        return results
+
+    def release_results_claim(self) -> None:
+        self.redis.delete(self.results_claim_key)
+
+    def get_snapshot(self) -> str | None:
+        """
+        Возвращает JSON-снимок комнаты: участники (в том числе ушедшие в
+        офлайн) и их онлайн-статусы, проголосовавшие, таймер и итоги
+        текущего раунда, если они подведены.
+
+        Актуальный снимок читается одним GET. После записи снимок собирается
+        заново под WATCH: если комнату изменили во время сборки, собранный
+        снимок возвращается, но не сохраняется.
+
+        :return: Снимок (RoomSnapshot в JSON) или None, если в комнате нет участников.
+        """
+        snapshot = self.redis.get(self.snapshot_key)
+        if snapshot:
+            return self._decode(snapshot)
+
+        metrics.increment("room_snapshot_rebuilds_total")
+        with self.redis.pipeline() as pipe:
+            pipe.watch(self.snapshot_key)
+            reads = self.redis.pipeline()
+            self._queue_snapshot_reads(reads)
+            snapshot_reads = reads.execute()
+            if not snapshot_reads[0]:
+                return None
+
+            uuids = [self._decode(uuid) for uuid in snapshot_reads[0]]
+            offline_uuids = [self._decode(uuid) for uuid in snapshot_reads[-1]]
+            user_data = self.redis.mget(self._snapshot_user_keys(uuids, offline_uuids))
+            users = self._parse_room_users(uuids, user_data[:len(uuids)])
+            offline_users = self._parse_room_users(offline_uuids, user_data[len(uuids):])
+            snapshot = self._dump_snapshot(snapshot_reads, users, offline_users)
+            try:
+                pipe.multi()
+                pipe.set(self.snapshot_key, snapshot, ex=self.ttl)
+                pipe.execute()
+            except WatchError:
+                metrics.increment("room_snapshot_store_conflicts_total")
+        return snapshot
 
     def clear_room(self) -> None:
         """
         Полностью очищает данные комнаты, включая пользователей и голоса.
         """
-        with cache.lock(self.room_key):
-            uuids = cache.get(self.users_key, [])
-            for user_uuid in uuids:
-                cache.delete(f"user:{user_uuid}:data")
-            cache.delete(self.users_key)
-            cache.delete(self.votes_key)
+        def clear(pipe: Pipeline) -> None:
+            user_keys = [self._get_user_key(self._decode(uuid)) for uuid in pipe.smembers(self.users_key)]
 
-    def start_room_timer(self, end_time: float) -> None:
-        if self.get_room_timer():
-            raise ValueError("Timer exists")
+            pipe.multi()
+            pipe.delete(*user_keys, self.users_key, self.votes_key, self.tally_key, self.results_key)
+            self._mark_snapshot_stale(pipe)
+            pipe.execute()
 
-        if end_time <= datetime.now(timezone.utc).timestamp():
-            raise ValueError("End time is invalid")
+        self._transaction("clear_room", [self.users_key], clear)
+        self._invalidate_state()
 
-        cache.set(self.timer_key, end_time, end_time - datetime.now(timezone.utc).timestamp())
+    def start_room_timer(self, end_time: float) -> None:
+        """
+        Запускает таймер комнаты и ставит его в расписание RoomTimerScheduler.
+
+        :param end_time: Время окончания (timestamp).
+        :raises TimerExistsError: Если таймер уже запущен.
+        """
+        started = self._run_script(
+            redis_scripts.START_TIMER,
+            keys=[self.timer_key, TIMER_DEADLINES_KEY, self.snapshot_key],
+            args=[end_time, self._timer_timeout_ms(end_time), self.room_uuid, self.ttl],
+        )
+        if not started:
+            raise TimerExistsError("Timer exists")
 
     def get_room_timer(self) -> float | None:
-        return cache.get(self.timer_key)
+        end_time = self.redis.get(self.timer_key)
+        return float(end_time) if end_time is not None else None
 
     def reset_room_timer(self) -> None:
-        cache.delete(self.timer_key)
+        pipe = self.redis.pipeline()
+        pipe.delete(self.timer_key)
+        pipe.zrem(TIMER_DEADLINES_KEY, self.room_uuid)
+        self._mark_snapshot_stale(pipe)
+        pipe.execute()
+
+
+class AsyncRoomCacheService(BaseRoomCacheService):
+    """
+    Асинхронный менеджер кэша комнаты для использования внутри event loop.
+
+    Работает с теми же ключами, что и RoomCacheService, но через redis.asyncio,
+    поэтому WebSocket-обработчики обращаются к Redis без перехода в поток.
+    """
+
+    def __init__(self, room_uuid: str, ttl: int = 60 * 60 * 5):
+        """
+        Инициализация асинхронного менеджера кэша для конкретной комнаты.
+
+        :param room_uuid: UUID комнаты.
+        :param ttl: Время жизни (в секундах) записей в кэше.
+        """
+        super().__init__(room_uuid, ttl)
+        self._redis: AsyncRedis | None = None
+        self._scripts: Dict[str, AsyncScript] = {}
+
+    @property
+    def redis(self) -> AsyncRedis:
+        if self._redis is None:
+            self._redis = get_async_redis_client()
+        return self._redis
+
+    async def _run_script(self, script: str, keys: List[str], args: List) -> object:
+        if script not in self._scripts:
+            self._scripts[script] = self.redis.register_script(script)
+        return await self._scripts[script](keys=keys, args=args)
+
+    async def _transaction(
+        self, operation: str, watch_keys: List[str], body: Callable[[AsyncPipeline], Awaitable[T]]
+    ) -> T:
+        """
+        Выполняет оптимистичную транзакцию WATCH/MULTI с ограниченным числом повторов.
+
+        :param operation: Имя операции для метрик.
+        :param watch_keys: Ключи, изменение которых прерывает транзакцию.
+        :param body: Корутина, которая читает состояние, вызывает pipe.multi(),
+            ставит команды в очередь и вызывает pipe.execute().
+        :raises RoomCacheConflictError: Если все попытки прерваны конкурентными записями.
+        """
+        async with self.redis.pipeline() as pipe:
+            for _attempt in range(self._MAX_TRANSACTION_RETRIES):
+                try:
+                    await pipe.watch(*watch_keys)
+                    return await body(pipe)
+                except WatchError:
+                    metrics.increment(f"room_cache_{operation}_retries")
+        raise self._transaction_aborted(operation)
+
+    async def _read_through(self, field: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        state_cache = get_room_state_cache()
+        if state_cache is None:
+            return await load()
+
+        hit, value = state_cache.get(self.room_key, field)
+        if hit:
+            return value
+
+        generation = state_cache.generation(self.room_key)
+        value = await load()
+        state_cache.set(self.room_key, field, value, generation)
+        return value
+
+    async def _invalidate_state(self) -> None:
+        state_cache = get_room_state_cache()
+        if state_cache is not None:
+            state_cache.invalidate(self.room_key)
+            await self.redis.publish(INVALIDATION_CHANNEL, self.room_key)
+
+    async def _get_user_uuids(self) -> List[str]:
+        return [self._decode(uuid) for uuid in await self.redis.smembers(self.users_key)]
+
+    async def refresh_ttl(self) -> None:
+        """
+        Продлевает TTL всех ключей комнаты за один запрос к Redis.
+        """
+        await self._run_script(
+            redis_scripts.REFRESH_ROOM_TTL,
+            keys=self._room_ttl_keys(),
+            args=[self.ttl, self._USER_KEY_PREFIX],
+        )
+
+    async def add_user(self, uuid: str | UUID, role: UserRole, nickname: str | None = None) -> None:
+        """
+        Добавляет пользователя в кэш комнаты.
+
+        :param uuid: UUID пользователя.
+        :param role: Роль пользователя.
+        :param nickname: Никнейм пользователя.
+        :raises ValueError: Если пользователь уже существует.
+        :raises RoomCacheConflictError: Если транзакция не удалась из-за конкурентных записей.
+        """
+        user_uuid = str(uuid)
+        user_key = self._get_user_key(user_uuid)
+        user_data: UserData = {
+            "role": role,
+            "nickname": nickname,
+        }
+
+        async def add(pipe: AsyncPipeline) -> None:
+            if await pipe.exists(user_key):
+                raise ValueError("User already exists")
+            is_new_voter = role == UserRole.VOTER and not await pipe.sismember(self.users_key, user_uuid)
+
+            pipe.multi()
+            pipe.set(user_key, json.dumps(user_data), ex=self.ttl)
+            pipe.sadd(self.users_key, user_uuid)
+            if is_new_voter:
+                pipe.hincrby(self.tally_key, "voters", 1)
+            self._mark_snapshot_stale(pipe)
+            await pipe.execute()
+
+        await self._transaction("add_user", [user_key, self.users_key], add)
+        await self.refresh_ttl()
+        await self._invalidate_state()
+
+    async def move_user(self, user_uuid: str | UUID, target_room_uuid: str | int) -> bool:
+        """
+        Атомарно переносит пользователя и его голос в другую комнату.
+
+        :param user_uuid: UUID пользователя.
+        :param target_room_uuid: UUID целевой комнаты.
+        :return: False, если пользователя нет в комнате.
+        """
+        user_uuid = str(user_uuid)
+        target_service = AsyncRoomCacheService(str(target_room_uuid), ttl=self.ttl)
+
+        status = await self._run_script(
+            redis_scripts.MOVE_USER,
+            keys=self._move_user_keys(target_service, user_uuid),
+            args=[user_uuid, self.ttl],
+        )
+        if status == -1:
+            return False
+
+        await self._invalidate_state()
+        await target_service._invalidate_state()
+        return True
+
+    async def transfer_user(self, user_uuid: str | UUID, target_room_uuid: str | int) -> None:
+        """
+        Переносит пользователя и его голос в другую комнату.
+
+        :param user_uuid: UUID пользователя.
+        :param target_room_uuid: UUID целевой комнаты.
+        :raises ValidationError: Если пользователя нет в комнате.
+        """
+        if not await self.move_user(user_uuid, target_room_uuid):
+            raise ValidationError({"error": "User not found in source room"})
+
+    async def get_user(self, user_uuid: str | UUID) -> UserData | None:
+        """
+        Получает данные пользователя из кэша.
+
+        :param user_uuid: UUID пользователя.
+        :return: Словарь с данными пользователя или None, если пользователь не найден.
+        """
+        user_key = self._get_user_key(str(user_uuid))
+
+        async def load():
+            return self._loads(await self.redis.get(user_key))
+
+        return await self._read_through(user_key, load)
+
+    async def remove_user(self, user_uuid: str | UUID) -> None:
+        """
+        Удаляет пользователя из кэша.
+
+        :param user_uuid: UUID пользователя.
+        """
+        user_uuid = str(user_uuid)
+        await self._run_script(
+            redis_scripts.REMOVE_USER,
+            keys=[self.users_key, self._get_user_key(user_uuid), self.tally_key, self.snapshot_key],
+            args=[user_uuid, self.ttl],
+        )
+        await self._invalidate_state()
+
+    async def get_room_users(self) -> Dict[str, UserData]:
+        """
+        Возвращает всех пользователей в комнате с их ролями.
+
+        :return: Словарь с UUID пользователей и их данными.
+        """
+        return await self._read_through(self.users_key, self._load_room_users)
+
+    async def _load_room_users(self) -> Dict[str, UserData]:
+        uuids = await self._get_user_uuids()
+
+        if not uuids:
+            return {}
+
+        user_keys = [self._get_user_key(uuid) for uuid in uuids]
+        return self._parse_room_users(uuids, await self.redis.mget(user_keys))
+
+    async def get_users_by_role(self, role: UserRole) -> List[str]:
+        """
+        Получает список UUID пользователей с определённой ролью.
+
+        :param role: Роль пользователей.
+        :return: Список UUID пользователей с указанной ролью.
+        """
+        all_users = await self.get_room_users()
+        return [uuid for uuid, user_data in all_users.items() if user_data["role"] == role]
+
+    async def set_vote(self, user_uuid: str | UUID, vote: int) -> None:
+        """
+        Устанавливает голос для пользователя.
+
+        :param user_uuid: UUID пользователя.
+        :param vote: Значение голоса.
+        :raises ValueError: Если пользователь не найден или не имеет права голосовать.
+        """
+        user_uuid = str(user_uuid)
+
+        status = await self._run_script(
+            redis_scripts.SET_VOTE,
+            keys=[self._get_user_key(user_uuid), self.votes_key, self.tally_key, self.snapshot_key],
+            args=[user_uuid, vote, self.ttl],
+        )
+        self._check_vote_status(status)
+        await self._invalidate_state()
+
+    async def submit_vote(self, user_uuid: str | UUID, vote: int) -> Tuple[bool, Dict[str, dict]]:
+        """
+        Атомарно записывает голос и проверяет, проголосовали ли все участники.
+
+        :param user_uuid: UUID пользователя.
+        :param vote: Значение голоса.
+        :return: Пара (голосование завершено, голоса комнаты).
+        :raises VoteRejectedError: Если пользователя нет в комнате или он не может голосовать.
+        """
+        user_uuid = str(user_uuid)
+
+        result = await self._run_script(
+            redis_scripts.SUBMIT_VOTE,
+            keys=[self.users_key, self.votes_key, self._get_user_key(user_uuid), self.tally_key, self.snapshot_key],
+            args=[user_uuid, vote, self.ttl],
+        )
+        submitted = self._parse_submit_vote(result)
+        await self._invalidate_state()
+        return submitted
+
+    async def remove_user_vote(self, user_uuid: str | UUID) -> None:
+        """
+        Удаляет голос конкретного пользователя.
+
+        :param user_uuid: UUID пользователя.
+        :raises ValueError: Если пользователь не найден.
+        """
+        user_uuid = str(user_uuid)
+
+        if not await self.get_user(user_uuid):
+            raise ValueError("User not found")
+
+        await self._run_script(
+            redis_scripts.REMOVE_VOTE,
+            keys=[self.votes_key, self.tally_key, self.snapshot_key],
+            args=[user_uuid, self.ttl],
+        )
+        await self._invalidate_state()
+
+    async def get_votes(self) -> Dict[str, dict]:
+        """
+        Получает все голоса в комнате.
+
+        :return: Словарь с голосами (UUID пользователя -> данные голоса).
+        """
+        async def load():
+            return self._parse_votes(await self.redis.hgetall(self.votes_key))
+
+        return await self._read_through(self.votes_key, load)
+
+    async def get_vote_tally(self) -> VoteTally:
+        """
+        Возвращает счётчики комнаты без чтения самих голосов.
+
+        :return: Число голосующих участников, число голосов и их сумма.
+        """
+        return self._parse_vote_tally(*await self.redis.hmget(self.tally_key, "voters", "votes", "sum"))
+
+    async def is_voting_finished(self) -> bool:
+        """
+        Проверяет, проголосовали ли все голосующие участники комнаты.
+
+        :return: True, если число голосов совпадает с числом голосующих.
+        """
+        tally = await self.get_vote_tally()
+        return tally["voters"] == tally["votes"]
+
+    async def clear_votes(self) -> None:
+        """
+        Очищает все голоса в комнате.
+        """
+        pipe = self.redis.pipeline()
+        pipe.delete(self.votes_key)
+        pipe.hdel(self.tally_key, "votes", "sum")
+        pipe.hincrby(self.tally_key, "round", 1)
+        pipe.expire(self.tally_key, self.ttl)
+        self._mark_snapshot_stale(pipe)
+        await pipe.execute()
+        await self._invalidate_state()
+
+    async def clear_room(self) -> None:
+        """
+        Полностью очищает данные комнаты, включая пользователей и голоса.
+        """
+        async def clear(pipe: AsyncPipeline) -> None:
+            user_keys = [self._get_user_key(self._decode(uuid)) for uuid in await pipe.smembers(self.users_key)]
+
+            pipe.multi()
+            pipe.delete(*user_keys, self.users_key, self.votes_key, self.tally_key, self.results_key)
+            self._mark_snapshot_stale(pipe)
+            await pipe.execute()
+
+        await self._transaction("clear_room", [self.users_key], clear)
+        await self._invalidate_state()
+
+    async def get_snapshot(self) -> str | None:
+        """
+        Асинхронный вариант RoomCacheService.get_snapshot.
+        """
+        snapshot = await self.redis.get(self.snapshot_key)
+        if snapshot:
+            return self._decode(snapshot)
+
+        metrics.increment("room_snapshot_rebuilds_total")
+        async with self.redis.pipeline() as pipe:
+            await pipe.watch(self.snapshot_key)
+            reads = self.redis.pipeline()
+            self._queue_snapshot_reads(reads)
+            snapshot_reads = await reads.execute()
+            if not snapshot_reads[0]:
+                return None
+
+            uuids = [self._decode(uuid) for uuid in snapshot_reads[0]]
+            offline_uuids = [self._decode(uuid) for uuid in snapshot_reads[-1]]
+            user_data = await self.redis.mget(self._snapshot_user_keys(uuids, offline_uuids))
+            users = self._parse_room_users(uuids, user_data[:len(uuids)])
+            offline_users = self._parse_room_users(offline_uuids, user_data[len(uuids):])
+            snapshot = self._dump_snapshot(snapshot_reads, users, offline_users)
+            try:
+                pipe.multi()
+                pipe.set(self.snapshot_key, snapshot, ex=self.ttl)
+                await pipe.execute()
+            except WatchError:
+                metrics.increment("room_snapshot_store_conflicts_total")
+        return snapshot
+
+    async def invalidate_snapshot(self) -> None:
+        """
+        Помечает снимок комнаты устаревшим, например когда истёк таймер.
+        """
+        await self.redis.set(self.snapshot_key, "", ex=self.ttl)
+
+    async def start_room_timer(self, end_time: float) -> None:
+        started = await self._run_script(
+            redis_scripts.START_TIMER,
+            keys=[self.timer_key, TIMER_DEADLINES_KEY, self.snapshot_key],
+            args=[end_time, self._timer_timeout_ms(end_time), self.room_uuid, self.ttl],
+        )
+        if not started:
+            raise TimerExistsError("Timer exists")
+
+    async def get_room_timer(self) -> float | None:
+        end_time = await self.redis.get(self.timer_key)
+        return float(end_time) if end_time is not None else None
+
+    async def reset_room_timer(self) -> None:
+        pipe = self.redis.pipeline()
+        pipe.delete(self.timer_key)
+        pipe.zrem(TIMER_DEADLINES_KEY, self.room_uuid)
+        self._mark_snapshot_stale(pipe)
+        await pipe.execute()
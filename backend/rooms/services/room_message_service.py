@@ -1,7 +1,9 @@
 from enum import Enum
 
+from ws.services.user_channel_tracker import AsyncUserChannelTracker, UserChannelTracker
+
 from rooms.services.message_senders.base import MessageSender
-from rooms.services.room_cache_service import RoomCacheService, UserData
+from rooms.services.room_cache_service import AsyncRoomCacheService, RoomCacheService, UserData
 
 
 class RoomStatusType(Enum):
@@ -10,7 +12,21 @@ class RoomStatusType(Enum):
     NEXT = "next"
 
 class RoomMessageService:
-    def __init__(self, room_id: int, message_sender: MessageSender, room_cache_service: RoomCacheService | None = None):
+    """
+    Групповые уведомления комнаты.
+
+    Каждый метод notify_* имеет асинхронный вариант anotify_* для
+    WebSocket-потребителя: он отправляет сообщение через MessageSender.asend
+    и читает данные через AsyncRoomCacheService, не уходя в поток.
+    Синхронные методы требуют RoomCacheService, асинхронные — AsyncRoomCacheService.
+    """
+
+    def __init__(
+        self,
+        room_id: int,
+        message_sender: MessageSender,
+        room_cache_service: RoomCacheService | AsyncRoomCacheService | None = None,
+    ):
         self.room_id = room_id
         self.message_sender = message_sender
         self._room_cache_service = room_cache_service
@@ -25,12 +41,120 @@ class RoomMessageService:
     def _group_name(self):
         return f"room_{self.room_id}"
 
-    def notify_voting_restart(self):
-        message = {
+    def _send(self, message: dict) -> None:
+        self.message_sender.send(self._group_name, message)
+
+    async def _asend(self, message: dict) -> None:
+        await self.message_sender.asend(self._group_name, message)
+
+    def send_to_user(self, user_uuid: str, message: dict) -> None:
+        """
+        Отправляет сообщение только каналам указанного пользователя комнаты.
+
+        Args:
+            user_uuid (str): Идентификатор пользователя.
+            message (dict): Сообщение, которое нужно отправить.
+        """
+        for channel_name in UserChannelTracker.get_user_channels(self.room_id, user_uuid):
+            self.message_sender.send_to_channel(channel_name, message)
+
+    async def asend_to_user(self, user_uuid: str, message: dict) -> None:
+        for channel_name in await AsyncUserChannelTracker.get_user_channels(self.room_id, user_uuid):
+            await self.message_sender.asend_to_channel(channel_name, message)
+
+    def disconnect_user(self, user_uuid: str) -> None:
+        """
+        Закрывает WebSocket-соединения пользователя в комнате.
+
+        Args:
+            user_uuid (str): Идентификатор пользователя.
+        """
+        self.send_to_user(user_uuid, {"type": "force_disconnect"})
+
+    async def adisconnect_user(self, user_uuid: str) -> None:
+        await self.asend_to_user(user_uuid, {"type": "force_disconnect"})
+
+    @staticmethod
+    def _voting_restart_message() -> dict:
+        return {
             "type": "voting_change_status",
             "status": RoomStatusType.RESTART.value
         }
-        self.message_sender.send(self._group_name, message)
+
+    @staticmethod
+    def _user_message(message_type: str, uuid: str, user_data: UserData) -> dict:
+        return {
+            "type": message_type,
+            "user": {uuid: user_data}
+        }
+
+    @staticmethod
+    def _user_kicked_message(
+        kicked_uuid: str, kicked_user_data: UserData, kicker_uuid: str, kicker_user_data: UserData
+    ) -> dict:
+        return {
+            "type": "user_kicked",
+            "kicked": {kicked_uuid: kicked_user_data},
+            "kicker": {kicker_uuid: kicker_user_data},
+        }
+
+    @staticmethod
+    def _timer_started_message(timer_end_time: float, user_uuid: str, user_data: UserData) -> dict:
+        return {
+            "type": "timer_started",
+            "end_time": timer_end_time,
+            "timer_started_user": {user_uuid: user_data},
+        }
+
+    @staticmethod
+    def _timer_reset_message(user_uuid: str, user_data: UserData) -> dict:
+        return {
+            "type": "timer_reset",
+            "timer_reset_user": {user_uuid: user_data},
+        }
+
+    @staticmethod
+    def _timer_expired_message(timer_end_time: float) -> dict:
+        return {
+            "type": "timer_expired",
+            "end_time": timer_end_time,
+        }
+
+    @staticmethod
+    def _voting_results_message(votes, average_score) -> dict:
+        return {
+            "type": "results",
+            "votes": votes,
+            "average_score": average_score,
+        }
+
+    @staticmethod
+    def _voted_users_message(votes: dict) -> dict:
+        return {
+            "type": "voted_users_update",
+            "voted_users": list(votes.keys())
+        }
+
+    @staticmethod
+    def _task_name_changed_message(new_task_name: str, user_nickname: str) -> dict:
+        return {
+            "type": "task_name_changed",
+            "new_task_name": new_task_name,
+            "user": user_nickname
+        }
+
+    @staticmethod
+    def _voting_started_message(voting_id: int) -> dict:
+        return {
+            "type": "voting_started",
+            "id": voting_id,
+        }
+
+    def notify_voting_restart(self):
+        self._send(self._voting_restart_message())
+
+    async def anotify_voting_restart(self):
+        await self._asend(self._voting_restart_message())
 
     def notify_user_joined(self, uuid: str) -> str | None:
         """
@@ -40,92 +164,88 @@ class RoomMessageService:
             uuid (str) : Идентификатор пользователя.
         """
         user_data: UserData = self.room_cache_service.get_user(uuid)
+        self._send(self._user_message("user_joined", uuid, user_data))
 
-        message = {
-            "type": "user_joined",
-            "user": {uuid: user_data}
-        }
-        self.message_sender.send(self._group_name, message)
+    async def anotify_user_joined(self, uuid: str) -> None:
+        user_data: UserData = await self.room_cache_service.get_user(uuid)
+        await self._asend(self._user_message("user_joined", uuid, user_data))
 
     def notify_user_kicked(self, kicked_uuid: str, kicker_uuid: str):
         kicked_user_data: UserData = self.room_cache_service.get_user(kicked_uuid)
         kicker_user_data: UserData = self.room_cache_service.get_user(kicker_uuid)
 
-        message = {
-            "type": "user_kicked",
-            "kicked": {kicked_uuid: kicked_user_data},
-            "kicker": {kicker_uuid: kicker_user_data},
-        }
+        self._send(self._user_kicked_message(kicked_uuid, kicked_user_data, kicker_uuid, kicker_user_data))
 
-        self.message_sender.send(self._group_name, message)
+    async def anotify_user_kicked(self, kicked_uuid: str, kicker_uuid: str):
+        kicked_user_data: UserData = await self.room_cache_service.get_user(kicked_uuid)
+        kicker_user_data: UserData = await self.room_cache_service.get_user(kicker_uuid)
+
+        await self._asend(self._user_kicked_message(kicked_uuid, kicked_user_data, kicker_uuid, kicker_user_data))
 
     def notify_room_timer_started(self, timer_end_time: float, timer_started_user_uuid: str):
         timer_started_user_data: UserData = self.room_cache_service.get_user(timer_started_user_uuid)
 
-        message = {
-            "type": "timer_started",
-            "end_time": timer_end_time,
-            "timer_started_user": {timer_started_user_uuid: timer_started_user_data},
-        }
+        self._send(self._timer_started_message(timer_end_time, timer_started_user_uuid, timer_started_user_data))
 
-        self.message_sender.send(self._group_name, message)
+    async def anotify_room_timer_started(self, timer_end_time: float, timer_started_user_uuid: str):
+        timer_started_user_data: UserData = await self.room_cache_service.get_user(timer_started_user_uuid)
+
+        await self._asend(
+            self._timer_started_message(timer_end_time, timer_started_user_uuid, timer_started_user_data)
+        )
 
     def notify_room_timer_reset(self, timer_reset_user_uuid: str):
         timer_reset_user_data: UserData = self.room_cache_service.get_user(timer_reset_user_uuid)
 
-        message = {
-            "type": "timer_reset",
-            "timer_reset_user": {timer_reset_user_uuid: timer_reset_user_data},
-        }
+        self._send(self._timer_reset_message(timer_reset_user_uuid, timer_reset_user_data))
 
-        self.message_sender.send(self._group_name, message)
+    async def anotify_room_timer_reset(self, timer_reset_user_uuid: str):
+        timer_reset_user_data: UserData = await self.room_cache_service.get_user(timer_reset_user_uuid)
+
+        await self._asend(self._timer_reset_message(timer_reset_user_uuid, timer_reset_user_data))
+
+    def notify_room_timer_expired(self, timer_end_time: float):
+        self._send(self._timer_expired_message(timer_end_time))
+
+    async def anotify_room_timer_expired(self, timer_end_time: float):
+        await self._asend(self._timer_expired_message(timer_end_time))
 
     def notify_voting_results(self, votes, average_score):
-        message = {
-            "type": "results",
-            "votes": votes,
-            "average_score": average_score,
-        }
-        self.message_sender.send(self._group_name, message)
+        self._send(self._voting_results_message(votes, average_score))
+
+    async def anotify_voting_results(self, votes, average_score):
+        await self._asend(self._voting_results_message(votes, average_score))
 
     def notify_user_offline(self, user_uuid):
         user_data: UserData = self.room_cache_service.get_user(user_uuid)
+        self._send(self._user_message("user_offline", user_uuid, user_data))
 
-        message = {
-            "type": "user_offline",
-            "user": {user_uuid: user_data}
-        }
-        self.message_sender.send(self._group_name, message)
+    async def anotify_user_offline(self, user_uuid):
+        user_data: UserData = await self.room_cache_service.get_user(user_uuid)
+        await self._asend(self._user_message("user_offline", user_uuid, user_data))
 
     def notify_user_online(self, user_uuid):
         user_data: UserData = self.room_cache_service.get_user(user_uuid)
+        self._send(self._user_message("user_online", user_uuid, user_data))
 
-        message = {
-            "type": "user_online",
-            "user": {user_uuid: user_data}
-        }
-        self.message_sender.send(self._group_name, message)
+    async def anotify_user_online(self, user_uuid):
+        user_data: UserData = await self.room_cache_service.get_user(user_uuid)
+        await self._asend(self._user_message("user_online", user_uuid, user_data))
 
     def send_room_voted_users(self):
-        votes = self.room_cache_service.get_votes()
+        self._send(self._voted_users_message(self.room_cache_service.get_votes()))
 
-        message = {
-            "type": "voted_users_update",
-            "voted_users": list(votes.keys())
-        }
-        self.message_sender.send(self._group_name, message)
+    async def asend_room_voted_users(self):
+        await self._asend(self._voted_users_message(await self.room_cache_service.get_votes()))
 
     def notify_voting_task_name_changed(self, new_task_name:str, user_nickname: str):
-        message = {
-            "type": "task_name_changed",
-            "new_task_name": new_task_name,
-            "user": user_nickname
-        }
-        self.message_sender.send(self._group_name, message)
+        self._send(self._task_name_changed_message(new_task_name, user_nickname))
+
+    async def anotify_voting_task_name_changed(self, new_task_name: str, user_nickname: str):
+        await self._asend(self._task_name_changed_message(new_task_name, user_nickname))
 
     def notify_voting_started(self, voting_id: int):
-        message = {
-            "type": "voting_started",
-            "id": voting_id,
-        }
-        self.message_sender.send(self._group_name, message)
+        self._send(self._voting_started_message(voting_id))
+
+    async def anotify_voting_started(self, voting_id: int):
+        await self._asend(self._voting_started_message(voting_id))
@@ -1,63 +1,359 @@
-from typing import Dict
+import asyncio
+import time
+from typing import ClassVar, Dict, Set, Tuple
 
-from django.core.cache import cache
+import structlog
+from api.services.metrics_service import metrics
+from channels.db import database_sync_to_async
+from django.conf import settings
+from votings.services.active_voting_service import AsyncActiveVotingCache
+from ws.services.user_channel_tracker import AsyncUserChannelTracker
 
-from rooms.services.message_senders.django_channel import DjangoChannelMessageSender
-from rooms.services.room_cache_service import RoomCacheService
+from rooms.services.message_senders.coalescing import get_room_broadcast_sender
+from rooms.services.redis_client import get_async_redis_client, get_redis_client
+from rooms.services.room_cache_service import (
+    AsyncRoomCacheService,
+    RoomCacheService,
+    presence_key,
+    room_snapshot_key,
+)
 from rooms.services.room_message_service import RoomMessageService
 
+logger = structlog.get_logger(__name__)
+
+# Сроки отложенного перехода пользователей в офлайн.
+# Запись — «ID комнаты:UUID», оценка — время перехода.
+OFFLINE_DEADLINES_KEY = "online:offline_deadlines"
+
+
+class BaseRoomOnlineTracker:
+    """
+    Онлайн-статусы участников комнаты.
+
+    Статусы хранятся в двух множествах Redis — ``online:room_{id}:online``
+    и ``online:room_{id}:offline``. Смена статуса переносит один UUID
+    между множествами в одной транзакции, а число онлайн-участников и
+    статус конкретного пользователя читаются без выборки всей комнаты.
+    Статусы входят в снимок комнаты, поэтому смена статуса помечает его
+    устаревшим.
+    """
 
-class RoomOnlineTracker:
-    _CACHE_PREFIX = "online"
     _DEFAULT_TTL = 60 * 60 * 5
+    _ONLINE = "online"
+    _OFFLINE = "offline"
+
     @classmethod
-    def _make_key(cls, room_id: int) -> str:
-        return f"{cls._CACHE_PREFIX}:room_{room_id}"
+    def _make_key(cls, room_id: int, status: str) -> str:
+        return presence_key(room_id, status)
+
+    @staticmethod
+    def _offline_room_id(room_id: int) -> str:
+        return f"{room_id}_offline"
+
+    @classmethod
+    def _queue_status(cls, pipe, user_uuid: str, room_id: int, status: bool) -> None:
+        online_key = cls._make_key(room_id, cls._ONLINE)
+        offline_key = cls._make_key(room_id, cls._OFFLINE)
+        target_key, source_key = (online_key, offline_key) if status else (offline_key, online_key)
+
+        pipe.srem(source_key, user_uuid)
+        pipe.sadd(target_key, user_uuid)
+        pipe.expire(online_key, cls._DEFAULT_TTL)
+        pipe.expire(offline_key, cls._DEFAULT_TTL)
+        pipe.set(room_snapshot_key(room_id), "", ex=cls._DEFAULT_TTL)
 
+    @staticmethod
+    def _parse_participants(online: Set[bytes], offline: Set[bytes]) -> Dict[str, bool]:
+        participants = {uuid.decode() if isinstance(uuid, bytes) else uuid: False for uuid in offline}
+        participants.update({uuid.decode() if isinstance(uuid, bytes) else uuid: True for uuid in online})
+        return participants
+
+
+class RoomOnlineTracker(BaseRoomOnlineTracker):
     @classmethod
     def _set_user_status(cls, user_uuid, room_id, status: bool) -> None:
-        room_key = cls._make_key(room_id)
-        participants: Dict[str, bool] = cache.get(room_key, {})
-        participants[user_uuid] = status
-        cache.set(room_key, participants, cls._DEFAULT_TTL)
+        pipe = get_redis_client().pipeline()
+        cls._queue_status(pipe, user_uuid, room_id, status)
+        pipe.execute()
 
     @classmethod
     def set_user_offline(cls, user_uuid: str, room_id: int) -> None:
-        message_sender = DjangoChannelMessageSender()
+        message_sender = get_room_broadcast_sender()
         room_cache_service = RoomCacheService(room_id)
         room_message_service = RoomMessageService(room_id, message_sender, room_cache_service )
 
-        room_cache_service.transfer_user(user_uuid, f"{room_id}_offline")
+        if not room_cache_service.move_user(user_uuid, cls._offline_room_id(room_id)):
+            return
         cls._set_user_status(user_uuid, room_id, False)
         room_message_service.notify_user_offline(user_uuid)
 
     @classmethod
     def set_user_online(cls, user_uuid: str, room_id: int) -> None:
-        message_sender = DjangoChannelMessageSender()
+        message_sender = get_room_broadcast_sender()
         room_cache_service = RoomCacheService(room_id)
         room_message_service = RoomMessageService(room_id, message_sender, room_cache_service )
-        room_offline_cache_service = RoomCacheService(f"{room_id}_offline")
+        room_offline_cache_service = RoomCacheService(cls._offline_room_id(room_id))
 
-        if room_offline_cache_service.get_user(user_uuid) is not None:
-            room_offline_cache_service.transfer_user(user_uuid, room_id)
+        restored = room_offline_cache_service.move_user(user_uuid, room_id)
 
         cls._set_user_status(user_uuid, room_id, True)
         room_message_service.notify_user_online(user_uuid)
+        if restored:
+            room_message_service.send_room_voted_users()
 
     @classmethod
     def get_room_participants(cls, room_id: int) -> Dict[str, bool]:
-        room_key = cls._make_key(room_id)
-        return cache.get(room_key, {})
+        pipe = get_redis_client().pipeline(transaction=False)
+        pipe.smembers(cls._make_key(room_id, cls._ONLINE))
+        pipe.smembers(cls._make_key(room_id, cls._OFFLINE))
+        return cls._parse_participants(*pipe.execute())
+
+    @classmethod
+    def is_online(cls, user_uuid: str, room_id: int) -> bool:
+        return bool(get_redis_client().sismember(cls._make_key(room_id, cls._ONLINE), user_uuid))
+
+    @classmethod
+    def count_online(cls, room_id: int) -> int:
+        return get_redis_client().scard(cls._make_key(room_id, cls._ONLINE))
 
     @classmethod
     def clean_room_offline_participants(cls, room_id: int) -> None:
-        offline_room_cache_service = RoomCacheService(f"{room_id}_offline")
-        room_key = cls._make_key(room_id)
+        offline_room_cache_service = RoomCacheService(cls._offline_room_id(room_id))
         offline_room_cache_service.clear_room()
-        cache.set(room_key, {}, cls._DEFAULT_TTL)
+        pipe = get_redis_client().pipeline()
+        pipe.delete(cls._make_key(room_id, cls._OFFLINE))
+        pipe.set(room_snapshot_key(room_id), "", ex=cls._DEFAULT_TTL)
+        pipe.execute()
 
     @classmethod
     def refresh_ttl(cls, room_id: int) -> None:
-        room_key = cls._make_key(room_id)
-        if cache.has_key(room_key):
-            cache.touch(room_key, cls._DEFAULT_TTL)
+        pipe = get_redis_client().pipeline(transaction=False)
+        pipe.expire(cls._make_key(room_id, cls._ONLINE), cls._DEFAULT_TTL)
+        pipe.expire(cls._make_key(room_id, cls._OFFLINE), cls._DEFAULT_TTL)
+        pipe.execute()
+
+
+class AsyncRoomOnlineTracker(BaseRoomOnlineTracker):
+    """
+    Асинхронный вариант RoomOnlineTracker для WebSocket-потребителя.
+
+    Хранит статусы в тех же ключах, что и синхронный трекер.
+
+    Отключение переводит пользователя в офлайн не сразу, а спустя
+    OFFLINE_GRACE_PERIOD_SECONDS: переподключение в пределах окна отменяет
+    переход, и кратковременный обрыв не стоит ни записей, ни уведомлений.
+
+    Срок перехода сохраняется в OFFLINE_DEADLINES_KEY, а задача воркера
+    лишь выполняет его вовремя. Если воркер остановится или упадёт раньше,
+    переход выполнит планировщик любого воркера (RoomTimerScheduler).
+    Запись удаляет тот, кто выполняет переход, поэтому он выполняется
+    один раз.
+
+    Уход голосующего в офлайн уменьшает число голосующих комнаты, поэтому
+    после перехода раунд может оказаться завершённым: тогда итоги
+    подводятся здесь же.
+    """
+
+    _pending_offline: ClassVar[Dict[Tuple[int, str], asyncio.Task]] = {}
+
+    @classmethod
+    async def _set_user_status(cls, user_uuid, room_id, status: bool) -> None:
+        pipe = get_async_redis_client().pipeline()
+        cls._queue_status(pipe, user_uuid, room_id, status)
+        await pipe.execute()
+
+    @classmethod
+    async def set_user_offline(cls, user_uuid: str, room_id: int) -> bool:
+        """
+        Переводит пользователя в офлайн.
+
+        :param user_uuid: UUID пользователя.
+        :param room_id: ID комнаты.
+        :return: False, если пользователя уже нет в комнате.
+        """
+        room_message_service = RoomMessageService(room_id, get_room_broadcast_sender(), AsyncRoomCacheService(room_id))
+
+        if not await AsyncRoomCacheService(room_id).move_user(user_uuid, cls._offline_room_id(room_id)):
+            return False
+        await cls._set_user_status(user_uuid, room_id, False)
+        await room_message_service.anotify_user_offline(user_uuid)
+        return True
+
+    @classmethod
+    async def set_user_online(cls, user_uuid: str, room_id: int) -> None:
+        room_message_service = RoomMessageService(room_id, get_room_broadcast_sender(), AsyncRoomCacheService(room_id))
+        room_offline_cache_service = AsyncRoomCacheService(cls._offline_room_id(room_id))
+
+        restored = await room_offline_cache_service.move_user(user_uuid, room_id)
+
+        await cls._set_user_status(user_uuid, room_id, True)
+        await room_message_service.anotify_user_online(user_uuid)
+        if restored:
+            # Вместе с пользователем в комнату вернулся его голос.
+            await room_message_service.asend_room_voted_users()
+
+    @classmethod
+    async def user_connected(cls, user_uuid: str, room_id: int) -> None:
+        """
+        Отмечает подключение пользователя к комнате.
+
+        Отменяет отложенный переход в офлайн. Если пользователь всё ещё
+        числится онлайн (переподключение в пределах окна), статус не
+        меняется и уведомление не отправляется.
+
+        :param user_uuid: UUID пользователя.
+        :param room_id: ID комнаты.
+        """
+        pending = cls._pending_offline.pop((room_id, user_uuid), None)
+        if pending is not None:
+            pending.cancel()
+            await get_async_redis_client().zrem(OFFLINE_DEADLINES_KEY, cls._offline_deadline(room_id, user_uuid))
+            metrics.increment("presence_offline_cancelled_total")
+
+        if await cls.is_online(user_uuid, room_id):
+            return
+        await cls.set_user_online(user_uuid, room_id)
+
+    @classmethod
+    async def user_disconnected(cls, user_uuid: str, room_id: int) -> None:
+        """
+        Отмечает отключение пользователя от комнаты.
+
+        Вызывается после удаления канала из AsyncUserChannelTracker.
+        Переход в офлайн откладывается на OFFLINE_GRACE_PERIOD_SECONDS
+        (0 — без задержки) и не выполняется, если к этому моменту у
+        пользователя есть открытые каналы в комнате, в том числе на
+        другом воркере. Срок сохраняется в Redis до запуска задачи.
+
+        :param user_uuid: UUID пользователя.
+        :param room_id: ID комнаты.
+        """
+        grace_period = settings.OFFLINE_GRACE_PERIOD_SECONDS
+        if grace_period <= 0:
+            await cls.settle_offline(user_uuid, room_id)
+            return
+
+        await cls.schedule_offline(user_uuid, room_id)
+        key = (room_id, user_uuid)
+        previous = cls._pending_offline.get(key)
+        if previous is not None:
+            previous.cancel()
+        cls._pending_offline[key] = asyncio.create_task(cls._offline_after(grace_period, user_uuid, room_id))
+
+    @classmethod
+    async def schedule_offline(cls, user_uuid: str, room_id: int) -> None:
+        """
+        Сохраняет в Redis срок перехода пользователя в офлайн.
+
+        Срок наступает через OFFLINE_GRACE_PERIOD_SECONDS. Если к этому
+        времени пользователь не подключится, его переведёт в офлайн
+        планировщик любого воркера. Вызывается при каждом отложенном
+        отключении и при отключении в режиме остановки воркера.
+
+        :param user_uuid: UUID пользователя.
+        :param room_id: ID комнаты.
+        """
+        deadline = time.time() + max(settings.OFFLINE_GRACE_PERIOD_SECONDS, 0)
+        member = cls._offline_deadline(room_id, user_uuid)
+        await get_async_redis_client().zadd(OFFLINE_DEADLINES_KEY, {member: deadline})
+
+    @staticmethod
+    def _offline_deadline(room_id: int, user_uuid: str) -> str:
+        return f"{room_id}:{user_uuid}"
+
+    @staticmethod
+    def parse_offline_deadline(member: str) -> Tuple[int, str]:
+        """
+        Разбирает запись OFFLINE_DEADLINES_KEY.
+
+        :param member: Запись «ID комнаты:UUID».
+        :return: ID комнаты и UUID пользователя.
+        """
+        room_id, user_uuid = member.split(":", 1)
+        return int(room_id), user_uuid
+
+    @classmethod
+    async def _offline_after(cls, delay: float, user_uuid: str, room_id: int) -> None:
+        await asyncio.sleep(delay)
+
+        # Дальше задача не отменяется: переход выполняется целиком.
+        key = (room_id, user_uuid)
+        if cls._pending_offline.get(key) is asyncio.current_task():
+            del cls._pending_offline[key]
+
+        try:
+            # Срок мог уже забрать планировщик.
+            member = cls._offline_deadline(room_id, user_uuid)
+            if not await get_async_redis_client().zrem(OFFLINE_DEADLINES_KEY, member):
+                return
+            await cls.settle_offline(user_uuid, room_id)
+        except Exception:
+            logger.exception("Не удалось перевести пользователя в офлайн", room=room_id, user=user_uuid)
+
+    @classmethod
+    async def settle_offline(cls, user_uuid: str, room_id: int) -> None:
+        """
+        Переводит пользователя в офлайн, если у него не осталось открытых
+        каналов в комнате, и подводит итоги завершившегося раунда.
+
+        :param user_uuid: UUID пользователя.
+        :param room_id: ID комнаты.
+        """
+        if await AsyncUserChannelTracker.is_user_connected(room_id, user_uuid):
+            metrics.increment("presence_offline_cancelled_total")
+            return
+
+        if not await cls.set_user_offline(user_uuid, room_id):
+            return
+
+        # Пользователь мог подключиться, пока выполнялся перенос: его
+        # user_connected увидел прежний онлайн-статус и ничего не сделал.
+        if await AsyncUserChannelTracker.is_user_connected(room_id, user_uuid):
+            await cls.set_user_online(user_uuid, room_id)
+            return
+
+        await cls._reveal_if_finished(room_id)
+
+    @classmethod
+    async def _reveal_if_finished(cls, room_id: int) -> None:
+        """
+        Подводит итоги раунда, если после ухода пользователя все оставшиеся
+        голосующие проголосовали.
+
+        :param room_id: ID комнаты.
+        """
+        # votings.logic импортирует этот модуль.
+        from votings.logic import reveal_voting_results
+
+        if not await AsyncRoomCacheService(room_id).is_voting_finished():
+            return
+        active_voting = await AsyncActiveVotingCache.get(room_id)
+        if active_voting is None or active_voting["average_score"] is not None:
+            return
+
+        voting = await database_sync_to_async(reveal_voting_results)(room_id)
+        if voting is not None:
+            room_message_service = RoomMessageService(room_id, get_room_broadcast_sender())
+            await room_message_service.anotify_voting_results(voting.votes, voting.average_score)
+
+    @classmethod
+    async def get_room_participants(cls, room_id: int) -> Dict[str, bool]:
+        pipe = get_async_redis_client().pipeline(transaction=False)
+        pipe.smembers(cls._make_key(room_id, cls._ONLINE))
+        pipe.smembers(cls._make_key(room_id, cls._OFFLINE))
+        return cls._parse_participants(*await pipe.execute())
+
+    @classmethod
+    async def is_online(cls, user_uuid: str, room_id: int) -> bool:
+        return bool(await get_async_redis_client().sismember(cls._make_key(room_id, cls._ONLINE), user_uuid))
+
+    @classmethod
+    async def count_online(cls, room_id: int) -> int:
+        return await get_async_redis_client().scard(cls._make_key(room_id, cls._ONLINE))
+
+    @classmethod
+    async def refresh_ttl(cls, room_id: int) -> None:
+        pipe = get_async_redis_client().pipeline(transaction=False)
+        pipe.expire(cls._make_key(room_id, cls._ONLINE), cls._DEFAULT_TTL)
+        pipe.expire(cls._make_key(room_id, cls._OFFLINE), cls._DEFAULT_TTL)
+        await pipe.execute()
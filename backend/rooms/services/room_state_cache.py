@@ -0,0 +1,231 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+import structlog
+from api.services.metrics_service import metrics
+from django.conf import settings
+
+from rooms.services.redis_client import get_redis_client
+
+logger = structlog.get_logger(__name__)
+
+INVALIDATION_CHANNEL = "room_state:invalidate"
+
+_MISSING = object()
+
+
+class RoomStateCache:
+    """
+    Внутрипроцессный read-through кэш состояния комнат (L1 перед Redis).
+
+    Хранит прочитанные из Redis значения (участники, голоса, данные
+    пользователей) для ограниченного числа комнат с вытеснением по LRU.
+    Любая запись в комнату публикует её ключ в канал INVALIDATION_CHANNEL;
+    фоновый поток каждого воркера подписан на канал и сбрасывает запись
+    комнаты, поэтому все процессы видят изменения.
+
+    Пока подписка не установлена (старт, переподключение), кэш не отдаёт
+    и не сохраняет значения — все чтения идут напрямую в Redis.
+
+    Поколения ведутся по комнатам: запись в одну комнату не мешает
+    сохранить значения, прочитанные из других.
+    """
+
+    # Во сколько раз число хранимых поколений может превысить max_rooms,
+    # прежде чем они будут сброшены к общему минимуму.
+    _GENERATIONS_PER_ROOM = 4
+
+    def __init__(self, max_rooms: int, max_age: float):
+        """
+        :param max_rooms: Максимальное число комнат в кэше.
+        :param max_age: Максимальный возраст записи (секунды) — страховка
+            на случай пропущенного сообщения об инвалидации.
+        """
+        self.max_rooms = max_rooms
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._rooms: OrderedDict[str, Tuple[float, Dict[str, Any]]] = OrderedDict()
+        self._invalidations = 0
+        self._base_generation = 0
+        self._generations: Dict[str, int] = {}
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._listener: threading.Thread | None = None
+
+    @property
+    def size(self) -> int:
+        return len(self._rooms)
+
+    def generation(self, room_key: str) -> int:
+        """
+        Номер поколения комнаты, меняется при каждой её инвалидации.
+
+        Читатель запоминает его до запроса в Redis и передаёт в set, чтобы
+        не сохранить значение, прочитанное до конкурентной записи.
+
+        :param room_key: Ключ комнаты.
+        """
+        with self._lock:
+            return self._generations.get(room_key, self._base_generation)
+
+    def get(self, room_key: str, field: str) -> Tuple[bool, Any]:
+        """
+        Возвращает значение поля комнаты из кэша.
+
+        :param room_key: Ключ комнаты.
+        :param field: Имя кэшируемого значения.
+        :return: Пара (найдено, копия значения).
+        """
+        if not self._ready.is_set():
+            return False, None
+
+        with self._lock:
+            entry = self._rooms.get(room_key)
+            value = _MISSING
+            if entry is not None:
+                created_at, fields = entry
+                if time.monotonic() - created_at > self.max_age:
+                    del self._rooms[room_key]
+                else:
+                    self._rooms.move_to_end(room_key)
+                    value = fields.get(field, _MISSING)
+
+        if value is _MISSING:
+            metrics.increment("room_state_cache_misses")
+            return False, None
+
+        metrics.increment("room_state_cache_hits")
+        return True, copy.deepcopy(value)
+
+    def set(self, room_key: str, field: str, value: Any, generation: int) -> None:
+        """
+        Сохраняет значение поля комнаты.
+
+        Отсутствующие значения (None) не сохраняются: ключ может появиться
+        раньше, чем до воркера дойдёт сообщение об инвалидации.
+
+        :param room_key: Ключ комнаты.
+        :param field: Имя кэшируемого значения.
+        :param value: Прочитанное из Redis значение.
+        :param generation: Поколение комнаты на момент начала чтения.
+        """
+        if not self._ready.is_set() or value is None:
+            return
+
+        value = copy.deepcopy(value)
+        with self._lock:
+            if generation != self._generations.get(room_key, self._base_generation):
+                return
+
+            entry = self._rooms.get(room_key)
+            if entry is None:
+                entry = (time.monotonic(), {})
+                self._rooms[room_key] = entry
+            entry[1][field] = value
+            self._rooms.move_to_end(room_key)
+
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+                metrics.increment("room_state_cache_evictions")
+
+    def invalidate(self, room_key: str) -> None:
+        """
+        Сбрасывает закэшированное состояние комнаты в текущем процессе.
+
+        :param room_key: Ключ комнаты.
+        """
+        with self._lock:
+            self._invalidations += 1
+            self._generations[room_key] = self._invalidations
+            self._rooms.pop(room_key, None)
+
+            if len(self._generations) > self.max_rooms * self._GENERATIONS_PER_ROOM:
+                # Поколения, выданные до сброса, не больше нового минимума; совпасть
+                # с ним может только поколение этой комнаты, и оно по-прежнему верно.
+                self._base_generation = self._invalidations
+                self._generations.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += 1
+            self._base_generation = self._invalidations
+            self._generations.clear()
+            self._rooms.clear()
+
+    def start(self) -> None:
+        """
+        Запускает фоновый поток подписки на инвалидации.
+        """
+        self._listener = threading.Thread(target=self._listen, name="room-state-cache", daemon=True)
+        self._listener.start()
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+        self._ready.clear()
+        self.clear()
+
+    def _listen(self) -> None:
+        while not self._stopped.is_set():
+            pubsub = None
+            try:
+                pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Пока подписки не было, сообщения могли быть пропущены.
+                self.clear()
+                self._ready.set()
+
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        room_key = message["data"]
+                        self.invalidate(room_key.decode() if isinstance(room_key, bytes) else room_key)
+            except Exception:
+                logger.exception("Потеряна подписка на инвалидации кэша комнат")
+                self._ready.clear()
+                self.clear()
+                self._stopped.wait(1.0)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+
+
+_room_state_cache: RoomStateCache | None = None
+_room_state_cache_lock = threading.Lock()
+
+
+def get_room_state_cache() -> RoomStateCache | None:
+    """
+    Возвращает L1-кэш состояния комнат текущего процесса.
+
+    Кэш включается настройкой ROOM_STATE_CACHE_MAX_ROOMS (0 — выключен).
+
+    :return: Экземпляр кэша или None, если кэш выключен.
+    """
+    global _room_state_cache
+    if not settings.ROOM_STATE_CACHE_MAX_ROOMS:
+        return None
+
+    if _room_state_cache is None:
+        with _room_state_cache_lock:
+            if _room_state_cache is None:
+                cache = RoomStateCache(settings.ROOM_STATE_CACHE_MAX_ROOMS, settings.ROOM_STATE_CACHE_MAX_AGE)
+                cache.start()
+                metrics.register_gauge("room_state_cache_size", lambda: cache.size)
+                _room_state_cache = cache
+    return _room_state_cache
+
+
+def reset_room_state_cache() -> None:
+    """
+    Останавливает и сбрасывает L1-кэш процесса.
+    """
+    global _room_state_cache
+    with _room_state_cache_lock:
+        if _room_state_cache is not None:
+            _room_state_cache.close()
+            _room_state_cache = None
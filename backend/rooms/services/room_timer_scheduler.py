@@ -0,0 +1,168 @@
+import asyncio
+import contextlib
+import time
+from typing import List, Tuple
+
+import structlog
+from api.services.metrics_service import metrics
+from channels.db import database_sync_to_async
+from django.conf import settings
+from votings.logic import reveal_voting_results
+
+from rooms.services import redis_scripts
+from rooms.services.message_senders.coalescing import get_room_broadcast_sender
+from rooms.services.redis_client import get_async_redis_client
+from rooms.services.room_cache_service import TIMER_DEADLINES_KEY, AsyncRoomCacheService
+from rooms.services.room_message_service import RoomMessageService
+from rooms.services.room_online_tracker import OFFLINE_DEADLINES_KEY, AsyncRoomOnlineTracker
+
+logger = structlog.get_logger(__name__)
+
+
+class RoomTimerScheduler:
+    """
+    Планировщик окончания таймеров комнат.
+
+    Запускается в event loop каждого воркера. Сроки таймеров хранятся в
+    общем sorted set TIMER_DEADLINES_KEY; в момент окончания воркер
+    атомарно забирает запись из расписания и отправляет группе комнаты
+    событие timer_expired. Запись получает только один воркер, поэтому
+    событие отправляется один раз, сколько бы воркеров ни было запущено.
+
+    Если включена настройка TIMER_AUTO_REVEAL, тот же воркер подводит
+    итоги активного голосования комнаты и отправляет results.
+
+    Тем же способом планировщик забирает сроки из OFFLINE_DEADLINES_KEY и
+    переводит в офлайн пользователей остановленных воркеров, которые не
+    переподключились.
+    """
+
+    def __init__(self, poll_interval: float = 1.0, batch_size: int = 100):
+        """
+        :param poll_interval: Максимальная пауза между проверками (секунды):
+            за это время другой воркер мог поставить более ранний таймер.
+        :param batch_size: Сколько таймеров забирать за один запрос.
+        """
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._task: asyncio.Task | None = None
+        self._claim_script = None
+
+    async def _claim_due(self, key: str, now: float) -> List[Tuple[str, float]]:
+        redis = get_async_redis_client()
+        if self._claim_script is None or self._claim_script.registered_client is not redis:
+            self._claim_script = redis.register_script(redis_scripts.CLAIM_DUE_TIMERS)
+
+        due = await self._claim_script(keys=[key], args=[now, self.batch_size])
+        return [
+            (member.decode() if isinstance(member, bytes) else member, float(end_time))
+            for member, end_time in zip(due[::2], due[1::2], strict=True)
+        ]
+
+    async def run_once(self) -> int:
+        """
+        Отправляет timer_expired для всех наступивших сроков.
+
+        :return: Число завершившихся таймеров.
+        """
+        expired = 0
+        while True:
+            due = await self._claim_due(TIMER_DEADLINES_KEY, time.time())
+            for room_id, end_time in due:
+                await AsyncRoomCacheService(room_id).invalidate_snapshot()
+                room_message_service = RoomMessageService(room_id, get_room_broadcast_sender())
+                await room_message_service.anotify_room_timer_expired(end_time)
+                logger.info("Таймер истёк", room=room_id, timer_end_time=end_time)
+
+                if settings.TIMER_AUTO_REVEAL:
+                    await self._reveal_results(room_message_service, room_id)
+
+            expired += len(due)
+            if len(due) < self.batch_size:
+                break
+
+        metrics.increment("room_timers_expired_total", expired)
+        return expired
+
+    async def settle_offline_once(self) -> int:
+        """
+        Переводит в офлайн пользователей остановленных воркеров, срок
+        переподключения которых истёк.
+
+        :return: Число обработанных сроков.
+        """
+        settled = 0
+        while True:
+            due = await self._claim_due(OFFLINE_DEADLINES_KEY, time.time())
+            for member, _ in due:
+                room_id, user_uuid = AsyncRoomOnlineTracker.parse_offline_deadline(member)
+                try:
+                    await AsyncRoomOnlineTracker.settle_offline(user_uuid, room_id)
+                except Exception:
+                    logger.exception("Не удалось перевести пользователя в офлайн", room=room_id, user=user_uuid)
+
+            settled += len(due)
+            if len(due) < self.batch_size:
+                break
+
+        return settled
+
+    @staticmethod
+    async def _reveal_results(room_message_service: RoomMessageService, room_id: str) -> None:
+        try:
+            voting = await database_sync_to_async(reveal_voting_results)(room_id)
+        except Exception:
+            logger.exception("Не удалось подвести итоги по таймеру", room=room_id)
+            return
+
+        if voting is not None:
+            metrics.increment("voting_timer_reveals_total")
+            await room_message_service.anotify_voting_results(voting.votes, voting.average_score)
+
+    async def _next_delay(self) -> float:
+        pipe = get_async_redis_client().pipeline(transaction=False)
+        pipe.zrange(TIMER_DEADLINES_KEY, 0, 0, withscores=True)
+        pipe.zrange(OFFLINE_DEADLINES_KEY, 0, 0, withscores=True)
+        deadlines = [deadline for nearest in await pipe.execute() for _, deadline in nearest]
+        if not deadlines:
+            return self.poll_interval
+        return min(max(min(deadlines) - time.time(), 0), self.poll_interval)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+                await self.settle_offline_once()
+                delay = await self._next_delay()
+            except Exception:
+                logger.exception("Ошибка планировщика таймеров")
+                delay = self.poll_interval
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        """
+        Запускает планировщик в текущем event loop.
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+
+_room_timer_scheduler: RoomTimerScheduler | None = None
+
+
+def get_room_timer_scheduler() -> RoomTimerScheduler:
+    """
+    Возвращает планировщик таймеров текущего процесса.
+    """
+    global _room_timer_scheduler
+    if _room_timer_scheduler is None:
+        _room_timer_scheduler = RoomTimerScheduler()
+    return _room_timer_scheduler
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+
+import pytest
+from channels.layers import get_channel_layer
+from users.enums import UserRole
+
+from rooms.services.frames import frame_payload
+from rooms.services.message_senders.base import MessageSender
+from rooms.services.message_senders.coalescing import CoalescingMessageSender
+from rooms.services.message_senders.composite import CompositeMessageSender
+from rooms.services.message_senders.django_channel import DjangoChannelMessageSender
+from rooms.services.room_cache_service import AsyncRoomCacheService
+from rooms.services.room_message_service import RoomMessageService
+
+
+class RecordingSender(MessageSender):
+    def __init__(self):
+        self.sent = []
+        self.flushed = threading.Event()
+
+    def send(self, group_name: str, message: dict) -> None:
+        self.sent.append((group_name, message))
+        self.flushed.set()
+
+
+class AsyncRecordingSender(RecordingSender):
+    def send(self, group_name: str, message: dict) -> None:
+        raise AssertionError("sync path must not be used from the event loop")
+
+    async def asend(self, group_name: str, message: dict) -> None:
+        self.sent.append((group_name, message))
+
+
+@pytest.fixture
+def recorder():
+    return RecordingSender()
+
+
+def voted(*uuids):
+    return {"type": "voted_users_update", "voted_users": list(uuids)}
+
+
+def presence(message_type, uuid):
+    return {"type": message_type, "user": {uuid: {"nickname": uuid, "role": "voter"}}}
+
+
+def test_vote_burst_collapses_into_single_frame(recorder):
+    sender = CoalescingMessageSender(recorder, window=60)
+
+    for count in range(1, 51):
+        sender.send("room_1", voted(*[f"u{i}" for i in range(count)]))
+    sender.flush("room_1")
+
+    assert len(recorder.sent) == 1
+    assert recorder.sent[0] == ("room_1", voted(*[f"u{i}" for i in range(50)]))
+
+
+def test_presence_keeps_latest_status_per_user(recorder):
+    sender = CoalescingMessageSender(recorder, window=60)
+
+    sender.send("room_1", presence("user_offline", "a"))
+    sender.send("room_1", presence("user_offline", "b"))
+    sender.send("room_1", presence("user_online", "a"))
+    sender.flush("room_1")
+
+    assert [message for _, message in recorder.sent] == [
+        presence("user_offline", "b"),
+        presence("user_online", "a"),
+    ]
+
+
+def test_other_messages_flush_buffer_first(recorder):
+    sender = CoalescingMessageSender(recorder, window=60)
+    results = {"type": "results", "votes": {}, "average_score": 3}
+
+    sender.send("room_1", voted("a"))
+    sender.send("room_2", voted("b"))
+    sender.send("room_1", results)
+
+    assert recorder.sent == [("room_1", voted("a")), ("room_1", results)]
+
+
+def test_buffer_is_flushed_after_window(recorder):
+    sender = CoalescingMessageSender(recorder, window=0.01)
+
+    sender.send("room_1", voted("a"))
+
+    assert recorder.flushed.wait(2)
+    assert recorder.sent == [("room_1", voted("a"))]
+
+
+def test_zero_window_sends_immediately(recorder):
+    sender = CoalescingMessageSender(recorder, window=0)
+
+    sender.send("room_1", voted("a"))
+    sender.send("room_1", voted("a", "b"))
+
+    assert len(recorder.sent) == 2
+
+
+@pytest.mark.asyncio
+async def test_channel_sender_asend_delivers_from_event_loop():
+    layer = get_channel_layer()
+    channel = await layer.new_channel()
+    await layer.group_add("room_1", channel)
+
+    await DjangoChannelMessageSender().asend("room_1", {"type": "voting_started", "id": 1})
+
+    event = await layer.receive(channel)
+    assert event["type"] == "voting_started"
+    assert frame_payload(event) == {"type": "voting_started", "id": 1}
+
+
+@pytest.mark.asyncio
+async def test_composite_asend_uses_async_senders():
+    first, second = AsyncRecordingSender(), AsyncRecordingSender()
+    composite = CompositeMessageSender()
+    composite.add_sender(first)
+    composite.add_sender(second)
+
+    await composite.asend("room_1", voted("a"))
+
+    assert first.sent == second.sent == [("room_1", voted("a"))]
+
+
+@pytest.mark.asyncio
+async def test_coalescing_asend_flushes_buffer_through_asend():
+    inner = AsyncRecordingSender()
+    sender = CoalescingMessageSender(inner, window=60)
+    results = {"type": "results", "votes": {}, "average_score": 3}
+
+    await sender.asend("room_1", voted("a"))
+    await sender.asend("room_1", voted("a", "b"))
+    await sender.asend("room_1", results)
+
+    assert inner.sent == [("room_1", voted("a", "b")), ("room_1", results)]
+
+
+@pytest.mark.asyncio
+async def test_coalescing_asend_flushes_window_on_event_loop():
+    inner = AsyncRecordingSender()
+    sender = CoalescingMessageSender(inner, window=0.01)
+
+    await sender.asend("room_1", voted("a"))
+    await sender.asend("room_1", voted("a", "b"))
+    for _ in range(200):
+        if inner.sent:
+            break
+        await asyncio.sleep(0.01)
+
+    assert inner.sent == [("room_1", voted("a", "b"))]
+
+
+@pytest.mark.asyncio
+async def test_room_message_service_async_notifications(fake_redis):
+    room_cache = AsyncRoomCacheService(1)
+    await room_cache.add_user("u1", UserRole.VOTER, "Bob")
+    await room_cache.set_vote("u1", 3)
+    sender = AsyncRecordingSender()
+    service = RoomMessageService(1, sender, room_cache)
+
+    await service.anotify_user_online("u1")
+    await service.asend_room_voted_users()
+
+    assert sender.sent == [
+        ("room_1", {"type": "user_online", "user": {"u1": {"role": "voter", "nickname": "Bob"}}}),
+        ("room_1", {"type": "voted_users_update", "voted_users": ["u1"]}),
+    ]
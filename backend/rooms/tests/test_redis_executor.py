@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from asgiref.sync import sync_to_async
+
+from api.services.metrics_service import metrics
+from rooms.services.redis_executor import get_redis_executor, redis_sync_to_async
+
+
+@pytest.mark.asyncio
+async def test_redis_calls_run_in_dedicated_pool():
+    thread_names = await asyncio.gather(*[
+        redis_sync_to_async(lambda: threading.current_thread().name)() for _ in range(4)
+    ])
+
+    assert all(name.startswith("redis") for name in thread_names)
+
+
+@pytest.mark.asyncio
+async def test_redis_calls_do_not_serialize_behind_thread_sensitive_work():
+    """
+    Блокирующие вызовы Redis не должны ждать единственный thread-sensitive поток.
+    """
+    release = threading.Event()
+
+    def slow_db_call():
+        release.wait(timeout=5)
+
+    db_task = asyncio.ensure_future(sync_to_async(slow_db_call)())
+    await asyncio.sleep(0.05)
+
+    started = time.monotonic()
+    await asyncio.gather(*[redis_sync_to_async(time.sleep)(0.05) for _ in range(4)])
+    elapsed = time.monotonic() - started
+
+    release.set()
+    await db_task
+    assert elapsed < 1
+
+
+@pytest.mark.asyncio
+async def test_redis_executor_metrics():
+    executor = get_redis_executor()
+    before = metrics.get_counter("redis_executor_tasks_total")
+
+    await redis_sync_to_async(lambda: None)()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["redis_executor_tasks_total"] == before + 1
+    assert snapshot["gauges"]["redis_executor_pool_size"] == executor.max_workers
+    assert snapshot["gauges"]["redis_executor_queue_depth"] == 0
+    assert snapshot["gauges"]["redis_executor_active"] == 0
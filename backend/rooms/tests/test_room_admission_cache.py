@@ -0,0 +1,48 @@
+from unittest.mock import patch
+
+import pytest
+from django.urls import reverse
+
+from rooms.models import Room
+from rooms.services.redis_client import get_redis_client
+from rooms.services.room_admission_cache import AsyncRoomAdmissionCache, RoomAdmissionCache
+
+
+def _cached_status(room_id):
+    redis = get_redis_client()
+    if not redis.getbit(RoomAdmissionCache._KNOWN_KEY, room_id):
+        return None
+    return bool(redis.getbit(RoomAdmissionCache._ACTIVE_KEY, room_id))
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_admission_reads_database_once_per_room(room):
+    missing_id = room.id + 1000
+
+    assert await AsyncRoomAdmissionCache.is_active(room.id)
+    assert not await AsyncRoomAdmissionCache.is_active(missing_id)
+
+    with patch.object(AsyncRoomAdmissionCache, "_queryset") as queryset:
+        assert await AsyncRoomAdmissionCache.is_active(room.id)
+        assert not await AsyncRoomAdmissionCache.is_active(missing_id)
+    queryset.assert_not_called()
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_stale_fill_does_not_readmit_deleted_room(room):
+    RoomAdmissionCache.set_active(room.id, False)
+
+    # Чтение из базы, начатое до удаления комнаты, завершилось позже.
+    await AsyncRoomAdmissionCache._fill(room.id, True)
+
+    assert not await AsyncRoomAdmissionCache.is_active(room.id)
+
+@pytest.mark.django_db
+def test_delete_and_reset_update_admission(api_client, admin_user, room):
+    api_client.force_authenticate(user=admin_user)
+    api_client.delete(reverse("room_detail", args=[room.id]))
+    assert _cached_status(room.id) is False
+
+    other = Room.objects.create(name="Other", active=False)
+    other.reset_to_default()
+    assert _cached_status(other.id) is True
@@ -1,14 +1,25 @@
+import json
 import time
 from datetime import datetime, timezone
 from uuid import uuid4
 
 import pytest
+from api.services.metrics_service import metrics
+from redis.client import Pipeline
+from rest_framework.exceptions import ValidationError
 from users.enums import UserRole
 
-from rooms.services.room_cache_service import RoomCacheService
+from rooms.services.room_cache_service import (
+    TIMER_DEADLINES_KEY,
+    AsyncRoomCacheService,
+    RoomCacheConflictError,
+    RoomCacheService,
+    TimerExistsError,
+    VoteRejectedError,
+)
 
 
-def test_add_and_get_user(fake_cache, room):
+def test_add_and_get_user(fake_redis, room):
     rcs = RoomCacheService(room.name)
     user_id = str(uuid4())
 
@@ -23,14 +34,14 @@ def test_add_and_get_user(fake_cache, room):
     assert user_id in room_users
     assert room_users[user_id]["nickname"] == "alice"
 
-def test_add_existing_user_raises(fake_cache, room):
+def test_add_existing_user_raises(fake_redis, room):
     rcs = RoomCacheService(room.name)
     user_id = str(uuid4())
     rcs.add_user(user_id, role=UserRole.VOTER)
     with pytest.raises(ValueError):
         rcs.add_user(user_id, role=UserRole.VOTER)
 
-def test_remove_user(fake_cache, room):
+def test_remove_user(fake_redis, room):
     rcs = RoomCacheService(room.name)
     user_id = str(uuid4())
     rcs.add_user(user_id, role=UserRole.OBSERVER)
@@ -40,7 +51,7 @@ def test_remove_user(fake_cache, room):
     assert rcs.get_user(user_id) is None
     assert user_id not in rcs.get_room_users()
 
-def test_get_users_by_role(fake_cache, room):
+def test_get_users_by_role(fake_redis, room):
     rcs = RoomCacheService(room.name)
     u1 = str(uuid4())
     u2 = str(uuid4())
@@ -51,7 +62,7 @@ def test_get_users_by_role(fake_cache, room):
     assert u1 in voters
     assert u2 not in voters
 
-def test_set_vote_success_and_invalid(fake_cache, room):
+def test_set_vote_success_and_invalid(fake_redis, room):
     rcs = RoomCacheService(room.name)
     uid_voter = "voter-1"
     uid_observer = "admin-1"
@@ -68,7 +79,7 @@ def test_set_vote_success_and_invalid(fake_cache, room):
     with pytest.raises(ValueError):
         rcs.set_vote(uid_observer, 1)
 
-def test_remove_user_vote_and_clear_votes(fake_cache, room):
+def test_remove_user_vote_and_clear_votes(fake_redis, room):
     rcs = RoomCacheService(room.name)
     uid = str(uuid4())
     rcs.add_user(uid, role=UserRole.VOTER, nickname="Vin")
@@ -82,7 +93,7 @@ def test_remove_user_vote_and_clear_votes(fake_cache, room):
     rcs.clear_votes()
     assert rcs.get_votes() == {}
 
-def test_transfer_user_moves_user_and_vote_to_target(fake_cache):
+def test_transfer_user_moves_user_and_vote_to_target(fake_redis):
     src = RoomCacheService("room-src")
     tgt_room_id = "room-tgt"
     uid = str(uuid4())
@@ -100,7 +111,33 @@ def test_transfer_user_moves_user_and_vote_to_target(fake_cache):
     assert uid in tgt.get_votes()
     assert uid not in src.get_votes()
 
-def test_clear_room_deletes_all(fake_cache, room):
+def test_transfer_user_missing_from_source_raises(fake_redis):
+    src = RoomCacheService("room-src")
+    uid = str(uuid4())
+    RoomCacheService("room-other").add_user(uid, role=UserRole.VOTER, nickname="Tr")
+
+    assert src.move_user(uid, "room-tgt") is False
+    with pytest.raises(ValidationError):
+        src.transfer_user(uid, "room-tgt")
+    assert RoomCacheService("room-tgt").get_room_users() == {}
+
+def test_transfer_user_is_single_round_trip(fake_redis, redis_traffic):
+    src = RoomCacheService("hop-src")
+    for _ in range(2):
+        uid = str(uuid4())
+        src.add_user(uid, role=UserRole.VOTER, nickname="Tr")
+        src.set_vote(uid, 5)
+
+    src.transfer_user(uid, "hop-tgt")
+    uid = next(iter(src.get_room_users()))
+
+    redis_traffic.reset()
+    src.transfer_user(uid, "hop-tgt")
+
+    assert redis_traffic.round_trips == 1
+    assert RoomCacheService("hop-tgt").get_vote_tally() == {"voters": 2, "votes": 2, "sum": 10}
+
+def test_clear_room_deletes_all(fake_redis, room):
     rcs = RoomCacheService(room.name)
     u1 = str(uuid4())
     u2 = str(uuid4())
@@ -115,7 +152,7 @@ def test_clear_room_deletes_all(fake_cache, room):
     assert rcs.get_user(u1) is None
     assert rcs.get_user(u2) is None
 
-def test_start_and_get_room_timer(fake_cache, room):
+def test_start_and_get_room_timer(fake_redis, room):
     rcs = RoomCacheService(room.id)
 
     now = datetime.now(timezone.utc).timestamp()
@@ -125,7 +162,7 @@ def test_start_and_get_room_timer(fake_cache, room):
 
     assert rcs.get_room_timer() == end_time
 
-def test_start_room_timer_invalid_end_time(fake_cache, room):
+def test_start_room_timer_invalid_end_time(fake_redis, room):
     rcs = RoomCacheService(room.id)
 
     end_time = time.time() - 3600
@@ -134,10 +171,259 @@ def test_start_room_timer_invalid_end_time(fake_cache, room):
         rcs.start_room_timer(end_time)
     assert rcs.get_room_timer() is None
 
-def test_reset_room_timer(fake_cache, room):
+def test_reset_room_timer(fake_redis, room):
     rcs = RoomCacheService(room.id)
 
     rcs.start_room_timer(time.time() + 3600)
     rcs.reset_room_timer()
 
     assert rcs.get_room_timer() is None
+    assert fake_redis.zscore(TIMER_DEADLINES_KEY, str(room.id)) is None
+
+def test_start_room_timer_is_set_once_and_scheduled(fake_redis, room):
+    rcs = RoomCacheService(room.id)
+    end_time = time.time() + 3600
+
+    rcs.start_room_timer(end_time)
+    with pytest.raises(TimerExistsError):
+        rcs.start_room_timer(end_time + 60)
+
+    assert rcs.get_room_timer() == end_time
+    assert fake_redis.zscore(TIMER_DEADLINES_KEY, str(room.id)) == end_time
+
+def test_room_state_stored_in_native_structures(fake_redis, room):
+    rcs = RoomCacheService(room.id)
+    u1 = str(uuid4())
+    u2 = str(uuid4())
+    rcs.add_user(u1, role=UserRole.VOTER, nickname="V1")
+    rcs.add_user(u2, role=UserRole.VOTER, nickname="V2")
+    rcs.set_vote(u1, 8)
+
+    assert fake_redis.type(rcs.users_key) == b"set"
+    assert fake_redis.type(rcs.votes_key) == b"hash"
+    assert fake_redis.smembers(rcs.users_key) == {u1.encode(), u2.encode()}
+    assert fake_redis.hkeys(rcs.votes_key) == [u1.encode()]
+
+def test_submit_vote_reports_finish_with_votes(fake_redis, room):
+    rcs = RoomCacheService(room.id)
+    u1 = str(uuid4())
+    u2 = str(uuid4())
+    rcs.add_user(u1, role=UserRole.VOTER, nickname="V1")
+    rcs.add_user(u2, role=UserRole.VOTER, nickname="V2")
+    rcs.add_user(str(uuid4()), role=UserRole.OBSERVER, nickname="O")
+
+    assert rcs.submit_vote(u1, 3) == (False, {})
+
+    finished, votes = rcs.submit_vote(u2, 5)
+    assert finished
+    assert votes == {
+        u1: {"nickname": "V1", "vote": 3},
+        u2: {"nickname": "V2", "vote": 5},
+    }
+
+def test_submit_vote_rejects_unknown_and_observer(fake_redis, room):
+    rcs = RoomCacheService(room.id)
+    observer = str(uuid4())
+    rcs.add_user(observer, role=UserRole.OBSERVER, nickname="O")
+
+    with pytest.raises(VoteRejectedError):
+        rcs.submit_vote(str(uuid4()), 1)
+    with pytest.raises(VoteRejectedError):
+        rcs.submit_vote(observer, 1)
+    assert rcs.get_votes() == {}
+
+def test_vote_tally_follows_room_changes(fake_redis):
+    src = RoomCacheService("tally-src")
+    tgt = RoomCacheService("tally-tgt")
+    u1 = str(uuid4())
+    u2 = str(uuid4())
+    src.add_user(u1, role=UserRole.VOTER, nickname="V1")
+    src.add_user(u2, role=UserRole.VOTER, nickname="V2")
+    src.add_user(str(uuid4()), role=UserRole.OBSERVER, nickname="O")
+    assert src.get_vote_tally() == {"voters": 2, "votes": 0, "sum": 0}
+
+    src.set_vote(u1, 3)
+    src.set_vote(u1, 5)
+    src.submit_vote(u2, 8)
+    assert src.get_vote_tally() == {"voters": 2, "votes": 2, "sum": 13}
+    assert src.is_voting_finished()
+
+    src.transfer_user(u2, "tally-tgt")
+    assert src.get_vote_tally() == {"voters": 1, "votes": 1, "sum": 5}
+    assert tgt.get_vote_tally() == {"voters": 1, "votes": 1, "sum": 8}
+
+    src.remove_user_vote(u1)
+    assert src.get_vote_tally() == {"voters": 1, "votes": 0, "sum": 0}
+    assert not src.is_voting_finished()
+
+    src.remove_user(u1)
+    assert src.get_vote_tally()["voters"] == 0
+
+    tgt.clear_votes()
+    assert tgt.get_vote_tally() == {"voters": 1, "votes": 0, "sum": 0}
+
+def _join_cost(redis_traffic, room_size):
+    rcs = RoomCacheService(f"bench-{room_size:04d}")
+    for _ in range(room_size):
+        rcs.add_user(str(uuid4()), role=UserRole.VOTER, nickname="member")
+
+    redis_traffic.reset()
+    rcs.add_user(str(uuid4()), role=UserRole.VOTER, nickname="newcomer")
+    return redis_traffic.round_trips, redis_traffic.bytes_sent
+
+def test_join_cost_is_flat_as_room_grows(fake_redis, redis_traffic):
+    small_room = _join_cost(redis_traffic, 5)
+    large_room = _join_cost(redis_traffic, 200)
+
+    assert small_room == large_room
+
+def test_refresh_ttl_covers_room_key_family(fake_redis, room):
+    rcs = RoomCacheService(room.id, ttl=100)
+    uid = str(uuid4())
+    rcs.add_user(uid, role=UserRole.VOTER, nickname="V")
+    rcs.set_vote(uid, 2)
+    for key in (rcs.users_key, rcs.votes_key, rcs.tally_key, f"user:{uid}:data"):
+        fake_redis.persist(key)
+
+    rcs.refresh_ttl()
+
+    for key in (rcs.users_key, rcs.votes_key, rcs.tally_key, f"user:{uid}:data"):
+        assert 0 < fake_redis.ttl(key) <= 100
+
+@pytest.mark.asyncio
+async def test_async_service_shares_state_with_sync_service(fake_redis):
+    sync_rcs = RoomCacheService("async-room")
+    async_rcs = AsyncRoomCacheService("async-room")
+    u1 = str(uuid4())
+    u2 = str(uuid4())
+
+    await async_rcs.add_user(u1, role=UserRole.VOTER, nickname="A1")
+    sync_rcs.add_user(u2, role=UserRole.VOTER, nickname="S2")
+
+    assert set(await async_rcs.get_room_users()) == {u1, u2}
+    assert await async_rcs.submit_vote(u1, 2) == (False, {})
+
+    finished, votes = await async_rcs.submit_vote(u2, 4)
+    assert finished
+    assert votes == sync_rcs.get_votes()
+    assert await async_rcs.get_vote_tally() == {"voters": 2, "votes": 2, "sum": 6}
+
+@pytest.mark.asyncio
+async def test_async_transfer_user_moves_user_and_vote(fake_redis):
+    src = AsyncRoomCacheService("async-src")
+    uid = str(uuid4())
+    await src.add_user(uid, role=UserRole.VOTER, nickname="Tr")
+    await src.set_vote(uid, 3)
+
+    await src.transfer_user(uid, "async-tgt")
+
+    tgt = RoomCacheService("async-tgt")
+    assert uid in tgt.get_room_users()
+    assert tgt.get_votes()[uid]["vote"] == 3
+    assert await src.get_votes() == {}
+    assert await src.get_room_users() == {}
+
+def _interfere_before_commit(monkeypatch, fake_redis, times):
+    """Имитирует запись другого клиента между WATCH и EXEC первых ``times`` транзакций."""
+    original_multi = Pipeline.multi
+    calls = {"count": 0}
+
+    def multi(pipe):
+        if calls["count"] < times:
+            calls["count"] += 1
+            fake_redis.sadd("room:contended:users", f"intruder-{calls['count']}")
+        return original_multi(pipe)
+
+    monkeypatch.setattr(Pipeline, "multi", multi)
+
+def test_add_user_retries_on_concurrent_write(fake_redis, monkeypatch):
+    rcs = RoomCacheService("contended")
+    retries = metrics.get_counter("room_cache_add_user_retries")
+    _interfere_before_commit(monkeypatch, fake_redis, times=2)
+
+    rcs.add_user("u1", role=UserRole.VOTER, nickname="V")
+
+    assert metrics.get_counter("room_cache_add_user_retries") == retries + 2
+    assert "u1" in rcs.get_room_users()
+    assert rcs.get_vote_tally()["voters"] == 1
+
+def test_add_user_aborts_after_bounded_retries(fake_redis, monkeypatch):
+    rcs = RoomCacheService("contended")
+    aborts = metrics.get_counter("room_cache_add_user_aborts")
+    _interfere_before_commit(monkeypatch, fake_redis, times=RoomCacheService._MAX_TRANSACTION_RETRIES)
+
+    with pytest.raises(RoomCacheConflictError):
+        rcs.add_user("u1", role=UserRole.VOTER, nickname="V")
+
+    assert metrics.get_counter("room_cache_add_user_aborts") == aborts + 1
+    assert rcs.get_user("u1") is None
+
+def test_clear_room_does_not_leave_concurrently_added_user(fake_redis, monkeypatch):
+    rcs = RoomCacheService("contended")
+    rcs.add_user("u1", role=UserRole.VOTER, nickname="V")
+    _interfere_before_commit(monkeypatch, fake_redis, times=1)
+
+    rcs.clear_room()
+
+    assert not fake_redis.exists(rcs.users_key)
+    assert metrics.get_counter("room_cache_clear_room_retries") >= 1
+
+@pytest.mark.asyncio
+async def test_async_add_user_is_transactional(fake_redis):
+    rcs = AsyncRoomCacheService("async-tx")
+
+    await rcs.add_user("u1", role=UserRole.VOTER, nickname="V")
+    with pytest.raises(ValueError, match="User already exists"):
+        await rcs.add_user("u1", role=UserRole.VOTER, nickname="V")
+    await rcs.clear_room()
+
+    assert await rcs.get_room_users() == {}
+
+def test_snapshot_is_single_get_until_room_changes(fake_redis, redis_traffic):
+    rcs = RoomCacheService("snap-room")
+    voter, observer = str(uuid4()), str(uuid4())
+    rcs.add_user(voter, role=UserRole.VOTER, nickname="V")
+    rcs.add_user(observer, role=UserRole.OBSERVER, nickname="O")
+    first = json.loads(rcs.get_snapshot())
+
+    redis_traffic.reset()
+    assert json.loads(rcs.get_snapshot()) == first
+    assert redis_traffic.round_trips == 1
+
+    rcs.submit_vote(voter, 3)
+    updated = json.loads(rcs.get_snapshot())
+
+    assert set(first["participants"]) == {voter, observer}
+    assert first["voted_users"] == []
+    assert updated["voted_users"] == [voter]
+    assert updated["version"] > first["version"]
+
+def test_snapshot_built_during_write_is_not_stored(fake_redis, monkeypatch):
+    rcs = RoomCacheService("snap-race")
+    voter = str(uuid4())
+    rcs.add_user(voter, role=UserRole.VOTER, nickname="V")
+    dump_snapshot = RoomCacheService._dump_snapshot
+
+    def dump_then_vote(self, *args):
+        snapshot = dump_snapshot(self, *args)
+        RoomCacheService("snap-race").set_vote(voter, 8)
+        return snapshot
+
+    monkeypatch.setattr(RoomCacheService, "_dump_snapshot", dump_then_vote)
+    assert json.loads(rcs.get_snapshot())["voted_users"] == []
+    monkeypatch.undo()
+
+    assert json.loads(rcs.get_snapshot())["voted_users"] == [voter]
+
+def test_snapshot_shows_results_of_current_round_only(fake_redis):
+    rcs = RoomCacheService("snap-results")
+    voter = str(uuid4())
+    rcs.add_user(voter, role=UserRole.VOTER, nickname="V")
+    rcs.submit_vote(voter, 5)
+    _, version, _ = rcs.claim_results(1)
+    rcs.store_results(version, 5, rcs.get_votes())
+
+    assert json.loads(rcs.get_snapshot())["results"]["average_score"] == 5
+
+    rcs.clear_votes()
+    assert json.loads(rcs.get_snapshot())["results"] is None
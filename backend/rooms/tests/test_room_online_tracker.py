@@ -0,0 +1,239 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from users.enums import UserRole
+from votings.services.active_voting_service import ActiveVotingCache
+from ws.services.user_channel_tracker import AsyncUserChannelTracker
+from ws.services.worker_drain import WorkerDrain
+
+from rooms.services.room_cache_service import RoomCacheService
+from rooms.services.room_message_service import RoomMessageService
+from rooms.services.room_online_tracker import OFFLINE_DEADLINES_KEY, AsyncRoomOnlineTracker, RoomOnlineTracker
+from rooms.services.room_timer_scheduler import RoomTimerScheduler
+
+
+@pytest.mark.asyncio
+async def test_async_offline_and_online_round_trip(fake_redis):
+    room_id = 7
+    uid = str(uuid4())
+    live_room = RoomCacheService(room_id)
+    offline_room = RoomCacheService(f"{room_id}_offline")
+    live_room.add_user(uid, role=UserRole.VOTER, nickname="V")
+    live_room.set_vote(uid, 5)
+
+    await AsyncRoomOnlineTracker.set_user_offline(uid, room_id)
+
+    assert uid not in live_room.get_room_users()
+    assert offline_room.get_votes()[uid]["vote"] == 5
+    assert RoomOnlineTracker.get_room_participants(room_id) == {uid: False}
+
+    await AsyncRoomOnlineTracker.set_user_online(uid, room_id)
+
+    assert uid in live_room.get_room_users()
+    assert live_room.get_votes()[uid]["vote"] == 5
+    assert await AsyncRoomOnlineTracker.get_room_participants(room_id) == {uid: True}
+
+def test_clean_room_offline_participants(fake_redis):
+    room_id = 8
+    uid = str(uuid4())
+    RoomCacheService(f"{room_id}_offline").add_user(uid, role=UserRole.VOTER)
+    RoomOnlineTracker._set_user_status(uid, room_id, False)
+
+    RoomOnlineTracker.clean_room_offline_participants(room_id)
+
+    assert RoomCacheService(f"{room_id}_offline").get_room_users() == {}
+    assert RoomOnlineTracker.get_room_participants(room_id) == {}
+
+def test_online_count_and_membership(fake_redis):
+    room_id = 9
+    for uid in ("a", "b", "c"):
+        RoomOnlineTracker._set_user_status(uid, room_id, True)
+    RoomOnlineTracker._set_user_status("b", room_id, False)
+
+    assert RoomOnlineTracker.count_online(room_id) == 2
+    assert RoomOnlineTracker.is_online("a", room_id)
+    assert not RoomOnlineTracker.is_online("b", room_id)
+    assert RoomOnlineTracker.get_room_participants(room_id) == {"a": True, "b": False, "c": True}
+
+def _join_live_room(room_id, uid):
+    RoomCacheService(room_id).add_user(uid, role=UserRole.VOTER, nickname="V")
+    RoomOnlineTracker._set_user_status(uid, room_id, True)
+
+async def _no_sleep(delay):
+    pass
+
+@pytest.mark.asyncio
+async def test_reconnect_within_grace_period_costs_no_transition(fake_redis, settings):
+    settings.OFFLINE_GRACE_PERIOD_SECONDS = 1
+    room_id = 10
+    uid = str(uuid4())
+    _join_live_room(room_id, uid)
+
+    with patch.object(AsyncRoomOnlineTracker, "set_user_offline") as set_offline, \
+         patch.object(AsyncRoomOnlineTracker, "set_user_online") as set_online:
+        await AsyncRoomOnlineTracker.user_disconnected(uid, room_id)
+        await AsyncRoomOnlineTracker.user_connected(uid, room_id)
+        await asyncio.sleep(0)
+
+    set_offline.assert_not_called()
+    set_online.assert_not_called()
+    assert AsyncRoomOnlineTracker._pending_offline == {}
+    assert RoomOnlineTracker.get_room_participants(room_id) == {uid: True}
+
+@pytest.mark.asyncio
+async def test_user_goes_offline_after_grace_period(fake_redis, settings, monkeypatch):
+    settings.OFFLINE_GRACE_PERIOD_SECONDS = 1
+    monkeypatch.setattr("rooms.services.room_online_tracker.asyncio.sleep", _no_sleep)
+    room_id = 11
+    uid = str(uuid4())
+    _join_live_room(room_id, uid)
+
+    await AsyncRoomOnlineTracker.user_disconnected(uid, room_id)
+    await AsyncRoomOnlineTracker._pending_offline[(room_id, uid)]
+
+    assert uid not in RoomCacheService(room_id).get_room_users()
+    assert RoomOnlineTracker.get_room_participants(room_id) == {uid: False}
+
+@pytest.mark.asyncio
+async def test_open_channel_keeps_user_online(fake_redis, settings):
+    settings.OFFLINE_GRACE_PERIOD_SECONDS = 0
+    room_id = 12
+    uid = str(uuid4())
+    _join_live_room(room_id, uid)
+    await AsyncUserChannelTracker.add_participant("second-tab", uid, room_id)
+
+    await AsyncRoomOnlineTracker.user_disconnected(uid, room_id)
+
+    assert uid in RoomCacheService(room_id).get_room_users()
+    assert RoomOnlineTracker.is_online(uid, room_id)
+
+@pytest.mark.asyncio
+async def test_returning_voter_broadcasts_voted_users(fake_redis):
+    room_id = 13
+    uid = str(uuid4())
+    offline_room = RoomCacheService(f"{room_id}_offline")
+    offline_room.add_user(uid, role=UserRole.VOTER, nickname="V")
+    offline_room.set_vote(uid, 3)
+
+    with patch.object(RoomMessageService, "asend_room_voted_users") as send_voted_users:
+        await AsyncRoomOnlineTracker.set_user_online(uid, room_id)
+        await AsyncRoomOnlineTracker.set_user_online(str(uuid4()), room_id)
+
+    send_voted_users.assert_awaited_once()
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_leaving_last_pending_voter_reveals_results(fake_redis, settings, monkeypatch, voting):
+    settings.OFFLINE_GRACE_PERIOD_SECONDS = 1
+    monkeypatch.setattr("rooms.services.room_online_tracker.asyncio.sleep", _no_sleep)
+    room_id = voting.room.id
+    _join_live_room(room_id, "voted")
+    _join_live_room(room_id, "pending")
+    RoomCacheService(room_id).submit_vote("voted", 5)
+    ActiveVotingCache.set(room_id, voting.id)
+
+    with patch.object(RoomMessageService, "anotify_voting_results") as notify_results:
+        await AsyncRoomOnlineTracker.user_disconnected("pending", room_id)
+        await AsyncRoomOnlineTracker._pending_offline[(room_id, "pending")]
+
+    await voting.arefresh_from_db()
+    assert voting.average_score == 5
+    notify_results.assert_awaited_once_with(voting.votes, 5)
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_leaving_after_reveal_does_not_finalize_again(fake_redis, settings, finished_voting):
+    settings.OFFLINE_GRACE_PERIOD_SECONDS = 0
+    room_id = finished_voting.room.id
+    _join_live_room(room_id, "voted")
+    _join_live_room(room_id, "leaving")
+    RoomCacheService(room_id).submit_vote("voted", 4)
+    ActiveVotingCache.set(room_id, finished_voting.id, finished_voting.average_score)
+
+    with patch("votings.logic.reveal_voting_results") as reveal, \
+         patch.object(RoomMessageService, "anotify_voting_results") as notify_results:
+        await AsyncRoomOnlineTracker.user_disconnected("leaving", room_id)
+
+    reveal.assert_not_called()
+    notify_results.assert_not_called()
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_drained_user_who_never_returns_goes_offline(fake_redis, settings):
+    settings.OFFLINE_GRACE_PERIOD_SECONDS = 0
+    room_id = 14
+    _join_live_room(room_id, "drained")
+    _join_live_room(room_id, "returned")
+
+    await AsyncRoomOnlineTracker.schedule_offline("drained", room_id)
+    await AsyncRoomOnlineTracker.schedule_offline("returned", room_id)
+    await AsyncUserChannelTracker.add_participant("other-worker", "returned", room_id)
+
+    settled = await asyncio.gather(*(RoomTimerScheduler().settle_offline_once() for _ in range(3)))
+
+    assert sum(settled) == 2
+    assert fake_redis.zcard(OFFLINE_DEADLINES_KEY) == 0
+    assert RoomOnlineTracker.get_room_participants(room_id) == {"drained": False, "returned": True}
+    assert set(RoomCacheService(room_id).get_room_users()) == {"returned"}
+
+@pytest.mark.asyncio
+async def test_drained_user_is_not_settled_before_deadline(fake_redis, settings):
+    settings.OFFLINE_GRACE_PERIOD_SECONDS = 60
+    room_id = 15
+    _join_live_room(room_id, "drained")
+
+    await AsyncRoomOnlineTracker.schedule_offline("drained", room_id)
+
+    assert await RoomTimerScheduler().settle_offline_once() == 0
+    assert RoomOnlineTracker.is_online("drained", room_id)
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_pending_offline_survives_worker_shutdown(fake_redis, settings, monkeypatch):
+    settings.OFFLINE_GRACE_PERIOD_SECONDS = 30
+    room_id = 16
+    _join_live_room(room_id, "pending")
+
+    await AsyncRoomOnlineTracker.user_disconnected("pending", room_id)
+    drain = WorkerDrain()
+    await drain.drain()
+    # Воркер завершается, не дождавшись окончания окна.
+    task = AsyncRoomOnlineTracker._pending_offline.pop((room_id, "pending"))
+    task.cancel()
+
+    assert RoomOnlineTracker.is_online("pending", room_id)
+    later = time.time() + 60
+    monkeypatch.setattr("rooms.services.room_timer_scheduler.time", SimpleNamespace(time=lambda: later))
+    assert await RoomTimerScheduler().settle_offline_once() == 1
+    assert RoomOnlineTracker.get_room_participants(room_id) == {"pending": False}
+
+@pytest.mark.asyncio
+async def test_grace_period_task_and_scheduler_settle_once(fake_redis, settings, monkeypatch):
+    settings.OFFLINE_GRACE_PERIOD_SECONDS = 1
+    monkeypatch.setattr("rooms.services.room_online_tracker.asyncio.sleep", _no_sleep)
+    room_id = 17
+    _join_live_room(room_id, "pending")
+
+    with patch.object(AsyncRoomOnlineTracker, "settle_offline") as settle_offline:
+        await AsyncRoomOnlineTracker.user_disconnected("pending", room_id)
+        await AsyncRoomOnlineTracker._pending_offline[(room_id, "pending")]
+        fake_redis.zadd(OFFLINE_DEADLINES_KEY, {f"{room_id}:other": 0})
+        assert await RoomTimerScheduler().settle_offline_once() == 1
+
+    assert settle_offline.await_count == 2
+    assert fake_redis.zcard(OFFLINE_DEADLINES_KEY) == 0
+
+@pytest.mark.asyncio
+async def test_reconnect_drops_stored_deadline(fake_redis, settings):
+    settings.OFFLINE_GRACE_PERIOD_SECONDS = 30
+    room_id = 18
+    _join_live_room(room_id, "back")
+
+    await AsyncRoomOnlineTracker.user_disconnected("back", room_id)
+    await AsyncRoomOnlineTracker.user_connected("back", room_id)
+
+    assert fake_redis.zcard(OFFLINE_DEADLINES_KEY) == 0
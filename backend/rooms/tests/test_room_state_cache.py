@@ -0,0 +1,149 @@
+import time
+
+import pytest
+from api.services.metrics_service import metrics
+from users.enums import UserRole
+
+from rooms.services.room_cache_service import AsyncRoomCacheService, RoomCacheService
+from rooms.services.room_state_cache import RoomStateCache, get_room_state_cache, reset_room_state_cache
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def state_cache(fake_redis, settings):
+    settings.ROOM_STATE_CACHE_MAX_ROOMS = 16
+    settings.ROOM_STATE_CACHE_MAX_AGE = 30
+    cache = get_room_state_cache()
+    assert cache._ready.wait(2)
+    yield cache
+    reset_room_state_cache()
+
+
+def test_disabled_by_default(fake_redis):
+    assert get_room_state_cache() is None
+
+
+def test_repeated_reads_are_served_from_memory(state_cache, redis_traffic):
+    service = RoomCacheService(1)
+    service.add_user("u1", UserRole.VOTER, "Bob")
+    hits = metrics.get_counter("room_state_cache_hits")
+
+    assert service.get_room_users() == {"u1": {"role": "voter", "nickname": "Bob"}}
+    redis_traffic.reset()
+    for _ in range(5):
+        assert service.get_room_users() == {"u1": {"role": "voter", "nickname": "Bob"}}
+
+    assert redis_traffic.round_trips == 0
+    assert metrics.get_counter("room_state_cache_hits") == hits + 5
+
+
+def test_cached_values_are_copies(state_cache):
+    service = RoomCacheService(1)
+    service.add_user("u1", UserRole.VOTER, "Bob")
+
+    service.get_user("u1")["nickname"] = "Mallory"
+
+    assert service.get_user("u1")["nickname"] == "Bob"
+
+
+def test_write_invalidates_local_state(state_cache):
+    service = RoomCacheService(1)
+    service.add_user("u1", UserRole.VOTER, "Bob")
+    assert service.get_votes() == {}
+
+    service.set_vote("u1", 5)
+
+    assert service.get_votes() == {"u1": {"nickname": "Bob", "vote": 5}}
+
+
+def test_write_invalidates_other_workers(state_cache):
+    other_worker = RoomStateCache(max_rooms=16, max_age=30)
+    other_worker.start()
+    try:
+        assert other_worker._ready.wait(2)
+        service = RoomCacheService(1)
+        service.add_user("u1", UserRole.VOTER, "Bob")
+        other_worker.set(service.room_key, service.votes_key, {}, other_worker.generation(service.room_key))
+
+        service.set_vote("u1", 3)
+
+        assert wait_for(lambda: not other_worker.get(service.room_key, service.votes_key)[0])
+    finally:
+        other_worker.close()
+
+
+@pytest.mark.asyncio
+async def test_async_write_invalidates_sync_reader(state_cache):
+    service = RoomCacheService(1)
+    service.add_user("u1", UserRole.VOTER, "Bob")
+    assert service.get_votes() == {}
+
+    await AsyncRoomCacheService(1).submit_vote("u1", 8)
+
+    assert service.get_votes() == {"u1": {"nickname": "Bob", "vote": 8}}
+
+
+def test_lru_eviction():
+    cache = RoomStateCache(max_rooms=2, max_age=30)
+    cache._ready.set()
+
+    for room in ("room:1", "room:2"):
+        cache.set(room, "votes", {}, cache.generation(room))
+    cache.get("room:1", "votes")
+    cache.set("room:3", "votes", {}, cache.generation("room:3"))
+
+    assert cache.get("room:1", "votes")[0]
+    assert not cache.get("room:2", "votes")[0]
+    assert cache.get("room:3", "votes")[0]
+
+
+def test_stale_read_is_not_stored_after_invalidation():
+    cache = RoomStateCache(max_rooms=2, max_age=30)
+    cache._ready.set()
+
+    generation = cache.generation("room:1")
+    cache.invalidate("room:1")
+    cache.set("room:1", "votes", {"old": {}}, generation)
+
+    assert not cache.get("room:1", "votes")[0]
+
+
+def test_invalidating_other_room_keeps_concurrent_read():
+    cache = RoomStateCache(max_rooms=2, max_age=30)
+    cache._ready.set()
+
+    generation = cache.generation("room:1")
+    cache.invalidate("room:2")
+    cache.set("room:1", "votes", {"u1": {}}, generation)
+
+    assert cache.get("room:1", "votes") == (True, {"u1": {}})
+
+
+def test_pruned_generations_still_reject_stale_reads():
+    cache = RoomStateCache(max_rooms=1, max_age=30)
+    cache._ready.set()
+
+    generation = cache.generation("room:1")
+    for room in ("room:1", "room:2", "room:3", "room:4", "room:5"):
+        cache.invalidate(room)
+    cache.set("room:1", "votes", {"old": {}}, generation)
+
+    assert not cache.get("room:1", "votes")[0]
+
+
+def test_missing_user_is_not_cached(state_cache):
+    service = RoomCacheService(1)
+    assert service.get_user("u1") is None
+
+    # Запись другого воркера, сообщение об инвалидации которой ещё не дошло.
+    RoomCacheService(1).redis.set(service._get_user_key("u1"), '{"role": "voter", "nickname": "Bob"}')
+
+    assert service.get_user("u1") == {"role": "voter", "nickname": "Bob"}
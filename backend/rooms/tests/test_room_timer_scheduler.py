@@ -0,0 +1,55 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+from users.enums import UserRole
+
+from rooms.services.room_cache_service import TIMER_DEADLINES_KEY, AsyncRoomCacheService, RoomCacheService
+from rooms.services.room_timer_scheduler import RoomTimerScheduler
+
+
+@pytest.mark.asyncio
+async def test_expired_timer_is_announced_once_across_workers(fake_redis):
+    await AsyncRoomCacheService(1).start_room_timer(time.time() + 3600)
+    await AsyncRoomCacheService(2).start_room_timer(time.time() + 3600)
+    fake_redis.zadd(TIMER_DEADLINES_KEY, {"1": time.time() - 1})
+
+    with patch("rooms.services.room_timer_scheduler.RoomMessageService", autospec=True) as mock_rms:
+        workers = [RoomTimerScheduler(batch_size=1) for _ in range(3)]
+        expired = await asyncio.gather(*(worker.run_once() for worker in workers))
+
+    assert sum(expired) == 1
+    mock_rms.assert_called_once()
+    assert mock_rms.call_args.args[0] == "1"
+    mock_rms.return_value.anotify_room_timer_expired.assert_awaited_once()
+    assert fake_redis.zrange(TIMER_DEADLINES_KEY, 0, -1) == [b"2"]
+
+@pytest.mark.asyncio
+async def test_reset_timer_is_not_announced(fake_redis):
+    rcs = AsyncRoomCacheService(3)
+    await rcs.start_room_timer(time.time() + 3600)
+    await rcs.reset_room_timer()
+
+    with patch("rooms.services.room_timer_scheduler.RoomMessageService", autospec=True) as mock_rms:
+        assert await RoomTimerScheduler().run_once() == 0
+
+    mock_rms.assert_not_called()
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_timer_expiry_reveals_results_once(fake_redis, settings, voting):
+    settings.TIMER_AUTO_REVEAL = True
+    room_id = voting.room_id
+    rcs = RoomCacheService(room_id)
+    rcs.add_user("u1", role=UserRole.VOTER, nickname="A")
+    rcs.add_user("u2", role=UserRole.VOTER, nickname="B")
+    rcs.set_vote("u1", 3)
+    fake_redis.zadd(TIMER_DEADLINES_KEY, {str(room_id): time.time() - 1})
+
+    with patch("rooms.services.room_timer_scheduler.RoomMessageService", autospec=True) as mock_rms:
+        await asyncio.gather(*(RoomTimerScheduler().run_once() for _ in range(3)))
+
+    await voting.arefresh_from_db()
+    assert voting.average_score == 3
+    mock_rms.return_value.anotify_voting_results.assert_awaited_once_with(voting.votes, 3)
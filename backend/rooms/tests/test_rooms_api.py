@@ -4,9 +4,11 @@ from unittest.mock import call, patch
 import pytest
 from django.contrib.auth.models import User
 from django.urls import reverse
+from users.enums import UserRole
 
 from rooms.models import Room
-from rooms.services.room_cache_service import RoomCacheService
+from rooms.services.room_cache_service import RoomCacheService, TimerExistsError
+from rooms.services.room_online_tracker import RoomOnlineTracker
 
 
 @pytest.mark.django_db
@@ -88,20 +90,30 @@ def test_room_detail_delete_admin(api_client, admin_user, room):
 @pytest.mark.django_db
 def test_room_participants(api_client, room):
     url = reverse("room_participants", args=[room.id])
+    RoomCacheService(room.id).add_user("user1", role=UserRole.VOTER, nickname="User1")
+    RoomCacheService(room.id).add_user("user2", role=UserRole.VOTER, nickname="User2")
+    assert api_client.get(url).json()["online"] == {}
 
-    with patch.object(RoomCacheService, "get_room_users", return_value={"user1": {"role": "voter", "nickname": "User1"}}):
-        resp = api_client.get(url)
-        assert resp.status_code == 200
-        assert "participants" in resp.json()
+    RoomOnlineTracker.set_user_online("user1", room.id)
+    RoomOnlineTracker.set_user_online("user2", room.id)
+    assert api_client.get(url).json()["online"] == {"user1": True, "user2": True}
+
+    RoomOnlineTracker.set_user_offline("user2", room.id)
+
+    resp = api_client.get(url)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["participants"] == {"user1": {"role": "voter", "nickname": "User1"}}
+    assert body["offline_participants"] == {"user2": {"role": "voter", "nickname": "User2"}}
+    assert body["online"] == {"user1": True, "user2": False}
 
 @pytest.mark.django_db
 def test_room_participants_none_returns_404(api_client, room):
     url = reverse("room_participants", args=[room.id])
 
-    with patch.object(RoomCacheService, "get_room_users", return_value=None):
-        resp = api_client.get(url)
-        assert resp.status_code == 404
-        assert "detail" in resp.json()
+    resp = api_client.get(url)
+    assert resp.status_code == 404
+    assert "detail" in resp.json()
 
 @pytest.mark.django_db
 def test_room_timer_set(jwt_token, room, api_client):
@@ -150,6 +162,23 @@ def test_room_timer_set(jwt_token, room, api_client):
 
         assert resp.status_code == 200
 
+@pytest.mark.django_db
+def test_room_timer_set_when_running_conflicts(jwt_token, room, api_client):
+    with (patch("rooms.views.UserSessionService") as mock_user_session_cls,
+         patch("rooms.views.JWTService"),
+         patch("rooms.views.RoomMessageService") as mock_rms,
+         patch("rooms.views.RoomCacheService") as mock_rcs):
+
+        mock_user_session_cls.return_value.get_user_uuid.return_value = "065e8922-5961-4584-8271-39eaeacbe677"
+        mock_rcs.return_value.get_user.return_value = {}
+        mock_rcs.return_value.start_room_timer.side_effect = TimerExistsError("Timer exists")
+
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {jwt_token}")
+        resp = api_client.post(reverse("set_room_timer", args=[room.id]), data={"minutes": 5}, format="json")
+
+    assert resp.status_code == 409
+    mock_rms.return_value.notify_room_timer_started.assert_not_called()
+
 @pytest.mark.django_db
 def test_room_timer_set_invalid_minutes(api_client, room, jwt_token):
     with (patch("rooms.views.UserSessionService") as mock_user_session_cls, \
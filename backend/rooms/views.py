@@ -2,6 +2,7 @@ from datetime import datetime, timedelta, timezone
 
 import structlog
 from api.services.jwt_service import JWTService
+from django.http import HttpResponse
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (
     OpenApiExample,
@@ -30,7 +31,8 @@ from rooms.serializers import (
     RoomNameSerializer,
 )
 from rooms.services.message_senders.django_channel import DjangoChannelMessageSender
-from rooms.services.room_cache_service import RoomCacheService
+from rooms.services.room_admission_cache import RoomAdmissionCache
+from rooms.services.room_cache_service import RoomCacheService, TimerExistsError
 from rooms.services.room_message_service import RoomMessageService
 
 logger = structlog.get_logger()
@@ -125,6 +127,11 @@ class RoomDetailView(RetrieveDestroyAPIView):
     def delete(self, request, *args, **kwargs):
         return super().delete(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        room_id = instance.id
+        super().perform_destroy(instance)
+        RoomAdmissionCache.set_active(room_id, False)
+
     @extend_schema(
         operation_id="getRoom",
         summary="Получение информации о комнате",
@@ -177,9 +184,18 @@ class RoomDetailView(RetrieveDestroyAPIView):
         200: inline_serializer(
             name="RoomParticipantsResponse",
             fields={
+                "type": serializers.CharField(),
+                "version": serializers.IntegerField(),
                 "participants": serializers.DictField(
                     child=UserInfoSerializer(),
-                )
+                ),
+                "offline_participants": serializers.DictField(
+                    child=UserInfoSerializer(),
+                ),
+                "online": serializers.DictField(child=serializers.BooleanField()),
+                "voted_users": serializers.ListField(child=serializers.CharField()),
+                "timer": serializers.FloatField(allow_null=True),
+                "results": serializers.DictField(allow_null=True),
             },
         ),
         404: OpenApiResponse(
@@ -196,6 +212,8 @@ class RoomDetailView(RetrieveDestroyAPIView):
         OpenApiExample(
             "Пример успешного ответа",
             value={
+                "type": "room_state",
+                "version": 3,
                 "participants": {
                     "5e44c567-da6a-42ec-b01f-821b97c211ce": {
                         "role": "voter",
@@ -205,7 +223,21 @@ class RoomDetailView(RetrieveDestroyAPIView):
                         "role": "observer",
                         "nickname": "User2",
                     },
-                }
+                },
+                "offline_participants": {
+                    "0b7f1a8e-3c0c-4a55-9d6e-5a8f7f1f2c11": {
+                        "role": "voter",
+                        "nickname": "User3",
+                    },
+                },
+                "online": {
+                    "5e44c567-da6a-42ec-b01f-821b97c211ce": True,
+                    "a0d35278-c4e9-468f-acc9-f032a9eb0cc5": True,
+                    "0b7f1a8e-3c0c-4a55-9d6e-5a8f7f1f2c11": False,
+                },
+                "voted_users": ["5e44c567-da6a-42ec-b01f-821b97c211ce"],
+                "timer": None,
+                "results": None,
             },
             status_codes=["200"],
         )
@@ -214,13 +246,13 @@ class RoomDetailView(RetrieveDestroyAPIView):
 )
 class RoomParticipantsView(APIView):
     def get(self, request, pk):
-        room_cache = RoomCacheService(pk)
-        participants = room_cache.get_room_users()
+        snapshot = RoomCacheService(pk).get_snapshot()
 
-        if not participants:
+        if snapshot is None:
             return Response({"detail": "Комната не найдена или нет участников"}, status=404)
 
-        return Response({"participants": participants})
+        # Снимок уже сериализован: отдаётся без повторного кодирования.
+        return HttpResponse(snapshot, content_type="application/json")
 
 @extend_schema(
     operation_id="setRoomTimer",
@@ -247,6 +279,9 @@ class RoomParticipantsView(APIView):
         401: OpenApiResponse(
             description="Ошибка аутентификации",
         ),
+        409: OpenApiResponse(
+            description="Таймер уже запущен",
+        ),
     },
     tags=ROOM_TAG,
 )
@@ -278,12 +313,15 @@ class SetRoomTimer(GenericAPIView):
         minutes = serializer.validated_data["minutes"]
         new_timestamp = float((datetime.now(timezone.utc) + timedelta(minutes=minutes)).timestamp())
 
+        try:
+            room_cache.start_room_timer(new_timestamp)
+        except TimerExistsError:
+            return Response({"detail": "Таймер уже запущен."}, status=status.HTTP_409_CONFLICT)
+
         channel_sender = DjangoChannelMessageSender()
         room_message_service = RoomMessageService(pk, channel_sender, room_cache)
 
         room_message_service.notify_room_timer_started(new_timestamp, timer_started_user)
-
-        room_cache.start_room_timer(new_timestamp)
         logger.info("Таймер запущен", room=pk, user=timer_started_user, timer_end_time=new_timestamp)
 
         return Response(status=status.HTTP_200_OK)
@@ -8,10 +8,12 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings.settings")
 django_asgi_app = get_asgi_application()
 
+from ws.lifespan import lifespan_app
 from ws.routing import ws_urlpatterns
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
+    "lifespan": lifespan_app,
     "websocket": AllowedHostsOriginValidator(AuthMiddlewareStack(URLRouter(
         ws_urlpatterns
     )))
@@ -28,3 +28,11 @@ def get_env_param_list(key, default=None):
     val = os.getenv(key)
     return [v.strip() for v in val.split(",")] if val else default or []
 
+def get_env_param_int(param_name, default=None) -> int | None:
+    param_str = os.environ.get(param_name)
+    if param_str is None:
+        return default
+    try:
+        return int(param_str)
+    except ValueError:
+        raise EnvironmentError(f"Incorrect env param: {param_name}")
@@ -16,7 +16,7 @@ from pathlib import Path
 
 import dj_database_url
 
-from settings.core import get_env_param_bool, get_env_param_str, get_env_param_list
+from settings.core import get_env_param_bool, get_env_param_str, get_env_param_list, get_env_param_int
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 PROJECT_ROOT = BASE_DIR.parent
@@ -198,6 +198,22 @@ CACHES = {
     }
 }
 
+# Размер выделенного пула потоков для блокирующих вызовов Redis из WebSocket-потребителей
+REDIS_EXECUTOR_MAX_WORKERS = get_env_param_int("REDIS_EXECUTOR_MAX_WORKERS", 16)
+
+# L1-кэш состояния комнат в памяти процесса: число комнат (0 — выключен) и максимальный возраст записи в секундах
+ROOM_STATE_CACHE_MAX_ROOMS = get_env_param_int("ROOM_STATE_CACHE_MAX_ROOMS", 0)
+ROOM_STATE_CACHE_MAX_AGE = get_env_param_int("ROOM_STATE_CACHE_MAX_AGE", 30)
+
+# Окно (мс), в течение которого схлопываются замещаемые групповые сообщения комнаты (0 — без накопления)
+BROADCAST_COALESCE_WINDOW_MS = get_env_param_int("BROADCAST_COALESCE_WINDOW_MS", 50)
+
+# Время (с), в течение которого отключившийся пользователь может переподключиться, не становясь офлайн (0 — сразу)
+OFFLINE_GRACE_PERIOD_SECONDS = get_env_param_int("OFFLINE_GRACE_PERIOD_SECONDS", 10)
+
+# Подводить итоги активного голосования, когда истекает таймер комнаты
+TIMER_AUTO_REVEAL = get_env_param_bool("TIMER_AUTO_REVEAL", False)
+
 CORS_ALLOWED_ORIGINS = get_env_param_list("CORS_ALLOWED_ORIGINS", default=["127.0.0.1:3000", "localhost:3000"])
 
 REST_FRAMEWORK = {
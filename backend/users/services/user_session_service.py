@@ -1,13 +1,28 @@
-import time
-
 from api.services.jwt_service import JWTService
-from rooms.services.room_cache_service import RoomCacheService
+from rooms.services.room_cache_service import AsyncRoomCacheService, RoomCacheService
 
 from users.enums import UserRole
 
 
+class SessionNotFoundError(Exception):
+    """
+    Данные сессии пользователя отсутствуют в кэше комнаты.
+    """
+
+
 class UserSessionService:
-    def __init__(self, jwt_service: JWTService, cache_service: RoomCacheService):
+    """
+    Сессии пользователей комнаты.
+
+    Сессия записывается в Redis до выпуска токена: create_user_session
+    возвращает токен только после того, как add_user завершил запись.
+    Поэтому любой запрос с этим токеном читает уже существующую сессию
+    (read-your-writes на одном экземпляре Redis), и ожидание её появления
+    не требуется. Отсутствие сессии означает, что пользователь удалён
+    из комнаты или её данные истекли.
+    """
+
+    def __init__(self, jwt_service: JWTService, cache_service: RoomCacheService | AsyncRoomCacheService):
         self.jwt_service = jwt_service
         self.cache_service = cache_service
 
@@ -20,21 +35,21 @@ class UserSessionService:
         user_uuid = decoded_data["user_uuid"]
         return user_uuid
 
-    def get_user_session_data(self, token: str, max_retries: int = 5, delay: float = 0.1) -> dict:
-        decoded_data = self.jwt_service.decode_token(token)
-        user_uuid = decoded_data["user_uuid"]
+    def get_user_session_data(self, token: str) -> dict:
+        user_uuid = self.get_user_uuid(token)
+        return self._build_session_data(user_uuid, self.cache_service.get_user(user_uuid))
 
-        session_data = None
-        for _attempt in range(max_retries):
-            session_data = self.cache_service.get_user(user_uuid)
-            if isinstance(session_data, dict):
-                break
-            time.sleep(delay)
+    async def aget_user_session_data(self, token: str) -> dict:
+        """
+        Асинхронный вариант get_user_session_data для AsyncRoomCacheService.
+        """
+        user_uuid = self.get_user_uuid(token)
+        return self._build_session_data(user_uuid, await self.cache_service.get_user(user_uuid))
 
+    @staticmethod
+    def _build_session_data(user_uuid: str, session_data) -> dict:
         if not isinstance(session_data, dict):
-            raise Exception(
-                f"Session data for token {token} is invalid: {session_data}"
-            )
+            raise SessionNotFoundError(f"Session data for user {user_uuid} not found")
 
         session_data["user_uuid"] = user_uuid
         return session_data
@@ -0,0 +1,34 @@
+import pytest
+from api.services.jwt_service import JWTService
+from rooms.services.room_cache_service import AsyncRoomCacheService, RoomCacheService
+
+from users.enums import UserRole
+from users.services.user_session_service import SessionNotFoundError, UserSessionService
+
+
+def test_session_readable_right_after_join():
+    service = UserSessionService(JWTService(), RoomCacheService(1))
+
+    token = service.create_user_session("u1", UserRole.VOTER, "Bob")
+
+    assert service.get_user_session_data(token) == {"user_uuid": "u1", "nickname": "Bob", "role": "voter"}
+
+
+def test_missing_session_fails_without_waiting(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda *_: pytest.fail("session lookup must not sleep"))
+    jwt_service = JWTService()
+    service = UserSessionService(jwt_service, RoomCacheService(1))
+
+    with pytest.raises(SessionNotFoundError):
+        service.get_user_session_data(jwt_service.generate_token("ghost"))
+
+
+@pytest.mark.asyncio
+async def test_async_session_lookup():
+    jwt_service = JWTService()
+    token = UserSessionService(jwt_service, RoomCacheService(1)).create_user_session("u1", UserRole.VOTER, "Bob")
+    service = UserSessionService(jwt_service, AsyncRoomCacheService(1))
+
+    assert (await service.aget_user_session_data(token))["nickname"] == "Bob"
+    with pytest.raises(SessionNotFoundError):
+        await service.aget_user_session_data(jwt_service.generate_token("ghost"))
@@ -113,5 +113,6 @@ def test_user_kick_success_calls_services(api_client, room, jwt_token):
         assert response.status_code == 200
         mock_user_session.return_value.get_user_uuid.assert_called_once_with(jwt_token)
         mock_room_msg.return_value.notify_user_kicked.assert_called_once_with("kicked-uuid", "kicker-uuid")
+        mock_room_msg.return_value.disconnect_user.assert_called_once_with("kicked-uuid")
         mock_room_cache.return_value.remove_user_vote.assert_called_once_with("kicked-uuid")
         mock_room_cache.return_value.remove_user.assert_called_once_with("kicked-uuid")
@@ -192,6 +192,7 @@ class UserKickView(GenericAPIView):
         room_message_service = RoomMessageService(room.id, channel_sender, room_cache_service)
 
         room_message_service.notify_user_kicked(kicked_uuid, kicker_uuid)
+        room_message_service.disconnect_user(kicked_uuid)
 
         room_cache_service.remove_user_vote(kicked_uuid)
         room_cache_service.remove_user(kicked_uuid)
@@ -1,7 +1,10 @@
 import structlog
+from api.services.metrics_service import metrics
 from rooms.services.room_cache_service import RoomCacheService
 from rooms.services.room_online_tracker import RoomOnlineTracker
-from users.enums import UserRole
+
+from votings.models import Voting
+from votings.services.active_voting_service import ActiveVotingCache
 
 logger = structlog.get_logger()
 
@@ -11,30 +14,85 @@ def end_voting(voting):
     voting_room.clear_room()
     RoomOnlineTracker.clean_room_offline_participants(voting.room.id)
     voting.save()
+    ActiveVotingCache.clear(voting.room_id)
 
 
 def end_voting_without_clearing_room(voting):
-    voting_room = RoomCacheService(voting.room.id)
+    """
+    Завершает голосование, оставляя участников в комнате.
+
+    Сохраняется только поле active, поэтому достаточно голосования с
+    заполненными pk и room_id.
+
+    :param voting: Голосование.
+    """
+    voting_room = RoomCacheService(voting.room_id)
     voting.active = False
     voting_room.clear_votes()
-    voting.save()
+    voting.save(update_fields=["active"])
+    ActiveVotingCache.clear(voting.room_id)
 
 
-def voting_results(voting):
-    voting_room = RoomCacheService(voting.room.id)
-    votes = voting_room.get_votes()
-    voting.average_score = (
-        -(-sum(item["vote"] for item in votes.values()) // len(votes))
-        if votes
-        else 0
-    )
-    voting.votes = votes
-    voting.save()
-    logger.info("Подведены итоги голосования", room=voting.room.id, voting=voting.id, average_score=voting.average_score, results_votes=voting.votes)
+def voting_results(voting, votes=None) -> bool:
+    """
+    Подводит итоги текущего раунда голосования.
+
+    Итоги раунда вычисляются и сохраняются один раз: вызов, получивший
+    захват в Redis, читает голоса и сохраняет голосование, а повторные
+    вызовы получают сохранённые итоги без записи в базу. Вызов, который
+    застал чужой захват, не ждёт итогов: их отправит держатель захвата.
+    Раунд меняется при каждой очистке голосов комнаты.
+
+    Отправлять участникам нужно voting.votes и voting.average_score:
+    повторный вызов получает сохранённые итоги, а не текущие голоса.
+
+    :param voting: Голосование; поля votes и average_score заполняются итогами.
+    :param votes: Уже прочитанные голоса комнаты.
+    :return: False, если итоги подводит другой вызов.
+    """
+    voting_room = RoomCacheService(voting.room_id)
+    claimed, version, results = voting_room.claim_results(voting.id)
+    if results is None and not claimed:
+        metrics.increment("voting_results_deferred_total")
+        logger.info("Итоги голосования подводит другой процесс", room=voting.room_id, version=version)
+        return False
+
+    if results is not None:
+        metrics.increment("voting_results_deduplicated_total")
+        voting.average_score = results["average_score"]
+        voting.votes = results["votes"]
+        return True
+
+    try:
+        tally = voting_room.get_vote_tally()
+        voting.average_score = -(-tally["sum"] // tally["votes"]) if tally["votes"] else 0
+        voting.votes = votes if votes is not None else voting_room.get_votes()
+        voting.save()
+    except Exception:
+        voting_room.release_results_claim()
+        raise
+
+    voting_room.store_results(version, voting.average_score, voting.votes)
+    if voting.active:
+        ActiveVotingCache.set(voting.room_id, voting.id, voting.average_score)
+    metrics.increment("voting_results_computed_total")
+    logger.info("Подведены итоги голосования", room=voting.room_id, voting=voting.id, average_score=voting.average_score, results_votes=voting.votes)
+    return True
+
+
+def reveal_voting_results(voting_room_id) -> Voting | None:
+    """
+    Подводит итоги активного голосования комнаты, если они ещё не подведены.
+
+    :param voting_room_id: ID комнаты.
+    :return: Голосование с итогами или None, если подводить нечего
+        или итоги подводит другой процесс.
+    """
+    voting = Voting.objects.filter(room=voting_room_id, active=True, average_score__isnull=True).first()
+    if voting is None or not voting_results(voting):
+        return None
+    return voting
 
 def check_voting_finish(voting_room_id) -> bool:
     voting_room = RoomCacheService(voting_room_id)
-    participants = voting_room.get_users_by_role(UserRole.VOTER)
-    votes = voting_room.get_votes()
-    msg = len(participants) == len(votes) if participants != 0 else False
-    return msg
+    return voting_room.is_voting_finished()
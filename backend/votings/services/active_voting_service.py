@@ -0,0 +1,102 @@
+import json
+from typing import TypedDict
+
+from rooms.services.redis_client import get_async_redis_client, get_redis_client
+
+from votings.models import Voting
+
+
+class ActiveVoting(TypedDict):
+    id: int
+    average_score: float | None
+
+
+class BaseActiveVotingCache:
+    """
+    Указатель на активное голосование комнаты в Redis.
+
+    Хранит ID активного голосования и его итоговую оценку, чтобы путь
+    голоса и подключения к комнате не обращались к базе данных. Отсутствие
+    активного голосования тоже кэшируется. При промахе значение читается
+    из базы и записывается только если ключ всё ещё пуст, поэтому медленное
+    чтение не затирает запись, сделанную при смене голосования.
+
+    Указатель обновляют StartVotingView, RestartVotingView, end_voting,
+    end_voting_without_clearing_room и voting_results.
+    """
+
+    _CACHE_PREFIX = "active_voting"
+    _DEFAULT_TTL = 60 * 60 * 5
+
+    @classmethod
+    def _make_key(cls, room_id: int | str) -> str:
+        return f"{cls._CACHE_PREFIX}:room_{room_id}"
+
+    @staticmethod
+    def _queryset(room_id: int | str):
+        return Voting.objects.filter(room=room_id, active=True).values("id", "average_score")
+
+    @staticmethod
+    def _dumps(voting: ActiveVoting | None) -> str:
+        return json.dumps(voting)
+
+    @staticmethod
+    def _loads(value: bytes | str) -> ActiveVoting | None:
+        return json.loads(value)
+
+
+class ActiveVotingCache(BaseActiveVotingCache):
+    @classmethod
+    def get(cls, room_id: int | str) -> ActiveVoting | None:
+        """
+        Возвращает активное голосование комнаты.
+
+        :param room_id: ID комнаты.
+        :return: ID и итоговая оценка голосования или None, если активного нет.
+        """
+        key = cls._make_key(room_id)
+        cached = get_redis_client().get(key)
+        if cached is not None:
+            return cls._loads(cached)
+
+        voting: ActiveVoting | None = cls._queryset(room_id).first()
+        get_redis_client().set(key, cls._dumps(voting), ex=cls._DEFAULT_TTL, nx=True)
+        return voting
+
+    @classmethod
+    def set(cls, room_id: int | str, voting_id: int, average_score: float | None = None) -> None:
+        """
+        Запоминает активное голосование комнаты.
+
+        :param room_id: ID комнаты.
+        :param voting_id: ID голосования.
+        :param average_score: Итоговая оценка, если итоги подведены.
+        """
+        voting: ActiveVoting = {"id": voting_id, "average_score": average_score}
+        get_redis_client().set(cls._make_key(room_id), cls._dumps(voting), ex=cls._DEFAULT_TTL)
+
+    @classmethod
+    def clear(cls, room_id: int | str) -> None:
+        """
+        Отмечает, что в комнате нет активного голосования.
+
+        :param room_id: ID комнаты.
+        """
+        get_redis_client().set(cls._make_key(room_id), cls._dumps(None), ex=cls._DEFAULT_TTL)
+
+
+class AsyncActiveVotingCache(BaseActiveVotingCache):
+    """
+    Асинхронный вариант ActiveVotingCache для WebSocket-потребителя.
+    """
+
+    @classmethod
+    async def get(cls, room_id: int | str) -> ActiveVoting | None:
+        key = cls._make_key(room_id)
+        cached = await get_async_redis_client().get(key)
+        if cached is not None:
+            return cls._loads(cached)
+
+        voting: ActiveVoting | None = await cls._queryset(room_id).afirst()
+        await get_async_redis_client().set(key, cls._dumps(voting), ex=cls._DEFAULT_TTL, nx=True)
+        return voting
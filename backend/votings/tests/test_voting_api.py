@@ -156,6 +156,7 @@ def test_voting_results_computes_and_returns_votes_and_average(api_client, votin
         voting_obj.votes = votes
         voting_obj.average_score = 8.0
         voting_obj.save()
+        return True
 
     with patch("votings.views.voting_results", side_effect=fake_voting_results) as mock_results:
         resp = api_client.put(url, data={}, format="json")
@@ -164,3 +165,15 @@ def test_voting_results_computes_and_returns_votes_and_average(api_client, votin
         assert "votes" in body
         assert body["average_score"] == 8.0
         mock_results.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_voting_results_conflict_while_another_request_finalizes(api_client, voting):
+    url = reverse("get_voting_results", kwargs={"pk": voting.id})
+
+    with patch("votings.logic.RoomCacheService.claim_results", return_value=(False, f"{voting.id}:0", None)):
+        resp = api_client.put(url, data={}, format="json")
+
+    assert resp.status_code == 409
+    voting.refresh_from_db()
+    assert voting.average_score is None
@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+import pytest
+from api.services.metrics_service import metrics
+from rooms.services.room_cache_service import RoomCacheService
+from users.enums import UserRole
+
+from votings.logic import end_voting_without_clearing_room, voting_results
+from votings.models import Voting
+from votings.services.active_voting_service import ActiveVotingCache
+
+
+def _cast_votes(room_id, votes):
+    rcs = RoomCacheService(room_id)
+    for uid, vote in votes.items():
+        if rcs.get_user(uid) is None:
+            rcs.add_user(uid, role=UserRole.VOTER, nickname=uid)
+        rcs.set_vote(uid, vote)
+    return rcs
+
+@pytest.mark.django_db
+def test_results_are_computed_once_per_round(voting):
+    rcs = _cast_votes(voting.room_id, {"u1": 3, "u2": 5})
+    metrics.reset()
+
+    with patch.object(Voting, "save", autospec=True) as mock_save:
+        voting_results(voting)
+        duplicate = Voting.objects.get(id=voting.id)
+        voting_results(duplicate)
+
+        assert mock_save.call_count == 1
+        assert duplicate.average_score == voting.average_score == 4
+        assert duplicate.votes == voting.votes
+        assert metrics.get_counter("voting_results_deduplicated_total") == 1
+
+        rcs.clear_votes()
+        _cast_votes(voting.room_id, {"u1": 8, "u2": 8})
+        voting_results(duplicate)
+
+    assert mock_save.call_count == 2
+    assert duplicate.average_score == 8
+
+@pytest.mark.django_db
+def test_results_defer_to_concurrent_finalize(voting):
+    rcs = _cast_votes(voting.room_id, {"u1": 3})
+    claimed, _, _ = rcs.claim_results(voting.id)
+    assert claimed
+
+    with patch.object(Voting, "save", autospec=True) as mock_save, \
+         patch("time.sleep", side_effect=AssertionError("must not block")):
+        assert voting_results(voting) is False
+
+    mock_save.assert_not_called()
+    assert voting.average_score is None
+
+@pytest.mark.django_db
+def test_repeated_results_keep_persisted_votes(voting):
+    rcs = _cast_votes(voting.room_id, {"u1": 3})
+    assert voting_results(voting, rcs.get_votes())
+    revealed = dict(voting.votes)
+
+    _cast_votes(voting.room_id, {"u1": 8})
+    assert voting_results(voting, rcs.get_votes())
+
+    assert voting.average_score == 3
+    assert voting.votes == revealed == {"u1": {"nickname": "u1", "vote": 3}}
+
+@pytest.mark.django_db
+def test_active_voting_pointer_follows_voting_lifecycle(voting, django_assert_num_queries):
+    room_id = voting.room_id
+
+    with django_assert_num_queries(1):
+        assert ActiveVotingCache.get(room_id) == {"id": voting.id, "average_score": None}
+    with django_assert_num_queries(0):
+        assert ActiveVotingCache.get(room_id) == {"id": voting.id, "average_score": None}
+
+    _cast_votes(room_id, {"u1": 2})
+    voting_results(voting)
+    with django_assert_num_queries(0):
+        assert ActiveVotingCache.get(room_id) == {"id": voting.id, "average_score": 2}
+
+    end_voting_without_clearing_room(voting)
+    with django_assert_num_queries(0):
+        assert ActiveVotingCache.get(room_id) is None
+
+@pytest.mark.django_db
+def test_active_voting_pointer_fill_does_not_override_write(voting):
+    with patch.object(ActiveVotingCache, "_queryset") as mock_queryset:
+        mock_queryset.return_value.first.side_effect = lambda: ActiveVotingCache.set(voting.room_id, 42)
+        ActiveVotingCache.get(voting.room_id)
+
+    assert ActiveVotingCache.get(voting.room_id) == {"id": 42, "average_score": None}
@@ -7,6 +7,7 @@ from drf_spectacular.utils import (
     OpenApiResponse,
     extend_schema,
 )
+from rest_framework import status
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.generics import (
     CreateAPIView,
@@ -29,6 +30,7 @@ from votings.serializers import (
     VotingResultsSerializer,
     VotingUpdateTaskNameSerializer,
 )
+from votings.services.active_voting_service import ActiveVotingCache
 
 logger = structlog.get_logger()
 
@@ -83,6 +85,7 @@ class StartVotingView(CreateAPIView):
         channel_sender = DjangoChannelMessageSender()
         room_message_service = RoomMessageService(instance.room.id, channel_sender)
 
+        ActiveVotingCache.set(instance.room_id, instance.id)
         logger.info("Голосование запущено", room=instance.room.id)
         room_message_service.notify_voting_started(instance.id)
 
@@ -200,6 +203,7 @@ class RestartVotingView(UpdateAPIView):
         room_cache_service = RoomCacheService(voting.room.id)
 
         voting.reset_to_default()
+        ActiveVotingCache.set(voting.room_id, voting.id)
         room_cache_service.clear_votes()
         RoomOnlineTracker().clean_room_offline_participants(voting.room.id)
 
@@ -297,7 +301,10 @@ class UpdateVotingTaskView(UpdateAPIView):
     responses={
         200: VotingResultsSerializer,
         400: OpenApiResponse(description="Невозможно подвести итоги"),
-        404: OpenApiResponse(description="Голосование с указанным ID не найдено")
+        404: OpenApiResponse(description="Голосование с указанным ID не найдено"),
+        409: OpenApiResponse(
+            description="Итоги подводит другой запрос, они придут в WebSocket-сообщении results"
+        ),
     },
     examples=[
         OpenApiExample(
@@ -331,7 +338,7 @@ class VotingResultsView(UpdateAPIView):
         serializer = self.get_serializer(voting, data=request.data, partial=kwargs.pop("partial", False))
         serializer.is_valid(raise_exception=True)
 
-        voting_results(voting)
-        voting.save()
+        if not voting_results(voting):
+            return Response({"detail": "Итоги голосования уже подводятся."}, status=status.HTTP_409_CONFLICT)
 
         return Response(serializer.data)
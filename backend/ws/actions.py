@@ -1,16 +1,13 @@
 import structlog
-from api.services.jwt_service import JWTService
 from asgiref.sync import sync_to_async
-from rooms.services.room_cache_service import RoomCacheService
+from rooms.services.room_cache_service import VoteRejectedError
 from rooms.services.room_message_service import RoomStatusType
-from users.enums import UserRole
-from users.services.user_session_service import UserSessionService
 from votings.logic import (
-    check_voting_finish,
     end_voting_without_clearing_room,
     voting_results,
 )
 from votings.models import Voting
+from votings.services.active_voting_service import AsyncActiveVotingCache
 
 from ws.base_action import BaseAction
 
@@ -19,51 +16,61 @@ from .handlers import ActionHandler
 logger = structlog.get_logger()
 
 class SubmitVoteAction(BaseAction):
+    """
+    Голос участника.
+
+    Пользователь берётся из соединения: RoomConsumer проверил токен при
+    подключении. Наличие активного голосования проверяется по указателю
+    AsyncActiveVotingCache, право голоса — Lua-скриптом submit_vote, поэтому
+    голос стоит два запроса к Redis при любом размере комнаты. Голосование
+    читается из базы только когда голос завершает раунд.
+    """
+
     def get_queryset(self):
         return Voting.objects.filter(room=self.consumer.lookup_id, active=True)
 
     async def perform_action(self):
-        token = await self.get_param("token")
         try:
             vote = int(await self.get_param("vote"))
         except (ValueError, TypeError):
             return {"error": "Invalid vote format"}
 
-        voting = await self.get_object()
-        jwt_service = JWTService()
-        room_cache = RoomCacheService(self.consumer.lookup_id)
-        user_session_service = UserSessionService(jwt_service, room_cache)
+        if await AsyncActiveVotingCache.get(self.consumer.lookup_id) is None:
+            return {"error": "Voting not found"}
 
-        user_id = user_session_service.get_user_session_data(token)["user_uuid"]
-        participants = await sync_to_async(
-            room_cache.get_users_by_role
-        )(UserRole.VOTER)
-
-        if user_id not in participants:
+        user_id = self.consumer.uuid
+        try:
+            voting_finished, votes = await self.consumer.room_cache.submit_vote(user_id, vote)
+        except VoteRejectedError:
             return {"error": "Participant not found"}
 
-        await sync_to_async(room_cache.set_vote)(user_id, vote)
-        logger.info("Пользователь проголосовал", room=self.consumer.lookup_id, voting=voting.id, user=user_id, vote=vote)
-
-        voting_finished: bool = await sync_to_async(check_voting_finish)(self.consumer.lookup_id)
+        logger.info("Пользователь проголосовал", room=self.consumer.lookup_id, user=user_id, vote=vote)
 
         if voting_finished:
-            votes = await sync_to_async(room_cache.get_votes)()
-            await sync_to_async(voting_results)(voting)
+            voting = await self.get_queryset().afirst()
+            if voting is None:
+                # Голосование завершили между проверкой указателя и голосом.
+                return {"error": "Voting not found"}
+            if not await sync_to_async(voting_results)(voting, votes):
+                # Итоги отправит вызов, который их подводит.
+                return {"type": "user_voted", "user": user_id}
             return {
                 "type": "results",
-                "votes": votes,
+                "votes": voting.votes,
                 "average_score": voting.average_score,
             }
 
         return {"type": "user_voted", "user": user_id}
 
 class ChangeVotingStatus(BaseAction):
-    def get_queryset(self):
-        return Voting.objects.filter(room=self.consumer.lookup_id, active=True)
+    """
+    Смена статуса голосования комнаты.
+
+    Для перехода к следующей задаче ID активного голосования берётся из
+    указателя AsyncActiveVotingCache: голосование не читается из базы.
+    """
 
     async def perform_action(self):
-        voting = await self.get_object()
         user_uuid = await self.get_param("user_uuid")
 
         new_status = await self.get_param("status")
@@ -71,8 +78,12 @@ class ChangeVotingStatus(BaseAction):
             return None
 
         if new_status == RoomStatusType.NEXT.value:
+            active_voting = await AsyncActiveVotingCache.get(self.consumer.lookup_id)
+            if active_voting is None:
+                return {"error": "Voting not found"}
+            voting = Voting(pk=active_voting["id"], room_id=self.consumer.lookup_id)
             await sync_to_async(end_voting_without_clearing_room)(voting)
-        logger.info("Статус голосования изменен", room=self.consumer.lookup_id, voting=voting.id, user=user_uuid)
+        logger.info("Статус голосования изменен", room=self.consumer.lookup_id, user=user_uuid, status=new_status)
         return {
             "type": "voting_change_status",
             "status": new_status
@@ -1,22 +1,23 @@
+import asyncio
 import json
+import time
 from urllib.parse import parse_qs
 
 import structlog
 from api.services.jwt_service import JWTService
-from asgiref.sync import sync_to_async
-from channels.db import database_sync_to_async
+from api.services.metrics_service import metrics
 from channels.generic.websocket import AsyncWebsocketConsumer
-from rooms.models import Room
-from rooms.services.message_senders.django_channel import DjangoChannelMessageSender
-from rooms.services.room_cache_service import RoomCacheService
+from rooms.services.frames import dumps, encode_frame, frame_text
+from rooms.services.message_senders.coalescing import get_room_broadcast_sender
+from rooms.services.room_admission_cache import AsyncRoomAdmissionCache
+from rooms.services.room_cache_service import AsyncRoomCacheService
 from rooms.services.room_message_service import RoomMessageService
-from rooms.services.room_online_tracker import RoomOnlineTracker
-from users.services.user_session_service import UserSessionService
-from votings.logic import check_voting_finish, voting_results
-from votings.models import Voting
+from rooms.services.room_online_tracker import AsyncRoomOnlineTracker
+from users.services.user_session_service import SessionNotFoundError, UserSessionService
 
 from ws.actions import action_handler
-from ws.services.user_channel_tracker import UserChannelTracker
+from ws.services.user_channel_tracker import AsyncUserChannelTracker
+from ws.services.worker_drain import SERVICE_RESTART_CLOSE_CODE, worker_drain
 
 logger = structlog.get_logger()
 
@@ -38,7 +39,7 @@ class RoomConsumer(AsyncWebsocketConsumer):
     def room_cache(self):
         if self._room_cache_service is None:
             self.lookup_id = self.scope["url_route"]["kwargs"]["id"]
-            self._room_cache_service = RoomCacheService(self.lookup_id)
+            self._room_cache_service = AsyncRoomCacheService(self.lookup_id)
         return self._room_cache_service
 
     @property
@@ -54,7 +55,7 @@ class RoomConsumer(AsyncWebsocketConsumer):
     @property
     def message_sender(self):
         if self._message_sender is None:
-            self._message_sender = DjangoChannelMessageSender()
+            self._message_sender = get_room_broadcast_sender()
         return self._message_sender
 
     @property
@@ -68,48 +69,49 @@ class RoomConsumer(AsyncWebsocketConsumer):
         return self._room_message_service
 
     async def connect(self):
-        self.lookup_id = await self._get_lookup_id()
-        self.uuid = await self._get_user_uuid()
+        if worker_drain.is_draining:
+            await self.close(code=SERVICE_RESTART_CLOSE_CODE)
+            return
+
+        started = time.perf_counter()
+        self.lookup_id, self.uuid = await asyncio.gather(self._get_lookup_id(), self._get_user_uuid())
         if not self.lookup_id or not self.uuid:
             await self.close()
             return
 
-        await self.channel_layer.group_add(self._group_name, self.channel_name)
-        await self.accept()
+        await asyncio.gather(
+            self.channel_layer.group_add(self._group_name, self.channel_name),
+            self.accept(),
+        )
+        worker_drain.register(self)
 
-        await sync_to_async(UserChannelTracker.add_participant)(self.channel_name, self.uuid, self.lookup_id)
-        await sync_to_async(RoomOnlineTracker.set_user_online)(self.uuid, self.lookup_id)
+        await asyncio.gather(
+            AsyncUserChannelTracker.add_participant(self.channel_name, self.uuid, self.lookup_id),
+            AsyncRoomOnlineTracker.user_connected(self.uuid, self.lookup_id),
+        )
         logger.info("Пользователь подключился", room=self.lookup_id, user=self.uuid)
 
-        await sync_to_async(self.room_message_service.send_room_voted_users)()
-        voting = await self.get_voting()
-        if voting is not None and voting.average_score is not None:
-            voting = await self.get_voting()
-            votes = await sync_to_async(self.room_cache.get_votes)()
-
-            await self.send(
-                json.dumps(
-                    {
-                        "type": "results",
-                        "votes": votes,
-                        "average_score": voting.average_score,
-                    }
-                )
-            )
+        # Снимок читается после user_connected: вернувшийся пользователь и его голос уже в комнате.
+        snapshot = await self.room_cache.get_snapshot()
+        if snapshot is not None:
+            await self.send(text_data=snapshot)
+        metrics.observe("ws_connect_seconds", time.perf_counter() - started)
 
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self._group_name, self.channel_name)
+        worker_drain.unregister(self)
         if self.lookup_id or self.uuid:
-            await sync_to_async(RoomOnlineTracker.set_user_offline)(self.uuid, self.lookup_id)
-            await sync_to_async(UserChannelTracker.remove_participant)(self.channel_name)
+            await AsyncUserChannelTracker.remove_participant(self.channel_name)
+            if worker_drain.is_draining:
+                # Клиент переподключится к другому воркеру, а если не вернётся —
+                # в офлайн его переведёт планировщик другого воркера.
+                await AsyncRoomOnlineTracker.schedule_offline(self.uuid, self.lookup_id)
+                return
+
+            # Итоги раунда, который завершился с уходом пользователя, подводит трекер.
+            await AsyncRoomOnlineTracker.user_disconnected(self.uuid, self.lookup_id)
             logger.info("Пользователь отключился", room=self.lookup_id, user=self.uuid)
 
-            if await sync_to_async(check_voting_finish)(self.lookup_id) and (await self.get_voting()) is not None:
-                voting = await self.get_voting()
-                votes = await sync_to_async(self.room_cache.get_votes)()
-                await sync_to_async(voting_results)(voting)
-                await sync_to_async(self.room_message_service.notify_voting_results)(votes, voting.average_score)
-
     async def receive(self, text_data):
         try:
             text_data_json = json.loads(text_data)
@@ -117,7 +119,13 @@ class RoomConsumer(AsyncWebsocketConsumer):
             action_name = text_data_json.get("action")
             try:
                 response = await action_handler.execute(action_name, self, text_data_json)
-                await self._send_group_message(response)
+                if response is None:
+                    # Действие ничего не отправляет (например, неизвестный статус голосования).
+                    return
+                if "error" in response:
+                    await self.send(dumps(response))
+                else:
+                    await self._send_group_message(response)
             except ValueError:
                 logger.info(
                     "Пользователь отправил сообщение",
@@ -134,14 +142,10 @@ class RoomConsumer(AsyncWebsocketConsumer):
     def _group_name(self):
         return f"{self.group_prefix}_{self.lookup_id}"
 
-    @database_sync_to_async
-    def get_voting(self):
-        return Voting.objects.filter(room=self.lookup_id, active=True).first()
-
     async def _get_lookup_id(self):
-        scope_id = self.scope["url_route"]["kwargs"].get("id")
-        if await Room.objects.filter(id=scope_id, active=True).aexists():
-            return int(scope_id)
+        scope_id = int(self.scope["url_route"]["kwargs"]["id"])
+        if await AsyncRoomAdmissionCache.is_active(scope_id):
+            return scope_id
         return None
 
     async def _get_user_uuid(self):
@@ -152,7 +156,10 @@ class RoomConsumer(AsyncWebsocketConsumer):
         if token is None:
             return None
 
-        user_data = await sync_to_async(self.user_session.get_user_session_data)(token)
+        try:
+            user_data = await self.user_session.aget_user_session_data(token)
+        except SessionNotFoundError:
+            return None
         uuid_value = user_data["user_uuid"]
         if not uuid_value:
             return None
@@ -162,47 +169,49 @@ class RoomConsumer(AsyncWebsocketConsumer):
     async def _send_group_message(self, message):
         await self.channel_layer.group_send(
             self._group_name,
-            message
+            encode_frame(message)
         )
 
 
     async def user_joined(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
 
     async def user_kicked(self, event: dict[str, dict]):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
 
-        uuid_str = next(iter(event["kicked"]))
-        if uuid_str == self.uuid:
-            await self.close()
+    async def force_disconnect(self, event):
+        await self.close()
 
     async def timer_started(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
 
     async def timer_reset(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
+
+    async def timer_expired(self, event):
+        await self.send(text_data=frame_text(event))
 
     async def user_voted(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
 
     async def results(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
 
     async def task_name_changed(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
 
     async def voting_started(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
 
     async def voted_users_update(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
 
     async def voting_change_status(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
 
     async def user_online(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
 
     async def user_offline(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send(text_data=frame_text(event))
 
@@ -0,0 +1,25 @@
+from rooms.services.room_timer_scheduler import get_room_timer_scheduler
+
+from ws.services.worker_drain import worker_drain
+
+
+async def lifespan_app(scope, receive, send):
+    """
+    Обработчик протокола ASGI lifespan.
+
+    При старте устанавливает обработчики сигналов режима остановки и
+    запускает планировщик таймеров комнат и отложенных переходов в
+    офлайн, при завершении включает режим остановки, закрывает соединения
+    и останавливает планировщик.
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            worker_drain.install_signal_handlers()
+            get_room_timer_scheduler().start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await worker_drain.drain()
+            await get_room_timer_scheduler().stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
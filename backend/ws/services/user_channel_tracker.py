@@ -1,15 +1,32 @@
 from enum import Enum
 from typing import Dict, Set
 
-from django.core.cache import cache
+from rooms.services.redis_client import get_async_redis_client, get_redis_client
 
 
 class KeyType(Enum):
-    CHANNEL = "channel"
-    ROOM_PARTICIPANTS = "room_participants"
+    CHANNEL = "channel_info"
+    ROOM_PARTICIPANTS = "room_channels"
+    USER_CHANNELS = "user_channels"
 
 
-class UserChannelTracker:
+class BaseUserChannelTracker:
+    """
+    Учёт WebSocket-каналов комнат.
+
+    Хранит три индекса в нативных структурах Redis:
+
+    * ``ws_sessions:channel_info:{канал}`` — хэш с UUID пользователя и ID комнаты;
+    * ``ws_sessions:room_channels:{комната}`` — множество каналов комнаты;
+    * ``ws_sessions:user_channels:{комната}:{пользователь}`` — множество каналов
+      пользователя; позволяет доставить событие конкретному пользователю,
+      не рассылая его всей комнате.
+
+    Подключение и отключение меняют по одному элементу множеств, поэтому
+    конкурентные подключения не теряют друг друга, а стоимость операции
+    не зависит от размера комнаты.
+    """
+
     _CACHE_PREFIX = "ws_sessions"
     _DEFAULT_TTL = 60 * 60 * 2
 
@@ -18,53 +35,185 @@ class UserChannelTracker:
         return f"{cls._CACHE_PREFIX}:{key_type.value}:{identifier}"
 
     @classmethod
-    def add_participant(cls, channel_name: str, user_uuid: str, room_id: int) -> None:
+    def _make_user_key(cls, room_id: int | str, user_uuid: str) -> str:
+        return cls._make_key(KeyType.USER_CHANNELS, f"{room_id}:{user_uuid}")
+
+    @staticmethod
+    def _decode(value: bytes | str) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+    @classmethod
+    def _decode_channels(cls, channels) -> Set[str]:
+        return {cls._decode(channel) for channel in channels}
+
+    @classmethod
+    def _parse_participant_info(cls, raw: Dict[bytes, bytes]) -> Dict[str, str | int] | None:
+        if not raw:
+            return None
+        info = {cls._decode(field): cls._decode(value) for field, value in raw.items()}
+        info["room_id"] = int(info["room_id"])
+        return info
+
+    @classmethod
+    def _queue_add(cls, pipe, channel_name: str, user_uuid: str, room_id: int) -> None:
         chan_key = cls._make_key(KeyType.CHANNEL, channel_name)
         part_key = cls._make_key(KeyType.ROOM_PARTICIPANTS, str(room_id))
+        user_key = cls._make_user_key(room_id, user_uuid)
 
-        participants: Set[str] = cache.get(part_key, set())
+        pipe.hset(chan_key, mapping={"user_uuid": user_uuid, "room_id": room_id})
+        pipe.sadd(part_key, channel_name)
+        pipe.sadd(user_key, channel_name)
+        for key in (chan_key, part_key, user_key):
+            pipe.expire(key, cls._DEFAULT_TTL)
 
-        if channel_name not in participants:
-            participants.add(channel_name)
-            cache.set(part_key, participants, cls._DEFAULT_TTL)
+    @classmethod
+    def _queue_remove(cls, pipe, channel_name: str, info: Dict[str, str | int]) -> None:
+        pipe.srem(cls._make_key(KeyType.ROOM_PARTICIPANTS, str(info["room_id"])), channel_name)
+        pipe.srem(cls._make_user_key(info["room_id"], info["user_uuid"]), channel_name)
+        pipe.delete(cls._make_key(KeyType.CHANNEL, channel_name))
+
+    @classmethod
+    def _queue_refresh(cls, pipe, channel_name: str, info: Dict[str, str | int]) -> None:
+        pipe.expire(cls._make_key(KeyType.CHANNEL, channel_name), cls._DEFAULT_TTL)
+        pipe.expire(cls._make_key(KeyType.ROOM_PARTICIPANTS, str(info["room_id"])), cls._DEFAULT_TTL)
+        pipe.expire(cls._make_user_key(info["room_id"], info["user_uuid"]), cls._DEFAULT_TTL)
 
-        cache.set(chan_key, {"user_uuid": user_uuid, "room_id": room_id}, cls._DEFAULT_TTL)
+
+class UserChannelTracker(BaseUserChannelTracker):
+    @classmethod
+    def add_participant(cls, channel_name: str, user_uuid: str, room_id: int) -> None:
+        pipe = get_redis_client().pipeline()
+        cls._queue_add(pipe, channel_name, user_uuid, room_id)
+        pipe.execute()
 
     @classmethod
     def remove_participant(cls, channel_name: str) -> None:
-        chan_key = cls._make_key(KeyType.CHANNEL, channel_name)
-        data = cache.get(chan_key)
-        if not data:
+        info = cls.get_participant_info(channel_name)
+        if not info:
             return
 
-        room_id = data["room_id"]
-        part_key = cls._make_key(KeyType.ROOM_PARTICIPANTS, str(room_id))
-
-        participants: Set[str] = cache.get(part_key, set())
-        participants.discard(channel_name)
-        if participants:
-            cache.set(part_key, participants, cls._DEFAULT_TTL)
-        else:
-            cache.delete(part_key)
-
-        cache.delete(chan_key)
+        pipe = get_redis_client().pipeline()
+        cls._queue_remove(pipe, channel_name, info)
+        pipe.execute()
 
     @classmethod
-    def get_participant_info(cls, channel_name: str) -> Dict[str, str] | None:
+    def get_participant_info(cls, channel_name: str) -> Dict[str, str | int] | None:
         chan_key = cls._make_key(KeyType.CHANNEL, channel_name)
-        return cache.get(chan_key)
+        return cls._parse_participant_info(get_redis_client().hgetall(chan_key))
 
     @classmethod
     def get_room_participants(cls, room_id: int) -> Set[str]:
         part_key = cls._make_key(KeyType.ROOM_PARTICIPANTS, str(room_id))
-        return set(cache.get(part_key, set()))
+        return cls._decode_channels(get_redis_client().smembers(part_key))
+
+    @classmethod
+    def count_room_participants(cls, room_id: int) -> int:
+        """
+        Возвращает число открытых каналов комнаты без чтения самих каналов.
+
+        :param room_id: ID комнаты.
+        """
+        return get_redis_client().scard(cls._make_key(KeyType.ROOM_PARTICIPANTS, str(room_id)))
+
+    @classmethod
+    def get_user_channels(cls, room_id: int, user_uuid: str) -> Set[str]:
+        """
+        Возвращает каналы пользователя в комнате.
+
+        :param room_id: ID комнаты.
+        :param user_uuid: UUID пользователя.
+        :return: Множество имён каналов.
+        """
+        return cls._decode_channels(get_redis_client().smembers(cls._make_user_key(room_id, user_uuid)))
+
+    @classmethod
+    def is_user_connected(cls, room_id: int, user_uuid: str) -> bool:
+        """
+        Проверяет, есть ли у пользователя открытые каналы в комнате.
+
+        :param room_id: ID комнаты.
+        :param user_uuid: UUID пользователя.
+        """
+        return get_redis_client().scard(cls._make_user_key(room_id, user_uuid)) > 0
 
     @classmethod
     def refresh_ttl(cls, channel_name: str) -> None:
         info = cls.get_participant_info(channel_name)
         if not info:
             return
+        pipe = get_redis_client().pipeline()
+        cls._queue_refresh(pipe, channel_name, info)
+        pipe.execute()
+
+
+class AsyncUserChannelTracker(BaseUserChannelTracker):
+    """
+    Асинхронный вариант UserChannelTracker для WebSocket-потребителя.
+
+    Хранит данные в тех же ключах, что и синхронный трекер.
+    """
+
+    @classmethod
+    async def add_participant(cls, channel_name: str, user_uuid: str, room_id: int) -> None:
+        pipe = get_async_redis_client().pipeline()
+        cls._queue_add(pipe, channel_name, user_uuid, room_id)
+        await pipe.execute()
+
+    @classmethod
+    async def remove_participant(cls, channel_name: str) -> None:
+        info = await cls.get_participant_info(channel_name)
+        if not info:
+            return
+
+        pipe = get_async_redis_client().pipeline()
+        cls._queue_remove(pipe, channel_name, info)
+        await pipe.execute()
+
+    @classmethod
+    async def get_participant_info(cls, channel_name: str) -> Dict[str, str | int] | None:
         chan_key = cls._make_key(KeyType.CHANNEL, channel_name)
-        part_key = cls._make_key(KeyType.ROOM_PARTICIPANTS, str(info["room_id"]))
-        cache.touch(chan_key, cls._DEFAULT_TTL)
-        cache.touch(part_key, cls._DEFAULT_TTL)
+        return cls._parse_participant_info(await get_async_redis_client().hgetall(chan_key))
+
+    @classmethod
+    async def get_room_participants(cls, room_id: int) -> Set[str]:
+        part_key = cls._make_key(KeyType.ROOM_PARTICIPANTS, str(room_id))
+        return cls._decode_channels(await get_async_redis_client().smembers(part_key))
+
+    @classmethod
+    async def count_room_participants(cls, room_id: int) -> int:
+        """
+        Возвращает число открытых каналов комнаты без чтения самих каналов.
+
+        :param room_id: ID комнаты.
+        """
+        return await get_async_redis_client().scard(cls._make_key(KeyType.ROOM_PARTICIPANTS, str(room_id)))
+
+    @classmethod
+    async def get_user_channels(cls, room_id: int, user_uuid: str) -> Set[str]:
+        """
+        Возвращает каналы пользователя в комнате.
+
+        :param room_id: ID комнаты.
+        :param user_uuid: UUID пользователя.
+        :return: Множество имён каналов.
+        """
+        return cls._decode_channels(await get_async_redis_client().smembers(cls._make_user_key(room_id, user_uuid)))
+
+    @classmethod
+    async def is_user_connected(cls, room_id: int, user_uuid: str) -> bool:
+        """
+        Проверяет, есть ли у пользователя открытые каналы в комнате.
+
+        :param room_id: ID комнаты.
+        :param user_uuid: UUID пользователя.
+        """
+        return await get_async_redis_client().scard(cls._make_user_key(room_id, user_uuid)) > 0
+
+    @classmethod
+    async def refresh_ttl(cls, channel_name: str) -> None:
+        info = await cls.get_participant_info(channel_name)
+        if not info:
+            return
+        pipe = get_async_redis_client().pipeline()
+        cls._queue_refresh(pipe, channel_name, info)
+        await pipe.execute()
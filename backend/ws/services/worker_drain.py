@@ -0,0 +1,110 @@
+import asyncio
+import signal
+import threading
+import weakref
+from typing import Iterable
+
+import structlog
+from api.services.metrics_service import metrics
+
+logger = structlog.get_logger(__name__)
+
+# Стандартный код закрытия WebSocket «Service Restart»: клиент должен
+# переподключиться в ближайшее время.
+SERVICE_RESTART_CLOSE_CODE = 1012
+
+
+class WorkerDrain:
+    """
+    Режим остановки воркера.
+
+    В режиме остановки воркер закрывает открытые WebSocket-соединения
+    кодом SERVICE_RESTART_CLOSE_CODE и не принимает новые. Потребители
+    при этом не переводят пользователей в офлайн и не подводят итоги
+    голосования: клиенты переподключаются к другому воркеру, и для
+    остальных участников комнаты ничего не меняется. Для не вернувшихся
+    пользователей в Redis остаётся срок перехода в офлайн, который
+    выполнит планировщик другого воркера.
+
+    Режим включается сигналом (SIGTERM, SIGINT) или событием
+    lifespan.shutdown.
+    """
+
+    def __init__(self):
+        self._draining = False
+        self._consumers = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    @property
+    def is_draining(self) -> bool:
+        return self._draining
+
+    def register(self, consumer) -> None:
+        """
+        Запоминает открытое соединение, чтобы закрыть его при остановке.
+
+        :param consumer: WebSocket-потребитель.
+        """
+        self._consumers.add(consumer)
+
+    def unregister(self, consumer) -> None:
+        self._consumers.discard(consumer)
+
+    def _begin(self) -> bool:
+        with self._lock:
+            if self._draining:
+                return False
+            self._draining = True
+            return True
+
+    async def drain(self) -> None:
+        """
+        Включает режим остановки и закрывает открытые соединения.
+        """
+        if self._begin():
+            logger.info("Воркер переходит в режим остановки", connections=len(self._consumers))
+
+        consumers = list(self._consumers)
+        metrics.increment("ws_drain_closed_total", len(consumers))
+        await asyncio.gather(
+            *(consumer.close(code=SERVICE_RESTART_CLOSE_CODE) for consumer in consumers),
+            return_exceptions=True,
+        )
+
+    def install_signal_handlers(self, signals: Iterable[signal.Signals] = (signal.SIGTERM, signal.SIGINT)) -> None:
+        """
+        Включает режим остановки по сигналу.
+
+        Вызывается из event loop после того, как сервер установил свои
+        обработчики, и оборачивает их: флаг выставляется сразу в
+        обработчике сигнала, затем вызывается обработчик сервера. Поэтому
+        соединения, которые сервер закроет сам, тоже отключаются в режиме
+        остановки.
+
+        :param signals: Сигналы, по которым включается режим.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            logger.warning("Обработчики сигналов остановки не установлены: не главный поток")
+            return
+
+        loop = asyncio.get_running_loop()
+        for sig in signals:
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                # Сервер не управляет этим сигналом — не подменяем поведение по умолчанию.
+                continue
+
+            def handler(signum, frame, previous=previous):
+                self._begin()
+                loop.call_soon_threadsafe(lambda: loop.create_task(self.drain()))
+                previous(signum, frame)
+
+            signal.signal(sig, handler)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._draining = False
+        self._consumers = weakref.WeakSet()
+
+
+worker_drain = WorkerDrain()
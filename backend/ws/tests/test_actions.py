@@ -1,6 +1,12 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, create_autospec, patch
 
 import pytest
+from asgiref.sync import async_to_sync
+from redis.asyncio import Redis as AsyncRedis
+from rooms.services.room_cache_service import AsyncRoomCacheService, RoomCacheService, VoteRejectedError
+from users.enums import UserRole
+from votings.models import Voting
+from votings.services.active_voting_service import ActiveVotingCache
 
 from ws.actions import ChangeVotingStatus, SubmitVoteAction
 
@@ -13,100 +19,154 @@ async def test_submit_vote_invalid_format():
     res = await SubmitVoteAction.execute(consumer, {"token": "t", "vote": "not-int"})
     assert res == {"error": "Invalid vote format"}
 
+def _consumer(room_id, user_uuid):
+    consumer = MagicMock()
+    consumer.lookup_id = room_id
+    consumer.uuid = user_uuid
+    consumer.room_cache = create_autospec(AsyncRoomCacheService, instance=True)
+    return consumer
+
 @pytest.mark.asyncio
-@pytest.mark.django_db
+@pytest.mark.django_db(transaction=True)
 async def test_submit_vote_participant_not_found(voting):
-    consumer = MagicMock()
-    consumer.lookup_id = voting.room.id
-    token = "tkn"
-    with patch("ws.actions.RoomCacheService") as mock_room_cache_cls, \
-         patch("ws.actions.UserSessionService") as mock_user_session_cls, \
-         patch("ws.actions.JWTService") as mock_jwt_cls:
+    consumer = _consumer(voting.room.id, "u1")
+    consumer.room_cache.submit_vote.side_effect = VoteRejectedError("User not found")
 
-        mock_cache = mock_room_cache_cls.return_value
-        mock_cache.get_users_by_role.return_value = ["other-user"]
+    res = await SubmitVoteAction.execute(consumer, {"token": "tkn", "vote": "5"})
+    assert res == {"error": "Participant not found"}
 
-        mock_user_session = mock_user_session_cls.return_value
-        mock_user_session.get_user_session_data.return_value = {"user_uuid": "u1"}
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_submit_vote_success_not_finish(voting):
+    consumer = _consumer(voting.room.id, "uA")
+    consumer.room_cache.submit_vote.return_value = (False, {})
+
+    with patch.object(SubmitVoteAction, "get_queryset") as mock_get_queryset:
+        res = await SubmitVoteAction.execute(consumer, {"token": "tkn", "vote": "3"})
 
-        with patch.object(SubmitVoteAction, "get_object", return_value=voting):
-            res = await SubmitVoteAction.execute(consumer, {"token": token, "vote": "5"})
-            assert res == {"error": "Participant not found"}
+    assert res == {"type": "user_voted", "user": "uA"}
+    consumer.room_cache.submit_vote.assert_called_once_with("uA", 3)
+    mock_get_queryset.assert_not_called()
 
 @pytest.mark.asyncio
-@pytest.mark.django_db
-async def test_submit_vote_success_not_finish(voting):
-    consumer = MagicMock()
-    consumer.lookup_id = voting.room.id
-    token = "tkn"
-    with patch("ws.actions.RoomCacheService") as mock_room_cache_cls, \
-         patch("ws.actions.UserSessionService") as mock_user_session_cls, \
-         patch("ws.actions.JWTService") as mock_jwt_cls, \
-         patch("ws.actions.check_voting_finish") as mock_check_finish:
+@pytest.mark.django_db(transaction=True)
+async def test_submit_vote_without_active_voting_is_rejected(room):
+    consumer = _consumer(room.id, "uA")
 
-        mock_cache = mock_room_cache_cls.return_value
-        mock_cache.get_users_by_role.return_value = ["uA", "uB"]
-        mock_cache.set_vote.return_value = None
+    res = await SubmitVoteAction.execute(consumer, {"vote": "3"})
 
-        mock_user_session = mock_user_session_cls.return_value
-        mock_user_session.get_user_session_data.return_value = {"user_uuid": "uA"}
+    assert res == {"error": "Voting not found"}
+    consumer.room_cache.submit_vote.assert_not_called()
 
-        mock_check_finish.return_value = False
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_finishing_vote_after_voting_ended_does_not_raise(voting):
+    consumer = _consumer(voting.room.id, "uA")
+    consumer.room_cache.submit_vote.return_value = (True, {"uA": {"nickname": "A", "vote": 5}})
+    ActiveVotingCache.set(voting.room.id, voting.id)
+    await Voting.objects.filter(id=voting.id).aupdate(active=False)
 
-        with patch.object(SubmitVoteAction, "get_object", return_value=voting):
-            res = await SubmitVoteAction.execute(consumer, {"token": token, "vote": "3"})
-            assert res == {"type": "user_voted", "user": "uA"}
+    with patch("ws.actions.voting_results") as mock_voting_results:
+        res = await SubmitVoteAction.execute(consumer, {"vote": "5"})
+
+    assert res == {"error": "Voting not found"}
+    mock_voting_results.assert_not_called()
 
 @pytest.mark.asyncio
-@pytest.mark.django_db
+@pytest.mark.django_db(transaction=True)
 async def test_submit_vote_finishes_voting_and_returns_results(voting):
-    consumer = MagicMock()
-    consumer.lookup_id = voting.room.id
-    token = "tkn"
-    with patch("ws.actions.RoomCacheService") as mock_room_cache_cls, \
-         patch("ws.actions.UserSessionService") as mock_user_session_cls, \
-         patch("ws.actions.JWTService") as mock_jwt_cls, \
-         patch("ws.actions.check_voting_finish") as mock_check_finish, \
-         patch("ws.actions.voting_results") as mock_voting_results:
+    consumer = _consumer(voting.room.id, "uA")
+    votes = {"uA": {"nickname": "A", "vote": 5}}
+    consumer.room_cache.submit_vote.return_value = (True, votes)
 
-        mock_cache = mock_room_cache_cls.return_value
-        mock_cache.get_users_by_role.return_value = ["uA"]
-        mock_cache.get_votes.return_value = {"uA": 5}
+    def finalize(finished_voting, room_votes):
+        finished_voting.votes, finished_voting.average_score = room_votes, 5
+        return True
 
-        mock_user_session = mock_user_session_cls.return_value
-        mock_user_session.get_user_session_data.return_value = {"user_uuid": "uA"}
+    with patch("ws.actions.voting_results", side_effect=finalize) as mock_voting_results:
+        res = await SubmitVoteAction.execute(consumer, {"token": "tkn", "vote": "5"})
+        assert res == {"type": "results", "votes": votes, "average_score": 5}
+        mock_voting_results.assert_called_once_with(voting, votes)
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_finishing_vote_defers_to_concurrent_finalize(voting):
+    consumer = _consumer(voting.room.id, "uA")
+    consumer.room_cache.submit_vote.return_value = (True, {"uA": {"nickname": "A", "vote": 5}})
 
-        mock_check_finish.return_value = True
+    with patch("ws.actions.voting_results", return_value=False):
+        res = await SubmitVoteAction.execute(consumer, {"vote": "5"})
 
-        with patch.object(SubmitVoteAction, "get_object", return_value=voting):
-            res = await SubmitVoteAction.execute(consumer, {"token": token, "vote": "5"})
-            assert res["type"] == "results"
-            assert res["average_score"] == voting.average_score
-            assert "votes" in res
+    assert res == {"type": "user_voted", "user": "uA"}
+
+async def _vote_cost(monkeypatch, room_size):
+    room_id = f"vote-bench-{room_size}"
+    room_cache = RoomCacheService(room_id)
+    for i in range(room_size):
+        room_cache.add_user(f"{room_id}-u{i}", role=UserRole.VOTER, nickname=f"n{i}")
+
+    ActiveVotingCache.set(room_id, 1)
+
+    consumer = _consumer(room_id, f"{room_id}-u0")
+    consumer.room_cache = AsyncRoomCacheService(room_id)
+    # Первый вызов загружает скрипт в Redis (SCRIPT LOAD).
+    await consumer.room_cache.submit_vote(f"{room_id}-u1", 5)
+
+    commands = []
+    original_execute = AsyncRedis.execute_command
+
+    async def counting_execute(self, *args, **options):
+        commands.append(args[0])
+        return await original_execute(self, *args, **options)
+
+    with monkeypatch.context() as m:
+        m.setattr(AsyncRedis, "execute_command", counting_execute)
+        res = await SubmitVoteAction.execute(consumer, {"vote": "3"})
+
+    assert res == {"type": "user_voted", "user": f"{room_id}-u0"}
+    return len(commands)
+
+@pytest.mark.asyncio
+async def test_vote_cost_is_flat_as_room_grows(monkeypatch):
+    with patch.object(SubmitVoteAction, "get_queryset") as mock_get_queryset:
+        small_room = await _vote_cost(monkeypatch, 5)
+        large_room = await _vote_cost(monkeypatch, 200)
+
+    # Указатель активного голосования и скрипт голоса.
+    assert small_room == large_room == 2
+    mock_get_queryset.assert_not_called()
 
 @pytest.mark.asyncio
 @pytest.mark.django_db
 async def test_change_voting_status_invalid_status_returns_none(voting):
     consumer = MagicMock()
     consumer.lookup_id = voting.room.id
-    with patch.object(ChangeVotingStatus, "get_object", return_value=voting):
-        res = await ChangeVotingStatus.execute(consumer, {"status": "invalid_status"})
-        assert res is None
+    res = await ChangeVotingStatus.execute(consumer, {"status": "invalid_status"})
+    assert res is None
 
-@pytest.mark.asyncio
 @pytest.mark.django_db
-async def test_change_voting_status_next_calls_end_voting_without_clearing_room():
+def test_change_voting_status_next_ends_voting_by_pointer(voting, django_assert_num_queries):
     consumer = MagicMock()
-    consumer.lookup_id = 1
-    with patch("ws.actions.end_voting_without_clearing_room") as mock_end, \
-         patch("ws.actions.Voting") as mock_voting_model:
+    consumer.lookup_id = voting.room_id
+    ActiveVotingCache.set(voting.room_id, voting.id)
 
-        class M:
-            pass
-        mock_voting_qs = MagicMock()
-        mock_voting_qs.first.return_value = M()
-        mock_voting_model.objects.filter.return_value = mock_voting_qs
+    with django_assert_num_queries(1) as captured:
+        res = async_to_sync(ChangeVotingStatus.execute)(consumer, {"status": "next"})
 
+    assert res == {"type": "voting_change_status", "status": "next"}
+    assert captured.captured_queries[0]["sql"].startswith("UPDATE")
+    voting.refresh_from_db()
+    assert not voting.active
+    assert voting.task_name == "Initial Task"
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_change_voting_status_next_without_active_voting(room):
+    consumer = MagicMock()
+    consumer.lookup_id = room.id
+
+    with patch("ws.actions.end_voting_without_clearing_room") as mock_end:
         res = await ChangeVotingStatus.execute(consumer, {"status": "next"})
-        mock_end.assert_called_once()
-        assert res == {"type": "voting_change_status", "status": "next"}
+
+    assert res == {"error": "Voting not found"}
+    mock_end.assert_not_called()
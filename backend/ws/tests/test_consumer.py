@@ -2,40 +2,66 @@ import json
 from unittest.mock import patch
 
 import pytest
+from api.services.metrics_service import metrics
 from channels.layers import get_channel_layer
 from channels.testing import WebsocketCommunicator
+from rooms.services import frames
+from rooms.services.message_senders.django_channel import DjangoChannelMessageSender
+from rooms.services.room_cache_service import AsyncRoomCacheService, RoomCacheService
+from users.enums import UserRole
 
 from ws.consumers import RoomConsumer
+from ws.services.worker_drain import SERVICE_RESTART_CLOSE_CODE, worker_drain
 
 
 @pytest.mark.asyncio
 @pytest.mark.django_db(transaction=True)
-async def test_connect_accepts_and_sends_results_if_voting_with_avg(room_url_router, finished_voting):
+async def test_connect_sends_room_state_with_results_in_one_frame(room_url_router, finished_voting):
     room_id = finished_voting.room.id
-    token = "dummy-token"
+    room_cache = RoomCacheService(room_id)
+    room_cache.add_user("user-uuid-1", role=UserRole.VOTER, nickname="V")
+    room_cache.submit_vote("user-uuid-1", 5)
+    _, version, _ = room_cache.claim_results(finished_voting.id)
+    room_cache.store_results(version, finished_voting.average_score, room_cache.get_votes())
 
     with patch.object(RoomConsumer, "_get_lookup_id", return_value=room_id), \
-         patch.object(RoomConsumer, "_get_user_uuid", return_value=token), \
-         patch("ws.consumers.RoomMessageService") as mock_room_message_service_cls, \
-         patch("ws.consumers.UserChannelTracker") as mock_user_channel_tracker_cls, \
-         patch("ws.consumers.RoomOnlineTracker") as mock_room_online_tracker_cls, \
-         patch("ws.consumers.RoomCacheService") as mock_room_cache_cls:
-
-        mock_room_cache = mock_room_cache_cls.return_value
-        mock_room_cache.get_votes.return_value = {"user-uuid-1": 5}
-
-        with patch.object(RoomConsumer, "get_voting", return_value=finished_voting):
-            communicator = WebsocketCommunicator(room_url_router, f"/ws/room/{room_id}/?token={token}")
-            connected, _ = await communicator.connect()
-            assert connected
-
-            msg = await communicator.receive_from()
-            payload = json.loads(msg)
-            assert payload["type"] == "results"
-            assert payload["average_score"] == finished_voting.average_score
-            assert "votes" in payload
-
-            await communicator.disconnect()
+         patch.object(RoomConsumer, "_get_user_uuid", return_value="user-uuid-1"), \
+         patch("ws.consumers.RoomMessageService", autospec=True) as mock_room_message_service_cls, \
+         patch("ws.consumers.AsyncUserChannelTracker", autospec=True), \
+         patch("ws.consumers.AsyncRoomOnlineTracker", autospec=True), \
+         patch.object(AsyncRoomCacheService, "is_voting_finished", return_value=False):
+        connects_before = metrics.snapshot()["histograms"].get("ws_connect_seconds", {"count": 0})["count"]
+
+        communicator = WebsocketCommunicator(room_url_router, f"/ws/room/{room_id}/?token=dummy-token")
+        connected, _ = await communicator.connect()
+        assert connected
+
+        payload = json.loads(await communicator.receive_from())
+        assert payload == {
+            "type": "room_state",
+            "version": 1,
+            "participants": {"user-uuid-1": {"role": "voter", "nickname": "V"}},
+            "offline_participants": {},
+            "online": {},
+            "voted_users": ["user-uuid-1"],
+            "timer": None,
+            "results": {
+                "votes": {"user-uuid-1": {"nickname": "V", "vote": 5}},
+                "average_score": finished_voting.average_score,
+            },
+        }
+        assert await communicator.receive_nothing()
+
+        await communicator.disconnect()
+
+    mock_room_message_service_cls.return_value.asend_room_voted_users.assert_not_called()
+    assert metrics.snapshot()["histograms"]["ws_connect_seconds"]["count"] == connects_before + 1
+
+async def _connect(communicator):
+    connected, _ = await communicator.connect()
+    assert connected
+    payload = json.loads(await communicator.receive_from())
+    assert payload["type"] == "room_state"
 
 @pytest.mark.asyncio
 @pytest.mark.django_db
@@ -46,23 +72,19 @@ async def test_group_message_broadcasts_to_other_clients(room_url_router, room):
         return room_id
     async def fake_get_user_uuid(self):
         return "uuid-A"
+    RoomCacheService(room.id).add_user("uuid-A", role=UserRole.VOTER)
 
     with patch.object(RoomConsumer, "_get_lookup_id", new=fake_get_lookup_id), \
          patch.object(RoomConsumer, "_get_user_uuid", new=fake_get_user_uuid), \
-         patch("ws.consumers.RoomMessageService") as mock_room_message_service_cls, \
-         patch("ws.consumers.RoomOnlineTracker") as mock_room_online_tracker_cls, \
-         patch("ws.consumers.check_voting_finish") as mock_check_finish:
-
-        mock_check_finish.return_value = False
+         patch("ws.consumers.RoomMessageService", autospec=True) as mock_room_message_service_cls, \
+         patch("ws.consumers.AsyncRoomOnlineTracker", autospec=True) as mock_room_online_tracker_cls, \
+         patch.object(AsyncRoomCacheService, "is_voting_finished", return_value=False) as mock_check_finish:
 
         comm1 = WebsocketCommunicator(room_url_router, f"/ws/room/{room_id}/?token=a")
         comm2 = WebsocketCommunicator(room_url_router, f"/ws/room/{room_id}/?token=b")
 
-        connected1, _ = await comm1.connect()
-        connected2, _ = await comm2.connect()
-
-        assert connected1
-        assert connected2
+        await _connect(comm1)
+        await _connect(comm2)
 
         layer = get_channel_layer()
         await layer.group_send(f"room_{room_id}", {"type": "user_voted", "user": "someone", "score": 5})
@@ -80,3 +102,107 @@ async def test_group_message_broadcasts_to_other_clients(room_url_router, room):
 
         await comm1.disconnect()
         await comm2.disconnect()
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_invalid_voting_status_is_ignored(room_url_router, room):
+    RoomCacheService(room.id).add_user("uuid-A", role=UserRole.VOTER)
+
+    with patch.object(RoomConsumer, "_get_lookup_id", return_value=room.id), \
+         patch.object(RoomConsumer, "_get_user_uuid", return_value="uuid-A"), \
+         patch("ws.consumers.AsyncRoomOnlineTracker", autospec=True):
+        communicator = WebsocketCommunicator(room_url_router, f"/ws/room/{room.id}/?token=a")
+        await _connect(communicator)
+
+        await communicator.send_to(text_data=json.dumps({"action": "change_voting_status", "status": "bogus"}))
+        assert await communicator.receive_nothing()
+
+        await communicator.send_to(text_data="not json")
+        assert json.loads(await communicator.receive_from()) == {"error": "Invalid JSON format"}
+        await communicator.disconnect()
+
+async def _broadcast_encode_count(room_url_router, room_id, room_size):
+    communicators = [
+        WebsocketCommunicator(room_url_router, f"/ws/room/{room_id}/?token=t{i}") for i in range(room_size)
+    ]
+    for communicator in communicators:
+        await _connect(communicator)
+
+    encodes = []
+    original_dumps = frames.dumps
+
+    def counting_dumps(message):
+        encodes.append(message["type"])
+        return original_dumps(message)
+
+    message = {"type": "results", "votes": {f"u{i}": {"nickname": f"n{i}", "vote": i} for i in range(room_size)},
+               "average_score": 3}
+    with patch("rooms.services.frames.dumps", side_effect=counting_dumps):
+        await DjangoChannelMessageSender().asend(f"room_{room_id}", message)
+        payloads = [json.loads(await communicator.receive_from()) for communicator in communicators]
+
+    for communicator in communicators:
+        await communicator.disconnect()
+
+    assert all(payload == message for payload in payloads)
+    return len(encodes)
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_broadcast_is_encoded_once_regardless_of_room_size(room_url_router, room):
+    async def fake_get_lookup_id(self):
+        return room.id
+    async def fake_get_user_uuid(self):
+        return "uuid-A"
+    RoomCacheService(room.id).add_user("uuid-A", role=UserRole.VOTER)
+
+    with patch.object(RoomConsumer, "_get_lookup_id", new=fake_get_lookup_id), \
+         patch.object(RoomConsumer, "_get_user_uuid", new=fake_get_user_uuid), \
+         patch("ws.consumers.RoomMessageService", autospec=True), \
+         patch("ws.consumers.AsyncUserChannelTracker", autospec=True), \
+         patch("ws.consumers.AsyncRoomOnlineTracker", autospec=True), \
+         patch.object(AsyncRoomCacheService, "is_voting_finished", return_value=False):
+
+        small_room = await _broadcast_encode_count(room_url_router, room.id, 3)
+        large_room = await _broadcast_encode_count(room_url_router, room.id, 30)
+
+    assert small_room == large_room == 1
+
+@pytest.fixture
+def draining_worker():
+    yield worker_drain
+    worker_drain.reset()
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_drain_closes_sockets_without_presence_churn(room_url_router, room, draining_worker):
+    async def fake_get_lookup_id(self):
+        return room.id
+    async def fake_get_user_uuid(self):
+        return "uuid-A"
+    RoomCacheService(room.id).add_user("uuid-A", role=UserRole.VOTER)
+
+    with patch.object(RoomConsumer, "_get_lookup_id", new=fake_get_lookup_id), \
+         patch.object(RoomConsumer, "_get_user_uuid", new=fake_get_user_uuid), \
+         patch("ws.consumers.RoomMessageService", autospec=True), \
+         patch("ws.consumers.AsyncUserChannelTracker", autospec=True) as mock_user_channel_tracker_cls, \
+         patch("ws.consumers.AsyncRoomOnlineTracker", autospec=True) as mock_room_online_tracker_cls, \
+         patch.object(AsyncRoomCacheService, "is_voting_finished", return_value=True) as mock_check_finish:
+
+        communicator = WebsocketCommunicator(room_url_router, f"/ws/room/{room.id}/?token=a")
+        await _connect(communicator)
+
+        await draining_worker.drain()
+        assert await communicator.receive_output() == {"type": "websocket.close", "code": SERVICE_RESTART_CLOSE_CODE}
+        await communicator.disconnect(code=SERVICE_RESTART_CLOSE_CODE)
+
+        late = WebsocketCommunicator(room_url_router, f"/ws/room/{room.id}/?token=b")
+        connected, code = await late.connect()
+
+    assert not connected
+    assert code == SERVICE_RESTART_CLOSE_CODE
+    mock_user_channel_tracker_cls.remove_participant.assert_awaited_once()
+    mock_room_online_tracker_cls.user_disconnected.assert_not_called()
+    mock_room_online_tracker_cls.schedule_offline.assert_awaited_once()
+    mock_check_finish.assert_not_called()
+
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from channels.layers import get_channel_layer
+from rooms.services.message_senders.django_channel import DjangoChannelMessageSender
+from rooms.services.room_message_service import RoomMessageService
+
+from ws.services.user_channel_tracker import AsyncUserChannelTracker, UserChannelTracker
+
+
+def test_user_channel_index_follows_participants(fake_redis):
+    UserChannelTracker.add_participant("chan-1", "u1", 1)
+    UserChannelTracker.add_participant("chan-2", "u1", 1)
+    UserChannelTracker.add_participant("chan-3", "u2", 1)
+
+    assert UserChannelTracker.get_user_channels(1, "u1") == {"chan-1", "chan-2"}
+    assert UserChannelTracker.get_user_channels(2, "u1") == set()
+
+    UserChannelTracker.remove_participant("chan-1")
+
+    assert UserChannelTracker.get_user_channels(1, "u1") == {"chan-2"}
+    assert UserChannelTracker.get_room_participants(1) == {"chan-2", "chan-3"}
+
+
+@pytest.mark.asyncio
+async def test_send_to_user_reaches_only_user_channels(fake_redis):
+    layer = get_channel_layer()
+    own_channel = await layer.new_channel()
+    other_channel = await layer.new_channel()
+    await AsyncUserChannelTracker.add_participant(own_channel, "u1", 1)
+    await AsyncUserChannelTracker.add_participant(other_channel, "u2", 1)
+    service = RoomMessageService(1, DjangoChannelMessageSender())
+
+    await service.adisconnect_user("u1")
+
+    assert (await layer.receive(own_channel))["type"] == "force_disconnect"
+    assert await AsyncUserChannelTracker.get_user_channels(1, "u2") == {other_channel}
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(layer.receive(other_channel), timeout=0.05)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_connects_are_not_lost(fake_redis):
+    await asyncio.gather(*[
+        AsyncUserChannelTracker.add_participant(f"chan-{i}", f"u{i}", 1) for i in range(50)
+    ])
+
+    assert await AsyncUserChannelTracker.count_room_participants(1) == 50
+    assert await AsyncUserChannelTracker.is_user_connected(1, "u7")
+    assert await AsyncUserChannelTracker.get_participant_info("chan-7") == {"user_uuid": "u7", "room_id": 1}
+
+
+def _connect_cost(redis_traffic, room_size):
+    room_id = 1000 + room_size
+    for i in range(room_size):
+        UserChannelTracker.add_participant(f"chan-{i:04d}", f"u{i:04d}", room_id)
+
+    redis_traffic.reset()
+    UserChannelTracker.add_participant("chan-new", "u-new", room_id)
+    return redis_traffic.round_trips, redis_traffic.bytes_sent
+
+
+def test_connect_cost_is_flat_as_room_grows(fake_redis, redis_traffic):
+    assert _connect_cost(redis_traffic, 5) == _connect_cost(redis_traffic, 200)
+    assert UserChannelTracker.count_room_participants(1200) == 201
+    assert not UserChannelTracker.is_user_connected(1200, "ghost")
@@ -0,0 +1,23 @@
+import asyncio
+import os
+import signal
+
+import pytest
+
+from ws.services.worker_drain import WorkerDrain
+
+
+@pytest.mark.asyncio
+async def test_signal_enables_drain_and_chains_server_handler():
+    drain = WorkerDrain()
+    received = []
+    previous = signal.signal(signal.SIGUSR1, lambda signum, frame: received.append(signum))
+    try:
+        drain.install_signal_handlers(signals=(signal.SIGUSR1,))
+        os.kill(os.getpid(), signal.SIGUSR1)
+        await asyncio.sleep(0)
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+
+    assert drain.is_draining
+    assert received == [signal.SIGUSR1]
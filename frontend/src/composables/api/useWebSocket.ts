@@ -13,6 +13,10 @@ export interface WebSocketSendMessage {
 
 export type MessageHandler = (message: WebSocketMessage) => void;
 
+// Сервер закрывает соединения этим кодом при перезапуске воркера
+const SERVICE_RESTART_CLOSE_CODE = 1012;
+const SERVICE_RESTART_MAX_DELAY = 1000;
+
 export function useRoomWebSocket(url: string) {
   const isConnected: Ref<boolean> = ref(false);
   const error: Ref<Event | Error | null> = ref(null);
@@ -56,8 +60,12 @@ export function useRoomWebSocket(url: string) {
       reconnect();
     };
 
-    socket.onclose = () => {
+    socket.onclose = (event: CloseEvent) => {
       isConnected.value = false;
+      if (event.code === SERVICE_RESTART_CLOSE_CODE) {
+        reconnectSoon();
+        return;
+      }
       reconnect();
     };
   };
@@ -84,6 +92,19 @@ export function useRoomWebSocket(url: string) {
     );
   };
 
+  const reconnectSoon = (): void => {
+    if (reconnectTimer) {
+      clearTimeout(reconnectTimer);
+      reconnectTimer = null;
+    }
+
+    if (!isActive) return;
+    reconnectTimer = setTimeout(
+      connect,
+      Math.random() * SERVICE_RESTART_MAX_DELAY
+    );
+  };
+
   const sendMessage = (message: WebSocketSendMessage): void => {
     if (socket?.readyState === WebSocket.OPEN) {
       socket.send(JSON.stringify(message));
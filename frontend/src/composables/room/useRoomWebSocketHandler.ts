@@ -3,7 +3,7 @@ import { ROOM_STATES } from "@/composables/room/useRoomState";
 import useVoting, { Vote } from "@/composables/api/useVotingsAPI";
 import { Participant } from "@/composables/api/useRoomAPI";
 import { useNotify } from "@/composables/useNotify";
-import { AddMessageHandler } from "@/types/websocket";
+import { AddMessageHandler, ResultsMsg } from "@/types/websocket";
 import { useTimerStore } from "@/stores/roomTimer";
 
 const { getVoting, roomVoting } = useVoting();
@@ -24,6 +24,15 @@ export default function useRoomWebSocketHandler(
 ) {
   const currentVoting: Ref<null | number> = ref(null);
 
+  const showResults = (msg: ResultsMsg) => {
+    if (!msg?.votes || !msg?.average_score) return;
+    roomState.value = ROOM_STATES.RESULTS;
+    resultsVotes.value = msg.votes;
+    averageScore.value = msg.average_score;
+    localStorage.setItem("hasVoted", JSON.stringify(false));
+    hasVoted.value = false;
+  };
+
   const setupHandlers = () => {
     addMessageHandler("user_joined", (msg) => {
       if (!msg?.user) return;
@@ -55,13 +64,14 @@ export default function useRoomWebSocketHandler(
       }
     });
 
-    addMessageHandler("results", (msg) => {
-      if (!msg?.votes || !msg?.average_score) return;
-      roomState.value = ROOM_STATES.RESULTS;
-      resultsVotes.value = msg.votes;
-      averageScore.value = msg.average_score;
-      localStorage.setItem("hasVoted", JSON.stringify(false));
-      hasVoted.value = false;
+    addMessageHandler("results", showResults);
+
+    addMessageHandler("room_state", (msg) => {
+      if (!msg?.voted_users) return;
+      participants.value = msg.participants;
+      votes.value = msg.voted_users;
+      if (msg.timer) timer.updateTime(msg.timer * 1000);
+      if (msg.results) showResults(msg.results);
     });
 
     addMessageHandler("task_name_changed", (msg) => {
@@ -99,6 +109,10 @@ export default function useRoomWebSocketHandler(
       notify.info(`Участник ${userNickname} сбросил таймер`)
     })
 
+    addMessageHandler("timer_expired", () => {
+      timer.resetTimer();
+    })
+
     addMessageHandler("voting_started", (msg) => {
       if (!msg?.id) return;
       getVoting(msg.id)
@@ -1,5 +1,6 @@
 import { Vote } from "@/composables/api/useVotingsAPI";
 import { User } from "@/composables/api/useUserAPI";
+import { Participant } from "@/composables/api/useRoomAPI";
 
 export interface UserJoinedMsg {
   user: Record<string, { nickname: string }>;
@@ -37,6 +38,10 @@ export interface RoomTimerReset {
   "timer_reset_user": Record<string, User>,
 }
 
+export interface RoomTimerExpired {
+  "end_time": number,
+}
+
 export interface VotingStartedMsg {
   id: number;
 }
@@ -45,6 +50,16 @@ export interface VotedUsersMsg {
   voted_users: string[]
 }
 
+export interface RoomStateMsg {
+  version: number;
+  participants: Participant;
+  offline_participants: Participant;
+  online: Record<string, boolean>;
+  voted_users: string[];
+  timer: number | null;
+  results: ResultsMsg | null;
+}
+
 export interface VotingStatusChangeMsg {
   status?: "restart" | "next";
 }
@@ -59,9 +74,11 @@ export interface WebsocketMessages {
   "user_kicked": UserKickedMsg;
   "timer_started": RoomTimerStarted;
   "timer_reset": RoomTimerReset;
+  "timer_expired": RoomTimerExpired;
   "voting_started": VotingStartedMsg;
   "voted_users_update": VotedUsersMsg;
   "voting_change_status": VotingStatusChangeMsg;
+  "room_state": RoomStateMsg;
 }
 
 export type AddMessageHandler = <K extends keyof WebsocketMessages>(